@@ -20,6 +20,17 @@ def create_app(config_mode='development'):
     db.app = app
     db.init_app(app)
 
+    from .api.endpoints import classifier
+    if not classifier.loaded:
+        classifier.configure(app.config['CLASSIFIER_MODEL_PATH'],
+                             app.config['CLASSIFIER_BACKEND'])
+    classifier.preprocessor.max_batch_size = \
+        app.config['CLASSIFY_BATCH_MAX_FRAMES']
+    # load the model now rather than in the first classification request
+    if app.config['CLASSIFIER_PRELOAD']:
+        classifier.load()
+        classifier.warmup(app.config['CLASSIFIER_WARMUP_RUNS'])
+
     if config_mode == 'development':
         print(app.config)
 
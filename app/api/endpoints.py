@@ -2,22 +2,56 @@
 
 from . import api
 
-from flask import make_response, jsonify, request, abort, current_app
-from flask_httpauth import HTTPBasicAuth
+from flask import make_response, jsonify, request, abort, current_app, \
+    url_for, Response, stream_with_context, g
+from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth, MultiAuth
 from werkzeug.utils import secure_filename
 
+from collections import namedtuple
+import json
 import logging
+import math
+import mimetypes
 from logging.handlers import RotatingFileHandler
-from time import strftime
+from queue import Full
+from threading import Lock
+from time import strftime, monotonic, sleep, time
+import struct
 import traceback
+from uuid import uuid4
 
-from ..models import User, ImageRef
+from sqlalchemy import Integer, String, cast, literal, null, tuple_, \
+    union_all
+from sqlalchemy.sql import func
+
+from ..models import db, User, ImageRef, ScoreRecord, ClassificationJob, \
+    RevokedToken
+from ..jobs import JobQueue
+from ..group_commit import GroupCommitError
+from ..storage import get_storage
 from ..classifier import Classifier
-from ..helpers.aggregator import aggregate_score
+from ..scheduler import InferenceScheduler
+from ..inference import InferenceClient, InferenceUnavailable
+from ..preprocessing import sniff_content_type
+from ..helpers.result_cache import ResultCache, content_key, perceptual_key
+from ..helpers.frame_skipper import FrameSkipper
+from ..helpers.score_store import ScoreStore
+from ..helpers.retention import RetentionPolicy
+from ..helpers.tokens import TokenSigner, RevocationList
+from ..helpers.pagination import encode_cursor, decode_cursor
+from ..helpers.aggregator import make_scorer
 
 
 classifier = Classifier()
-auth = HTTPBasicAuth()
+inference_lock = Lock()
+# protected endpoints take a username and password, or a bearer token from
+# /login which spares them the password hash
+basic_auth = HTTPBasicAuth()
+token_auth = HTTPTokenAuth(scheme='Bearer')
+auth = MultiAuth(basic_auth, token_auth)
+
+# name and type of a frame that did not arrive as a multipart file upload
+FrameFile = namedtuple('FrameFile', ['filename', 'content_type'])
 
 handler = RotatingFileHandler('app.log', maxBytes=10000, backupCount=3)
 logger = logging.getLogger('__name__')
@@ -35,6 +69,50 @@ def hello():
     return make_response(jsonify({'hello': 'world'}), 200)
 
 
+#                            #
+#      METRICS API CALL      #
+#                            #
+
+@api.route('/api/v0.1/metrics', methods=['GET'])
+@auth.login_required
+def metrics():
+    """Return counters of the classification pipeline in this worker."""
+    stats = {}
+    for name, extension in (('scheduler', 'inference_scheduler'),
+                            ('result_cache', 'result_cache'),
+                            ('frame_skipper', 'frame_skipper'),
+                            ('job_queue', 'job_queue'),
+                            ('score_store', 'score_store'),
+                            ('retention', 'retention_policy'),
+                            ('tokens', 'revocation_list'),
+                            ('uploads', 'upload_queue'),
+                            ('group_commit', 'group_commit_writer'),
+                            ('storage', 'object_index'),
+                            ('identities', 'identity_cache')):
+        if extension in current_app.extensions:
+            stats[name] = current_app.extensions[extension].stats()
+    return make_response(jsonify(stats), 200)
+
+
+#                            #
+#      STORAGE API CALL      #
+#                            #
+
+@api.route('/api/v0.1/storage/<path:key>', methods=['GET'])
+def get_stored_object(key):
+    """Serve an image kept by the local or memory storage backend."""
+    try:
+        data = get_storage(current_app).get(key)
+    except (KeyError, ValueError):
+        abort(404)
+    content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+    response = make_response(data, 200)
+    response.headers['Content-Type'] = content_type
+    # objects are content addressed and never change once stored
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
 #                               #
 #     SESSIONS API ENDPOINT     #
 #                               #
@@ -45,16 +123,41 @@ def login():
     if not verify_password(request.authorization.username,
                            request.authorization.password):
                            abort(401, 'Username or password not correct')
-    user = User.query.filter_by(
-        username=request.authorization.username).first()
-    if not user.active == True:
+    if not current_identity().active == True:
         abort(401, 'User account deactivated')
+    user = current_user()
+    token, claims = get_token_signer(current_app).issue(user.id,
+                                                        user.username)
     return make_response(jsonify({'id': user.id,
                                   'firstname': user.firstname,
                                   'lastname': user.lastname,
                                   'email': user.email,
                                   'username': user.username,
-                                  'active': user.active}), 200)
+                                  'active': user.active,
+                                  'token': token,
+                                  'expires_at': claims['exp']}), 200)
+
+
+@api.route('/api/v0.1/login/refresh', methods=['POST'])
+@token_auth.login_required
+def refresh_token():
+    """Exchange a valid bearer token for a new one, revoking the old one."""
+    requester = current_identity()
+    if requester is None or not requester.active:
+        abort(401, 'User account deactivated')
+    revoke_token(g.token_claims)
+    token, claims = get_token_signer(current_app).issue(requester.id,
+                                                        requester.username)
+    return make_response(jsonify({'token': token,
+                                  'expires_at': claims['exp']}), 200)
+
+
+@api.route('/api/v0.1/logout', methods=['POST'])
+@token_auth.login_required
+def logout():
+    """Revoke the bearer token of the request."""
+    revoke_token(g.token_claims)
+    return make_response(jsonify({'revoked': True}), 200)
 
 
 #                       #
@@ -103,12 +206,11 @@ def register_user():
 @auth.login_required
 def get_user(user_id):
     """Return a single user by ID."""
-    user = User.query.get_or_404(user_id)
-    requester = User.query.filter_by(
-        username=request.authorization.username).first()
     # if user making the request is not the same user that is being retrieved:
-    if user.id is not requester.id:
+    if user_id != current_identity().id:
+        User.query.get_or_404(user_id)
         abort(401, 'you do not have access to this')
+    user = current_user()
     return make_response(jsonify({'id': user.id,
                                   'firstname': user.firstname,
                                   'lastname': user.lastname,
@@ -121,23 +223,22 @@ def get_user(user_id):
 @auth.login_required
 def update_user(user_id):
     """Update a single user by ID."""
-    user = User.query.get_or_404(user_id)
-    requester = User.query.filter_by(
-        username=request.authorization.username).first()
     # if user making the request is not the same user that is being updated:
-    if user.id is not requester.id:
+    if user_id != current_identity().id:
+        User.query.get_or_404(user_id)
         abort(401, 'you do not have access to this')
+    user = current_user()
 
     payload = request.get_json()
 
     # checking piece by piece if the user can be updated to the payload:
     # user wants to update email address
-    if user.email is not payload['email']:
+    if user.email != payload['email']:
         found = User.query.filter_by(email=payload['email']).first()
         if found is not None and user.id is not found.id:
             abort(400, 'email already taken')
     # user wants to update username
-    if user.username is not payload['username']:
+    if user.username != payload['username']:
         found = User.query.filter_by(username=payload['username']).first()
         if found is not None and user.id is not found.id:
             abort(400, 'username already taken')
@@ -150,6 +251,10 @@ def update_user(user_id):
     else:
         user.active = True
 
+    # tokens issued before a change of credentials or state stop working
+    revoke = 'password' in payload or not user.active or \
+        user.username != payload['username']
+
     user.username = payload['username']
     user.email = payload['email']
     user.firstname = payload['firstname']
@@ -158,6 +263,8 @@ def update_user(user_id):
     if 'password' in payload:
         user.hash_password(payload['password'])
     user.save()
+    if revoke:
+        revoke_user_tokens(user.id)
 
     return make_response(jsonify({'id': user.id,
                                   'firstname': user.firstname,
@@ -174,66 +281,288 @@ def update_user(user_id):
 @api.route('/api/v0.1/classifier', methods=['POST'])
 @auth.login_required
 def classify():
-    """Accept image file and return classification."""
+    """Accept image file and return classification.
 
-    if 'prev_score' not in request.form:
-        abort(400, 'need previous score')
-    prev_score = float(request.form['prev_score'])
+    The score is kept by the server; an optional prev_score in the form
+    overrides the stored score as the starting point.
+    """
+    prev_score = get_prev_score()
+    fileStoreObj = get_upload()
+    image = fileStoreObj.read()
+
+    return make_response(jsonify(classify_and_store(
+        image, fileStoreObj, g.username, prev_score)),
+        200)
 
-    if 'data' not in request.files:
-        abort(400, 'no file in request')
-    fileStoreObj = request.files['data']
-    if not allowed_file_type(fileStoreObj.filename):
-        abort(400, 'illegal file type')
-    if fileStoreObj:
-        fileStoreObj.filename = secure_filename(fileStoreObj.filename)
-    else:
-        abort(400, 'unable to read file')
 
+@api.route('/api/v0.1/classifier/stream', methods=['POST'])
+@auth.login_required
+def classify_stream():
+    """Classify a continuous stream of frames for one drive session.
+
+    The client authenticates once and uploads, typically with chunked
+    transfer encoding, a body of frames each prefixed with its length as a
+    4 byte big endian integer; a zero length ends the session. Each frame is
+    answered as soon as it is classified with one JSON line, carrying the
+    running score kept by the server, and a final line sums up the session.
+    An optional prev_score query argument overrides the stored score before
+    the first frame.
+    """
+    app = current_app._get_current_object()
+    prev_score = get_prev_score(request.args)
+    username = g.username
+    session_id = uuid4().hex
+    stream = request.stream
+
+    def results():
+        override = prev_score
+        score = None
+        frames = 0
+        while True:
+            header = read_exactly(stream, 4)
+            length = struct.unpack('>I', header)[0] if len(header) == 4 \
+                else 0
+            if length == 0:
+                break
+            if length > app.config['STREAM_MAX_FRAME_BYTES']:
+                yield json_line({'error': 'frame too large'})
+                return
+            image = read_exactly(stream, length)
+            content_type = sniff_content_type(image)
+            if len(image) < length or content_type is None:
+                yield json_line({'error': 'illegal frame'})
+                return
+            fileStoreObj = FrameFile(
+                '%s_%d.%s' % (session_id, frames,
+                              content_type.rsplit('/', 1)[1]),
+                content_type)
+            result = classify_and_store(image, fileStoreObj, username,
+                                        override)
+            override = None
+            score = result['score']
+            result['frame'] = frames
+            frames += 1
+            yield json_line(result)
+        yield json_line({'done': True, 'frames': frames, 'score': score})
+
+    return Response(stream_with_context(results()),
+                    mimetype='application/x-ndjson')
+
+
+@api.route('/api/v0.1/classifier/jobs', methods=['POST'])
+@auth.login_required
+def submit_classification_job():
+    """Accept image file and classify it in the background."""
+    prev_score = get_prev_score()
+    fileStoreObj = get_upload()
     image = fileStoreObj.read()
 
-    probabilities, prediction, confidence = classifier.classify(image)
-    score = aggregate_score(prev_score, prediction, confidence)
+    requester = current_identity()
+    job = ClassificationJob(id=str(uuid4()), user_id=requester.id)
+    job.save()
+    try:
+        get_job_queue(current_app._get_current_object()).submit(job.id, {
+            'image': image,
+            'fileStoreObj': fileStoreObj,
+            'username': requester.username,
+            'prev_score': prev_score})
+    except Full:
+        job.status = 'failed'
+        job.error = 'job queue full'
+        job.save()
+        abort(503, 'job queue full, retry later')
+
+    response = make_response(jsonify({'job_id': job.id,
+                                      'status': job.status}), 202)
+    response.headers['Location'] = url_for(
+        'api.get_classification_job', job_id=job.id)
+    return response
 
-    image_ref = ImageRef(image=image,
-                         fileStoreObj=fileStoreObj,
-                         prediction=prediction,
-                         probabilities=probabilities,
-                         username=request.authorization.username,
-                         distraction_score=score)
-    image_ref.save()
 
-    return make_response(jsonify({'filename': fileStoreObj.filename,
-                                  'prediction': prediction,
-                                  'probabilities': probabilities,
-                                  'score': score,
-                                  'confidence': confidence}), 200)
+@api.route('/api/v0.1/classifier/jobs/<job_id>', methods=['GET'])
+@auth.login_required
+def get_classification_job(job_id):
+    """Return status and result of a job, optionally waiting for it."""
+    app = current_app._get_current_object()
+    requester = current_identity()
+    job = ClassificationJob.query.get(job_id)
+    if job is None or job.user_id != requester.id:
+        abort(404, 'job not found')
+
+    # long-poll: wait up to 'wait' seconds for the job to finish
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        abort(400, 'wait must be a number of seconds')
+    if not math.isfinite(wait) or wait < 0:
+        abort(400, 'wait must be a number of seconds')
+    wait = min(wait, app.config['JOB_MAX_WAIT'])
+    deadline = monotonic() + wait
+    while not job.finished and monotonic() < deadline:
+        sleep(app.config['JOB_POLL_INTERVAL'])
+        db.session.refresh(job)
+
+    payload = {'job_id': job.id, 'status': job.status}
+    if job.status == 'done':
+        payload['result'] = json.loads(job.result)
+    if job.status == 'failed':
+        payload['error'] = job.error
+    return make_response(jsonify(payload), 200)
+
+
+@api.route('/api/v0.1/classifier/batch', methods=['POST'])
+@auth.login_required
+def classify_batch():
+    """Accept multiple frames and return classifications in order."""
+    prev_score = get_prev_score()
+
+    fileStoreObjs = request.files.getlist('data')
+    if not fileStoreObjs:
+        abort(400, 'no file in request')
+    max_frames = current_app.config['CLASSIFY_BATCH_MAX_FRAMES']
+    if len(fileStoreObjs) > max_frames:
+        abort(400, 'at most %d frames per request' % max_frames)
+    for fileStoreObj in fileStoreObjs:
+        check_upload(fileStoreObj)
+
+    images = [fileStoreObj.read() for fileStoreObj in fileStoreObjs]
+
+    # one stacked tensor and a single prediction for all frames
+    decoded = [] if current_app.config['STORAGE_TRANSFORM'] else None
+    classifications = classify_images(images, decoded)
+    frames = decoded if decoded else [None] * len(images)
+
+    # frames are chained in the order they were posted
+    requester = current_identity()
+    scores = get_score_store(current_app._get_current_object()).update(
+        requester.id,
+        [classification[1] for classification in classifications],
+        [classification[2] for classification in classifications],
+        prev_score)
+
+    policy = get_retention_policy(current_app._get_current_object())
+    image_refs = []
+    score_records = []
+    json_results = []
+    for image, frame, fileStoreObj, classification, score in zip(
+            images, frames, fileStoreObjs, classifications, scores):
+        probabilities, prediction, confidence = classification
+        stored = policy is None or policy.keep(requester.id, prediction,
+                                               confidence)
+        if stored:
+            image_refs.append(ImageRef(
+                image=image,
+                fileStoreObj=fileStoreObj,
+                prediction=prediction,
+                probabilities=probabilities,
+                username=requester.username,
+                distraction_score=score,
+                frame=frame,
+                user_id=requester.id))
+        else:
+            score_records.append(ScoreRecord(
+                user_id=requester.id, predicted_label=prediction,
+                confidence=confidence, distraction_score=score))
+        json_results.append({'filename': fileStoreObj.filename,
+                             'prediction': prediction,
+                             'probabilities': probabilities,
+                             'score': score,
+                             'confidence': confidence,
+                             'stored': stored})
+    if image_refs:
+        ImageRef.save_all(image_refs)
+    if score_records:
+        ScoreRecord.save_all(score_records)
+
+    return make_response(jsonify({'results': json_results,
+                                  'score': score}), 200)
 
 
 @api.route('/api/v0.1/classifier', methods=['GET'])
 @auth.login_required
 def get_results():
-    """Return collection of image classification results sorted by timestamp"""
-    limit = request.args.get('limit', 50)
-    offset = request.args.get('offset', 0)
-
-    requester = User.query.filter_by(
-        username=request.authorization.username).first()
-    results = ImageRef.query.filter_by(user_id=requester.id).order_by(
-        ImageRef.taken_at.asc()).limit(limit).offset(offset).all()
-
-    if not results:
+    """Return collection of image classification results sorted by timestamp
+
+    Pages either with limit and offset, or with limit and the next_cursor
+    of the previous page, which stays fast however deep the page is.
+    """
+    limit, offset = get_page(50)
+    cursor = request.args.get('cursor')
+
+    requester = current_identity()
+    wait_committed(requester.id)
+    query = ImageRef.query.filter_by(user_id=requester.id)
+    if cursor:
+        try:
+            taken_at, after = decode_cursor(cursor)
+        except ValueError:
+            abort(400, 'Invalid cursor')
+        query = query.filter(tuple_(ImageRef.taken_at, ImageRef.id) > tuple_(
+            literal(taken_at, ImageRef.taken_at.type), literal(after)))
+    # id breaks ties between frames of the same time, so that the order
+    # and the cursors are well defined; one row more tells whether another
+    # page follows
+    results = query.order_by(ImageRef.taken_at.asc(), ImageRef.id.asc()) \
+        .limit(limit + 1).offset(offset).all()
+
+    # the pages of a cursor end with an empty one rather than an error
+    if not results and not cursor:
         abort(404, 'No records found')
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1].taken_at, results[-1].id)
 
     json_results = []
     for result in results:
         d = {'id': result.id,
              'link': result.link,
+             'thumbnail_link': result.thumbnail_link,
              'predicted_label': result.predicted_label,
              'taken_at': result.taken_at,
              'distraction_score': result.distraction_score}
         json_results.append(d)
 
+    return make_response(jsonify(results=json_results,
+                                 next_cursor=next_cursor), 200)
+
+
+@api.route('/api/v0.1/classifier/scores', methods=['GET'])
+@auth.login_required
+def get_score_timeline():
+    """Return the score of every classified frame sorted by timestamp.
+
+    Unlike the history, this includes the frames the retention policy did
+    not store in full, which have no link.
+    """
+    limit, offset = get_page(100)
+
+    requester = current_identity()
+    wait_committed(requester.id)
+    stored = db.session.query(
+        ImageRef.taken_at.label('taken_at'),
+        cast(ImageRef.predicted_label, Integer).label('predicted_label'),
+        ImageRef.distraction_score.label('distraction_score'),
+        ImageRef.link.label('link')).filter(
+        ImageRef.user_id == requester.id)
+    recorded = db.session.query(
+        ScoreRecord.taken_at, ScoreRecord.predicted_label,
+        ScoreRecord.distraction_score, cast(null(), String)).filter(
+        ScoreRecord.user_id == requester.id)
+    frames = union_all(stored.statement, recorded.statement).alias('frames')
+    results = db.session.query(frames).order_by(
+        frames.c.taken_at.asc()).limit(limit).offset(offset).all()
+
+    if not results:
+        abort(404, 'No records found')
+
+    json_results = []
+    for result in results:
+        json_results.append({'taken_at': result.taken_at,
+                             'predicted_label': result.predicted_label,
+                             'distraction_score': result.distraction_score,
+                             'link': result.link})
+
     return make_response(jsonify(results=json_results), 200)
 
 
@@ -251,7 +580,17 @@ def before_request():
                  request.method,
                  request.full_path,
                  request.environ.get('SERVER_PROTOCOL'),
-                 request.get_data())
+                 # reading a streamed body here would buffer the whole stream
+                 request.get_data()
+                 if request.endpoint != 'api.classify_stream'
+                 else '<frame stream>')
+
+
+@api.before_request
+def forget_identity():
+    """Forget the user of an earlier request in the same app context."""
+    g.identity = None
+    g.user = None
 
 
 @api.errorhandler(400)
@@ -274,6 +613,18 @@ def not_found(error):
     return make_response(jsonify({'error': error.description}), 404)
 
 
+@api.errorhandler(500)
+def internal_error(error):
+    """Error handler to build 500 in JSON."""
+    return make_response(jsonify({'error': error.description}), 500)
+
+
+@api.errorhandler(503)
+def unavailable(error):
+    """Error handler to build 503 in JSON."""
+    return make_response(jsonify({'error': error.description}), 503)
+
+
 @api.errorhandler(Exception)
 def exceptions(e):
     """Handle and log exceptions"""
@@ -301,25 +652,391 @@ def after_request(response):
                      request.remote_addr,
                      'HTTP/1.1',
                      response.status,
-                     response.get_data())
+                     # get_data would consume a streamed response up front
+                     response.get_data()
+                     if not response.is_streamed
+                     else '<streamed response>')
     return response
 
 
-@auth.verify_password
+@basic_auth.verify_password
 def verify_password(username, password):
     """Verify provided username / password pair against user record in db."""
-    user = User.query.filter_by(username=username).first()
+    user = User.find_identity(username)
     if not user or not user.verify_password(password):
         return False
+    g.username = username
+    g.identity = user
     return True
 
 
-@auth.error_handler
+@token_auth.verify_token
+def verify_token(token):
+    """Verify a bearer token by its signature, expiry and revocation."""
+    app = current_app._get_current_object()
+    claims = get_token_signer(app).verify(token)
+    if claims is None or get_revocation_list(app).is_revoked(claims):
+        return False
+    g.username = claims['sub']
+    g.token_claims = claims
+    return True
+
+
+def current_identity():
+    """Return the identity of the requesting user, resolved once."""
+    if g.get('identity') is None:
+        g.identity = User.find_identity(g.username)
+    return g.identity
+
+
+def current_user():
+    """Return the requesting User, loaded at most once per request."""
+    if g.get('user') is None:
+        g.user = User.query.get(current_identity().id)
+    return g.user
+
+
+def revoke_token(claims):
+    """Revoke a bearer token until it would have expired anyway."""
+    now = time()
+    RevokedToken.revoke(claims['jti'], now, claims['exp'])
+    get_revocation_list(current_app).add(claims['jti'], now)
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every bearer token issued to a user so far."""
+    app = current_app._get_current_object()
+    now = time()
+    key = 'user:%s' % user_id
+    RevokedToken.revoke(key, now, now + app.config['TOKEN_TTL'])
+    get_revocation_list(app).add(key, now)
+
+
+@basic_auth.error_handler
+@token_auth.error_handler
 def unauthorized():
     """Error handler to build 401 in JSON."""
     return make_response(jsonify({'error': 'Not authorized'}), 401)
 
 
+def read_exactly(stream, length):
+    """Read length bytes from stream, fewer only if it ends early."""
+    chunks = []
+    remaining = length
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def json_line(payload):
+    """Serialize payload as one line of newline delimited JSON."""
+    return json.dumps(payload) + '\n'
+
+
+def get_prev_score(values=None):
+    """Read the optional previous score override, by default of the form."""
+    if values is None:
+        values = request.form
+    if 'prev_score' not in values:
+        return None
+    try:
+        prev_score = float(values['prev_score'])
+    except ValueError:
+        abort(400, 'prev_score must be a number')
+    if not math.isfinite(prev_score):
+        abort(400, 'prev_score must be a number')
+    return prev_score
+
+
+def get_page(default_limit):
+    """Read and validate the limit and offset query arguments."""
+    max_limit = current_app.config['PAGE_MAX_LIMIT']
+    try:
+        limit = int(request.args.get('limit', default_limit))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        abort(400, 'limit and offset must be integers')
+    if not 0 < limit <= max_limit or offset < 0:
+        abort(400, 'limit must be 1 to %d and offset not negative'
+              % max_limit)
+    return limit, offset
+
+
+def wait_committed(user_id):
+    """Wait for the user's frames acknowledged ahead of their commit."""
+    try:
+        ImageRef.wait_committed(user_id)
+    except GroupCommitError as e:
+        logger.error(str(e))
+        abort(500, 'frames acknowledged earlier could not be stored')
+
+
+def get_upload():
+    """Return the validated image upload of the request."""
+    if 'data' not in request.files:
+        abort(400, 'no file in request')
+    return check_upload(request.files['data'])
+
+
+def check_upload(fileStoreObj):
+    """Validate an uploaded file and sanitize its name."""
+    if not allowed_file_type(fileStoreObj.filename):
+        abort(400, 'illegal file type')
+    if fileStoreObj:
+        fileStoreObj.filename = secure_filename(fileStoreObj.filename)
+    else:
+        abort(400, 'unable to read file')
+    return fileStoreObj
+
+
+def classify_and_store(image, fileStoreObj, username, prev_score=None):
+    """Classify an image, store it and return the classification result.
+
+    The user's server side score is advanced by the frame, starting from
+    prev_score instead of the stored score if given.
+    """
+    # the decoded frame is reused when storing the image
+    decoded = [] if current_app.config['STORAGE_TRANSFORM'] else None
+    result, reused = classify_image(image, username, decoded)
+    probabilities, prediction, confidence = result
+    app = current_app._get_current_object()
+    user = current_identity() if g.get('username') == username \
+        else User.find_identity(username)
+    score = get_score_store(app).update(
+        user.id, [prediction], [confidence], prev_score)[0]
+
+    # frames the retention policy drops only leave a score record
+    policy = get_retention_policy(app)
+    stored = policy is None or policy.keep(user.id, prediction, confidence)
+    if stored:
+        image_ref = ImageRef(image=image,
+                             fileStoreObj=fileStoreObj,
+                             prediction=prediction,
+                             probabilities=probabilities,
+                             username=username,
+                             distraction_score=score,
+                             frame=decoded[0] if decoded else None,
+                             user_id=user.id)
+        image_ref.save()
+    else:
+        ScoreRecord.save_all([ScoreRecord(
+            user_id=user.id, predicted_label=prediction,
+            confidence=confidence, distraction_score=score)])
+
+    return {'filename': fileStoreObj.filename,
+            'prediction': prediction,
+            'probabilities': probabilities,
+            'score': score,
+            'confidence': confidence,
+            'reused': reused,
+            'stored': stored}
+
+
+def run_classification_job(job_id, payload):
+    """Job queue handler classifying and storing a queued image."""
+    job = ClassificationJob.query.get(job_id)
+    job.status = 'running'
+    job.save()
+    try:
+        result = classify_and_store(**payload)
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = repr(e)[:200]
+        raise
+    else:
+        job.status = 'done'
+        job.result = json.dumps(result)
+    finally:
+        job.finished_at = func.now()
+        job.save()
+
+
+def classify_image(image, username, decoded=None):
+    """Classify image, reusing earlier results for repeated frames.
+
+    Returns the (probabilities, prediction, confidence) result and whether
+    it was reused from the result cache or the user's previous frame rather
+    than computed by the model. If the image is decoded in this worker and a
+    list is passed as decoded, the decoded frame is appended to it.
+    """
+    app = current_app._get_current_object()
+    cache = get_result_cache(app) if app.config['RESULT_CACHE_SIZE'] \
+        else None
+    skipper = get_frame_skipper(app) if app.config['FRAME_SKIP_THRESHOLD'] \
+        else None
+
+    result = None
+    keys = []
+    if cache is not None:
+        keys.append(content_key(username, image))
+        result = cache.get(keys[0])
+
+    frame = None
+    perceptual = cache is not None and app.config['RESULT_CACHE_PERCEPTUAL']
+    if result is None and (perceptual or skipper is not None):
+        frame = classifier.preprocess(image, decoded)
+    if result is None and perceptual:
+        keys.append(perceptual_key(username, frame[0]))
+        result = cache.get(keys[1])
+    if result is None and skipper is not None:
+        result = skipper.lookup(username, frame[0])
+
+    reused = result is not None
+    if not reused:
+        result = run_classifier(image, frame, decoded)
+        if skipper is not None:
+            skipper.update(username, frame[0], result)
+    for key in keys:
+        cache.put(key, result)
+    return result, reused
+
+
+def run_classifier(image, np_image_tensor=None, decoded=None):
+    """Run the model on an inference server or in this worker.
+
+    np_image_tensor is image already preprocessed by this thread, if any;
+    otherwise the image is decoded here and appended to decoded, if given.
+    """
+    app = current_app._get_current_object()
+    if app.config['INFERENCE_SOCKETS']:
+        try:
+            return get_inference_client(app).classify(image)
+        except InferenceUnavailable:
+            if not app.config['INFERENCE_FALLBACK']:
+                raise
+            logger.error('inference servers down, classifying locally')
+    if np_image_tensor is None:
+        np_image_tensor = classifier.preprocess(image, decoded)
+    if not app.config['INFERENCE_BATCHING']:
+        return classifier.predict_batch(np_image_tensor)[0]
+    return get_scheduler(app).submit(np_image_tensor).result()
+
+
+def classify_images(images, decoded=None):
+    """Classify several images with a single prediction.
+
+    Images decoded in this worker are appended to decoded, if given.
+    """
+    app = current_app._get_current_object()
+    if app.config['INFERENCE_SOCKETS']:
+        try:
+            return get_inference_client(app).classify_batch(images)
+        except InferenceUnavailable:
+            if not app.config['INFERENCE_FALLBACK']:
+                raise
+            logger.error('inference servers down, classifying locally')
+    return classifier.predict_batch(classifier.preprocess_batch(images,
+                                                                decoded))
+
+
+def get_scheduler(app):
+    """Return the inference scheduler of the app, creating it once."""
+    with inference_lock:
+        if 'inference_scheduler' not in app.extensions:
+            app.extensions['inference_scheduler'] = InferenceScheduler(
+                classifier,
+                max_batch_size=app.config['INFERENCE_MAX_BATCH_SIZE'],
+                max_wait_ms=app.config['INFERENCE_MAX_WAIT_MS'])
+    return app.extensions['inference_scheduler']
+
+
+def get_inference_client(app):
+    """Return the inference server client of the app, creating it once."""
+    with inference_lock:
+        if 'inference_client' not in app.extensions:
+            app.extensions['inference_client'] = InferenceClient(
+                app.config['INFERENCE_SOCKETS'],
+                authkey=app.config['SECRET_KEY'].encode(),
+                timeout=app.config['INFERENCE_TIMEOUT'],
+                retry_interval=app.config['INFERENCE_RETRY_INTERVAL'])
+    return app.extensions['inference_client']
+
+
+def get_result_cache(app):
+    """Return the classification result cache of the app."""
+    with inference_lock:
+        if 'result_cache' not in app.extensions:
+            app.extensions['result_cache'] = ResultCache(
+                max_size=app.config['RESULT_CACHE_SIZE'],
+                ttl=app.config['RESULT_CACHE_TTL'])
+    return app.extensions['result_cache']
+
+
+def get_frame_skipper(app):
+    """Return the per user frame skipper of the app."""
+    with inference_lock:
+        if 'frame_skipper' not in app.extensions:
+            app.extensions['frame_skipper'] = FrameSkipper(
+                app.config['FRAME_SKIP_THRESHOLD'],
+                max_reuse=app.config['FRAME_SKIP_MAX_REUSE'])
+    return app.extensions['frame_skipper']
+
+
+def get_score_store(app):
+    """Return the app's cache of users' running scores."""
+    with inference_lock:
+        if 'score_store' not in app.extensions:
+            app.extensions['score_store'] = ScoreStore(
+                make_scorer(app.config['SCORER'],
+                            **app.config['SCORER_OPTIONS']),
+                initial_score=app.config['SCORE_INITIAL'],
+                max_users=app.config['SCORE_CACHE_USERS'])
+    return app.extensions['score_store']
+
+
+def get_retention_policy(app):
+    """Return the retention policy of the app, None to keep all frames."""
+    if app.config['RETENTION_POLICY'] == 'all':
+        return None
+    with inference_lock:
+        if 'retention_policy' not in app.extensions:
+            if app.config['RETENTION_POLICY'] != 'selective':
+                raise ValueError('unknown retention policy %r, expected '
+                                 "'all' or 'selective'"
+                                 % app.config['RETENTION_POLICY'])
+            app.extensions['retention_policy'] = RetentionPolicy(
+                safe_classes=app.config['RETENTION_SAFE_CLASSES'],
+                min_confidence=app.config['RETENTION_MIN_CONFIDENCE'],
+                sample_every=app.config['RETENTION_SAMPLE_EVERY'],
+                max_users=app.config['SCORE_CACHE_USERS'])
+    return app.extensions['retention_policy']
+
+
+def get_token_signer(app):
+    """Return the bearer token signer of the app."""
+    with inference_lock:
+        if 'token_signer' not in app.extensions:
+            app.extensions['token_signer'] = TokenSigner(
+                app.config['SECRET_KEY'], ttl=app.config['TOKEN_TTL'])
+    return app.extensions['token_signer']
+
+
+def get_revocation_list(app):
+    """Return the app's list of revoked bearer tokens."""
+    with inference_lock:
+        if 'revocation_list' not in app.extensions:
+            app.extensions['revocation_list'] = RevocationList(
+                RevokedToken.load_active,
+                refresh_interval=app.config['TOKEN_REVOCATION_REFRESH'])
+    return app.extensions['revocation_list']
+
+
+def get_job_queue(app):
+    """Return the classification job queue of the app."""
+    with inference_lock:
+        if 'job_queue' not in app.extensions:
+            app.extensions['job_queue'] = JobQueue(
+                app, run_classification_job,
+                workers=app.config['JOB_WORKERS'],
+                max_size=app.config['JOB_QUEUE_SIZE'])
+    return app.extensions['job_queue']
+
+
 def allowed_file_type(filename):
     """Check if file type that is being posted is permitted."""
     app = current_app._get_current_object()
@@ -0,0 +1,125 @@
+"""Pluggable CPU inference backends for the classifier model.
+
+Every backend wraps one model file and exposes predict(batch), taking a
+(batch, channels, x, y) tensor and returning a (batch, classes) array of
+probabilities. Besides the original Keras .h5 model, the model can be
+exported with convert_model.py to ONNX Runtime or TensorFlow Lite, optionally
+quantized to float16 or int8. The runtimes are optional dependencies and are
+only imported when their backend is selected.
+"""
+
+import numpy as np
+
+
+class KerasBackend:
+    """Runs the original Keras model."""
+
+    name = 'keras'
+
+    def __init__(self, model_path):
+        """Load the Keras model."""
+        from keras.models import load_model
+        self.model = load_model(model_path)
+
+    def predict(self, np_image_tensor):
+        """Return class probabilities for a batch."""
+        return self.model.predict(np_image_tensor,
+                                  batch_size=len(np_image_tensor))
+
+    def summary(self):
+        """Print the model summary."""
+        self.model.summary()
+
+
+class OnnxBackend:
+    """Runs an exported ONNX model on ONNX Runtime's CPU provider."""
+
+    name = 'onnx'
+
+    def __init__(self, model_path):
+        """Create the ONNX Runtime session."""
+        import onnxruntime
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if model_input.type == \
+            'tensor(float16)' else np.float32
+
+    def predict(self, np_image_tensor):
+        """Return class probabilities for a batch."""
+        feed = {self.input_name: np_image_tensor.astype(self.input_dtype,
+                                                        copy=False)}
+        return self.session.run(None, feed)[0].astype(np.float32, copy=False)
+
+    def summary(self):
+        """Print the model inputs and outputs."""
+        for node in self.session.get_inputs() + self.session.get_outputs():
+            print(node.name, node.type, node.shape)
+
+
+class TFLiteBackend:
+    """Runs an exported TensorFlow Lite model."""
+
+    name = 'tflite'
+
+    def __init__(self, model_path):
+        """Create the TensorFlow Lite interpreter."""
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self.batch_size = self.input_detail['shape'][0]
+
+    def predict(self, np_image_tensor):
+        """Return class probabilities for a batch."""
+        if len(np_image_tensor) != self.batch_size:
+            self.interpreter.resize_tensor_input(
+                self.input_detail['index'], np_image_tensor.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(np_image_tensor)
+        self.interpreter.set_tensor(
+            self.input_detail['index'],
+            quantize(np_image_tensor, self.input_detail))
+        self.interpreter.invoke()
+        return dequantize(
+            self.interpreter.get_tensor(self.output_detail['index']),
+            self.output_detail)
+
+    def summary(self):
+        """Print the model inputs and outputs."""
+        print(self.input_detail)
+        print(self.output_detail)
+
+
+def quantize(array, detail):
+    """Convert a float input to the tensor's (possibly integer) type."""
+    scale, zero_point = detail['quantization']
+    if scale:
+        array = np.round(array / scale + zero_point)
+    return array.astype(detail['dtype'], copy=False)
+
+
+def dequantize(array, detail):
+    """Convert a (possibly integer) output to float32."""
+    scale, zero_point = detail['quantization']
+    if scale:
+        return (array.astype(np.float32) - zero_point) * scale
+    return array.astype(np.float32, copy=False)
+
+
+BACKENDS = {backend.name: backend
+            for backend in (KerasBackend, OnnxBackend, TFLiteBackend)}
+
+
+def load_backend(name, model_path):
+    """Load model_path with the backend registered under name."""
+    if name not in BACKENDS:
+        raise ValueError('unknown classifier backend %r, expected one of %s'
+                         % (name, ', '.join(sorted(BACKENDS))))
+    return BACKENDS[name](model_path)
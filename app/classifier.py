@@ -1,42 +1,103 @@
-"""Image data classifier."""
+"""Image data classifier.
+
+The model is loaded lazily on first use, through one of the inference
+backends in backends.py, so importing the API (as migrate.py and
+testrunner.py do) stays cheap. Servers can load it up front by
+calling load(), e.g. in the gunicorn master so forked workers share the
+weights, and warm it up with warmup() before taking traffic.
+"""
 
 from pathlib import Path
+from threading import Lock
+from time import perf_counter
 import numpy as np
-import cv2
-from keras.models import load_model
+
+from .backends import load_backend
+from .preprocessing import Preprocessor, IMAGE_SIZE
+
+MODEL_PATH = 'app/static/CNN_two_convs_25022018_0900.h5'
 
 
 class Classifier:
     """Classifier class."""
 
-    def __init__(self):
+    def __init__(self, model_path=MODEL_PATH, backend='keras',
+                 verbose=False):
         """Classifier constructor."""
-        model_def = str(Path.cwd().joinpath(
-            'app/static/CNN_two_convs_25022018_0900.h5'))
-        self.model = load_model(model_def)
-        self.model.summary()
-
-    def classify(self, image_stream_data):
-        """Classify image file stream."""
-        # reading the image stream data as 8 bit binary data into ndarray
-        np_data_arr = np.fromstring(image_stream_data, dtype='uint8')
-        # decode ndarray to image with BGR channels (Inferred from data)
-        raw_img = cv2.imdecode(np_data_arr, cv2.IMREAD_UNCHANGED)
-        # resizing image to 224 *224 pixels
-        np_image = cv2.resize(raw_img, (224, 224))
-        # the classifier expected input format is:
-        # (batch_size, channels, x_dims, y_dims). In this case, batch size = 1
-        # performing two operations:
-        # - add 4th dimension
-        # - swap axes to put dimensions into right order
-        # first, adding 4th dim:
-        np_image_tensor = np.expand_dims(np_image, axis=0)
-        # second converting to channels first ordering
-        np_image_tensor = np.swapaxes(np.swapaxes(np_image_tensor, 1, 3), 2, 3)
-        # making prediction on the image and returning probabilities
+        self._model = None
+        self._lock = Lock()
+        self.configure(model_path, backend)
+        self.verbose = verbose
+        self.preprocessor = Preprocessor()
+        self.load_seconds = None
+
+    def configure(self, model_path, backend):
+        """Select the model file and inference backend to load."""
+        if self.loaded:
+            raise RuntimeError('classifier model is already loaded')
+        self.model_def = str(Path.cwd().joinpath(model_path))
+        self.backend = backend
+
+    @property
+    def model(self):
+        """Inference backend wrapping the model, loaded on first access."""
+        if self._model is None:
+            self.load()
+        return self._model
+
+    @property
+    def loaded(self):
+        """Check whether the model has been loaded."""
+        return self._model is not None
+
+    def load(self):
+        """Load the model from disk unless it is already loaded."""
+        with self._lock:
+            if self._model is None:
+                start = perf_counter()
+                model = load_backend(self.backend, self.model_def)
+                self.load_seconds = perf_counter() - start
+                if self.verbose:
+                    model.summary()
+                self._model = model
+        return self._model
+
+    def warmup(self, runs=1):
+        """Run predictions on a blank frame to initialise the backend."""
+        blank = np.zeros((1, 3, IMAGE_SIZE, IMAGE_SIZE),
+                         dtype=self.preprocessor.dtype)
+        for _ in range(runs):
+            self.predict_batch(blank)
+
+    def classify(self, image_stream_data, decoded=None):
+        """Classify image file stream.
+
+        The decoded frame is appended to decoded if a list is given.
+        """
+        np_image_tensor = self.preprocess(image_stream_data, decoded)
+        return self.predict_batch(np_image_tensor)[0]
+
+    def preprocess(self, image_stream_data, decoded=None):
+        """Decode image file stream into a (1, channels, x, y) tensor."""
+        return self.preprocessor.preprocess(image_stream_data, decoded)
+
+    def preprocess_batch(self, images, decoded=None):
+        """Decode image file streams into a (batch, channels, x, y) tensor."""
+        return self.preprocessor.preprocess_batch(images, decoded)
+
+    def predict_batch(self, np_image_tensor):
+        """Classify a stacked batch of preprocessed images.
+
+        Returns one (probabilities, prediction, confidence) tuple per image,
+        in the order of the batch.
+        """
+        # making prediction on the images and returning probabilities
         # for each class as list (as ndarray are not jsonify-able)
-        probabilities = self.model.predict(np_image_tensor).tolist()[0]
-        prediction = np.asscalar(np.argmax(probabilities))
-        # confidence is the probability associated with the predicted class
-        confidence = probabilities[prediction]
-        return probabilities, prediction, confidence
+        batch_probabilities = self.model.predict(np_image_tensor).tolist()
+        results = []
+        for probabilities in batch_probabilities:
+            prediction = int(np.argmax(probabilities))
+            # confidence is the probability associated with the predicted class
+            confidence = probabilities[prediction]
+            results.append((probabilities, prediction, confidence))
+        return results
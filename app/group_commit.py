@@ -0,0 +1,279 @@
+"""Group commit of rows written by concurrent requests.
+
+Committing every stored frame in a transaction of its own makes each
+request wait for the database to flush its log to disk. With group commit
+enabled, requests hand their writes to the app's GroupCommitWriter, whose
+thread writes everything waiting at the time in a single transaction: the
+rows for each table in one multi-row INSERT, then statements such as the
+compare and set of a user's running score. A transaction is committed as
+soon as it holds the maximum number of rows, or when the oldest row has
+waited for the maximum wait time, whichever comes first.
+
+The durability mode decides when a request is acknowledged: 'flush' waits
+until its rows are committed, so a response only reports frames that were
+stored; 'early' returns right away and a crash loses the rows of the last
+few milliseconds. Readers call flush() first, so that a user always sees
+the frames it was acknowledged for, or learns that they failed to commit.
+Statements are always waited for, as their callers need the row count.
+"""
+
+import atexit
+import os
+import threading
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future
+from queue import Queue, Empty
+from time import monotonic
+
+from .helpers.stats import percentile
+
+DURABILITY_MODES = ('flush', 'early')
+
+# SQLite before 3.32 binds at most 999 parameters per statement
+MAX_PARAMETERS = 999
+
+group_commit_writer_lock = threading.Lock()
+
+
+class GroupCommitError(Exception):
+    """Raised by flush when writes acknowledged early failed to commit."""
+
+
+class Write(namedtuple('Write', ['table', 'rows', 'statement', 'owner',
+                                 'future', 'queued_at'])):
+    """Rows to insert into a table, or a statement, of one request."""
+
+    __slots__ = ()
+
+    @property
+    def size(self):
+        """Number of rows written, counting a statement as one."""
+        return len(self.rows) if self.statement is None else 1
+
+
+class GroupCommitWriter:
+    """Writes the rows of concurrent requests in shared transactions."""
+
+    def __init__(self, app, db, max_rows=64, max_wait_ms=10,
+                 durability='flush'):
+        """Writer constructor.
+
+        The writer thread writes inside an application context of app
+        through db.
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError('unknown durability %r, expected one of %s'
+                             % (durability, ', '.join(DURABILITY_MODES)))
+        self.app = app
+        self.db = db
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.durability = durability
+        self.flushes = 0
+        self.rows = 0
+        self.failures = 0
+        # rows and seconds per committed transaction
+        self.flush_sizes = deque(maxlen=1000)
+        self.flush_latencies = deque(maxlen=1000)
+        # seconds from submitting a row to its commit
+        self.lags = deque(maxlen=1000)
+        self.pid = os.getpid()
+        # owner -> exception of a write acknowledged early that failed
+        self._lost = {}
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True,
+                                        name='group-commit')
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, table, rows, owner=None):
+        """Queue rows (dicts of column values) for insertion into table.
+
+        Returns a future resolving to the primary keys of the rows once
+        they are committed. With 'early' durability a failure to commit
+        them is also reported to the next flush of owner.
+        """
+        return self._put(table, rows, None, owner)
+
+    def execute(self, statement):
+        """Queue a statement, returning a future of its row count."""
+        return self._put(None, [], statement, None)
+
+    def flush(self, owner=None, timeout=None):
+        """Wait until the writes submitted so far are committed.
+
+        Raises GroupCommitError if writes of owner that were acknowledged
+        early failed since its last flush.
+        """
+        self._put(None, [], None, None).result(timeout)
+        if owner is None:
+            return
+        with self._lock:
+            error = self._lost.pop(owner, None)
+        if error is not None:
+            raise GroupCommitError('writes of %r acknowledged before their '
+                                   'commit failed: %r' % (owner, error))
+
+    def stats(self):
+        """Return flush counters, sizes and latency percentiles."""
+        with self._lock:
+            sizes = list(self.flush_sizes)
+            latencies = list(self.flush_latencies)
+            lags = list(self.lags)
+            return {'durability': self.durability,
+                    'queue_depth': self._queue.qsize(),
+                    'flushes': self.flushes,
+                    'rows': self.rows,
+                    'failures': self.failures,
+                    'mean_flush_rows': (sum(sizes) / len(sizes)
+                                        if sizes else 0.0),
+                    'flush_rows_p95': percentile(sizes, 95),
+                    'flush_p50_ms': percentile(latencies, 50) * 1000,
+                    'flush_p95_ms': percentile(latencies, 95) * 1000,
+                    'lag_p50_ms': percentile(lags, 50) * 1000,
+                    'lag_p95_ms': percentile(lags, 95) * 1000}
+
+    def close(self):
+        """Commit the rows still waiting, e.g. when the process exits."""
+        if self.pid == os.getpid() and self._worker.is_alive():
+            self.flush(timeout=10)
+
+    def _put(self, table, rows, statement, owner):
+        """Queue a write and return its future."""
+        future = Future()
+        self._queue.put(Write(table, rows, statement, owner, future,
+                              monotonic()))
+        return future
+
+    def _collect(self):
+        """Block for the first rows, then gather more until a limit."""
+        batch = [self._queue.get()]
+        count = batch[0].size
+        deadline = monotonic() + self.max_wait
+        while count < self.max_rows:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+            count += batch[-1].size
+        return batch
+
+    def _run(self):
+        """Worker loop committing one transaction per collected batch."""
+        while True:
+            batch = self._collect()
+            start = monotonic()
+            try:
+                with self.app.app_context():
+                    results = self._write(batch)
+            except Exception:
+                self.app.logger.exception('group commit of %d requests '
+                                          'failed, retrying them one by one',
+                                          len(batch))
+                self._retry(batch)
+                continue
+            self._done(batch, results, start)
+
+    def _write(self, batch):
+        """Write a batch in one transaction, return each write's result.
+
+        The rows of all writes into a table that set the same columns are
+        inserted together, then the statements run in the order they were
+        submitted.
+        """
+        results = [[None] * len(write.rows) for write in batch]
+        inserts = OrderedDict()
+        for i, write in enumerate(batch):
+            if write.statement is None:
+                for j, row in enumerate(write.rows):
+                    inserts.setdefault((write.table, tuple(sorted(row))),
+                                       []).append((i, j, row))
+        with self.db.engine.begin() as connection:
+            for (table, columns), targets in inserts.items():
+                # keep each statement within the parameter limit
+                size = max(1, MAX_PARAMETERS // max(1, len(columns)))
+                for offset in range(0, len(targets), size):
+                    chunk = targets[offset:offset + size]
+                    keys = self._insert(connection, table,
+                                        [row for _, _, row in chunk])
+                    for (i, j, _), key in zip(chunk, keys):
+                        results[i][j] = key
+            for i, write in enumerate(batch):
+                if write.statement is not None:
+                    results[i] = connection.execute(write.statement).rowcount
+        return results
+
+    def _insert(self, connection, table, rows):
+        """Insert rows with one statement and return their primary keys.
+
+        Keys the rows do not set are generated in the order of the rows,
+        so the returned ones are sorted. Dialects that cannot return them
+        from a multi-row INSERT get one statement per row.
+        """
+        key, = table.primary_key.columns
+        if key.key in rows[0]:
+            connection.execute(table.insert().values(rows))
+            return [row[key.key] for row in rows]
+        dialect = connection.dialect
+        # insert_returning is new in SQLAlchemy 2.0
+        if getattr(dialect, 'insert_returning',
+                   getattr(dialect, 'implicit_returning', False)):
+            result = connection.execute(
+                table.insert().values(rows).returning(key))
+            return sorted(row[0] for row in result)
+        return [connection.execute(table.insert(),
+                                   row).inserted_primary_key[0]
+                for row in rows]
+
+    def _retry(self, batch):
+        """Commit each request's writes on their own after a failed batch."""
+        for write in batch:
+            start = monotonic()
+            try:
+                with self.app.app_context():
+                    results = self._write([write])
+            except Exception as e:
+                self._fail(write, e)
+                continue
+            self._done([write], results, start)
+
+    def _fail(self, write, error):
+        """Record a write that could not be committed and resolve it."""
+        with self._lock:
+            self.failures += 1
+            if self.durability == 'early' and write.owner is not None:
+                self._lost[write.owner] = error
+        write.future.set_exception(error)
+
+    def _done(self, batch, results, start):
+        """Record a committed batch and resolve its futures."""
+        now = monotonic()
+        count = sum(write.size for write in batch)
+        if count:
+            with self._lock:
+                self.flushes += 1
+                self.rows += count
+                self.flush_sizes.append(count)
+                self.flush_latencies.append(now - start)
+                self.lags.extend(now - write.queued_at
+                                 for write in batch if write.size)
+        for write, result in zip(batch, results):
+            write.future.set_result(result)
+
+
+def get_group_commit_writer(app, db):
+    """Return the group commit writer of the app, once per process."""
+    with group_commit_writer_lock:
+        writer = app.extensions.get('group_commit_writer')
+        if writer is None or writer.pid != os.getpid():
+            writer = app.extensions['group_commit_writer'] = \
+                GroupCommitWriter(
+                    app, db,
+                    max_rows=app.config['GROUP_COMMIT_MAX_ROWS'],
+                    max_wait_ms=app.config['GROUP_COMMIT_MAX_WAIT_MS'],
+                    durability=app.config['GROUP_COMMIT_DURABILITY'])
+    return writer
@@ -15,25 +15,300 @@ c9: talking to passenger: 3
 
 current score is the class penalty multiplied by  confidence
 previous score is added, and sum is divided by 2
+
+aggregate_scores computes the same running score for a whole sequence of
+classifications at once, which is what re-scoring stored history needs.
+
+The rule ignores how much time passed between frames. The scorers below
+are alternatives that take the time each frame was taken at into account;
+config.py selects one per deployment (SCORER, SCORER_OPTIONS).
 """
 
+import numpy as np
+
+# penalty for eaach kind of distraction
+CLASS_PENALTIES = {0: 1,
+                   1: 7,
+                   2: 6,
+                   3: 7,
+                   4: 6,
+                   5: 5,
+                   6: 4,
+                   7: 10,
+                   8: 7,
+                   9: 3}
+
+# penalties as an array indexed by class label
+PENALTY_VECTOR = np.array([CLASS_PENALTIES[label]
+                           for label in sorted(CLASS_PENALTIES)],
+                          dtype=np.float64)
+
+# recurrences are unrolled over blocks of this many frames; with decay
+# weights of at least MIN_WEIGHT the factors 1 / w ** k within a block stay
+# far from float64 overflow
+BLOCK_SIZE = 64
+MIN_WEIGHT = 2.0 ** -15
+
 
 def aggregate_score(prev_score, curr_label, curr_confidence):
     """Calculate aggregate attention score from classifications."""
-
-    # penalty for eaach kind of distraction
-    class_penalties = {0: 1,
-                       1: 7,
-                       2: 6,
-                       3: 7,
-                       4: 6,
-                       5: 5,
-                       6: 4,
-                       7: 10,
-                       8: 7,
-                       9: 3}
-
-    current_score = class_penalties[curr_label] * curr_confidence
+    current_score = CLASS_PENALTIES[curr_label] * curr_confidence
     aggregate_score = (current_score + prev_score) / 2
 
     return aggregate_score
+
+
+def aggregate_scores(prev_score, labels, confidences, penalties=None):
+    """Calculate the running aggregate score for a sequence of frames.
+
+    Returns an array holding, for every frame, the score aggregate_score
+    would have produced after chaining it over all frames up to that one.
+    penalties optionally replaces the penalty per class label.
+    """
+    current = current_scores(labels, confidences, penalties)
+    return linear_recurrence(prev_score, np.full(len(current), 0.5),
+                             current / 2)
+
+
+def current_scores(labels, confidences, penalties=None):
+    """Return the class penalty times confidence of every frame."""
+    penalties = PENALTY_VECTOR if penalties is None \
+        else np.asarray(penalties, dtype=np.float64)
+    return penalties[np.asarray(labels, dtype=np.intp)] * \
+        np.asarray(confidences, dtype=np.float64)
+
+
+def linear_recurrence(score, weights, inputs):
+    """Evaluate s_j = w_j * s_j-1 + u_j over a sequence, starting at score.
+
+    With P_j the product of the weights up to frame j, the recursion
+    unrolls to s_j = P_j * (s + sum_k<=j u_k / P_k), so every block of
+    frames is a single cumulative sum. Weights must be in [MIN_WEIGHT, 1].
+    """
+    scores = np.empty(len(inputs))
+    for start in range(0, len(inputs), BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, len(inputs))
+        log_products = np.cumsum(np.log2(weights[start:stop]))
+        scores[start:stop] = np.exp2(log_products) * (score + np.cumsum(
+            inputs[start:stop] * np.exp2(-log_products)))
+        score = scores[stop - 1]
+    return scores
+
+
+def decay_weight(interval, half_life, min_interval=0.0):
+    """Weight left of a score after interval seconds of decay."""
+    return max(0.5 ** (max(interval, min_interval) / half_life), MIN_WEIGHT)
+
+
+def decay_weights(intervals, half_life, min_interval=0.0):
+    """Vectorized decay_weight."""
+    return np.maximum(0.5 ** (np.maximum(intervals, min_interval) /
+                              half_life), MIN_WEIGHT)
+
+
+def intervals(last_time, times):
+    """Return the seconds since the previous frame for every frame."""
+    times = np.asarray(times, dtype=np.float64)
+    previous = np.empty_like(times)
+    previous[:1] = -np.inf if last_time is None else last_time
+    previous[1:] = times[:-1]
+    return times - previous
+
+
+#                              #
+#     INCREMENTAL SCORERS      #
+#                              #
+
+# A scorer turns a user's score, the scorer's own per user state and a new
+# frame (label, confidence, unix time it was taken at) into the next score
+# and state, in constant time per frame; update may change the state in
+# place. update_batch does the same for a whole sequence of frames at once.
+# States are JSON serializable, None for a user without frames.
+
+
+class HalvingScorer:
+    """The original rule: average of the current and the previous score."""
+
+    name = 'halving'
+
+    def __init__(self, penalties=None):
+        """Scorer constructor."""
+        self.penalties = list(PENALTY_VECTOR if penalties is None
+                              else penalties)
+
+    def update(self, score, state, label, confidence, taken_at):
+        """Return score and state after one frame."""
+        return (self.penalties[label] * confidence + score) / 2, state
+
+    def update_batch(self, score, state, labels, confidences, times):
+        """Return the score after every frame, and the final state."""
+        return aggregate_scores(score, labels, confidences,
+                                self.penalties), state
+
+
+class DecayScorer:
+    """Exponentially weighted mean decaying with the time between frames.
+
+    The previous score loses half its weight every half_life seconds, so a
+    frame after a long pause all but replaces it. Frames closer together
+    than min_interval (e.g. a batch upload) count as min_interval apart.
+    """
+
+    name = 'decay'
+
+    def __init__(self, penalties=None, half_life=10.0, min_interval=0.2):
+        """Scorer constructor."""
+        self.penalties = list(PENALTY_VECTOR if penalties is None
+                              else penalties)
+        self.half_life = half_life
+        self.min_interval = min_interval
+
+    def update(self, score, state, label, confidence, taken_at):
+        """Return score and state after one frame; state is last time."""
+        weight = MIN_WEIGHT if state is None else \
+            decay_weight(taken_at - state, self.half_life, self.min_interval)
+        current = self.penalties[label] * confidence
+        return weight * score + (1 - weight) * current, taken_at
+
+    def update_batch(self, score, state, labels, confidences, times):
+        """Return the score after every frame, and the final state."""
+        weights = decay_weights(intervals(state, times), self.half_life,
+                                self.min_interval)
+        current = current_scores(labels, confidences, self.penalties)
+        return linear_recurrence(score, weights, (1 - weights) * current), \
+            float(times[-1])
+
+
+class WindowScorer:
+    """Mean current score of the frames taken in the last window seconds.
+
+    The frames are kept in a ring buffer of max_frames entries along with
+    their running sum, so each frame adds one entry and evicts the expired
+    ones. The previous score carries no weight of its own.
+    """
+
+    name = 'window'
+
+    def __init__(self, penalties=None, window=30.0, max_frames=64):
+        """Scorer constructor."""
+        self.penalties = list(PENALTY_VECTOR if penalties is None
+                              else penalties)
+        self.window = window
+        self.max_frames = max_frames
+
+    def update(self, score, state, label, confidence, taken_at):
+        """Return score and state after one frame.
+
+        The state holds the ring buffer's times and current scores, the
+        next slot to write, the number of frames held and their sum.
+        """
+        if state is None:
+            state = {'times': [0.0] * self.max_frames,
+                     'values': [0.0] * self.max_frames,
+                     'head': 0, 'count': 0, 'total': 0.0}
+        times, values = state['times'], state['values']
+        while state['count']:
+            oldest = (state['head'] - state['count']) % self.max_frames
+            if state['count'] < self.max_frames and \
+                    times[oldest] > taken_at - self.window:
+                break
+            state['total'] -= values[oldest]
+            state['count'] -= 1
+        current = self.penalties[label] * confidence
+        times[state['head']] = taken_at
+        values[state['head']] = current
+        state['head'] = (state['head'] + 1) % self.max_frames
+        state['count'] += 1
+        # restart the running sum whenever the buffer held a single frame,
+        # so rounding errors of the subtractions cannot pile up
+        state['total'] = current if state['count'] == 1 \
+            else state['total'] + current
+        return state['total'] / state['count'], state
+
+    def update_batch(self, score, state, labels, confidences, times):
+        """Return the score after every frame, and the final state."""
+        held_times, held_values = self._held(state)
+        all_times = np.concatenate([held_times,
+                                    np.asarray(times, dtype=np.float64)])
+        all_values = np.concatenate([held_values, current_scores(
+            labels, confidences, self.penalties)])
+        sums = np.concatenate([[0.0], np.cumsum(all_values)])
+
+        # window of frame j: frames taken after its time minus the window,
+        # at most max_frames of them, frame j included
+        frames = np.arange(len(held_times), len(all_times))
+        first = np.maximum(
+            np.searchsorted(all_times, all_times[frames] - self.window,
+                            side='right'),
+            frames - self.max_frames + 1)
+        scores = (sums[frames + 1] - sums[first]) / (frames + 1 - first)
+
+        kept = slice(first[-1], None)
+        count = int(len(all_times) - first[-1])
+        state = {'times': [0.0] * self.max_frames,
+                 'values': [0.0] * self.max_frames,
+                 'head': count % self.max_frames, 'count': count,
+                 'total': float(all_values[kept].sum())}
+        state['times'][:count] = all_times[kept].tolist()
+        state['values'][:count] = all_values[kept].tolist()
+        return scores, state
+
+    def _held(self, state):
+        """Return times and scores in the ring buffer, oldest first."""
+        if state is None or not state['count']:
+            return np.empty(0), np.empty(0)
+        order = (np.arange(-state['count'], 0) + state['head']) % \
+            self.max_frames
+        return np.asarray(state['times'])[order], \
+            np.asarray(state['values'])[order]
+
+
+class PeakHoldScorer:
+    """Holds the highest current score, releasing it over time.
+
+    The held peak loses half its value every release seconds and is
+    replaced by any frame scoring higher, so a single dangerous moment
+    stays visible for a while instead of being averaged away.
+    """
+
+    name = 'peak'
+
+    def __init__(self, penalties=None, release=30.0):
+        """Scorer constructor."""
+        self.penalties = list(PENALTY_VECTOR if penalties is None
+                              else penalties)
+        self.release = release
+
+    def update(self, score, state, label, confidence, taken_at):
+        """Return score and state after one frame; state is last time."""
+        weight = MIN_WEIGHT if state is None else \
+            decay_weight(taken_at - state, self.release)
+        return max(self.penalties[label] * confidence, weight * score), \
+            taken_at
+
+    def update_batch(self, score, state, labels, confidences, times):
+        """Return the score after every frame, and the final state.
+
+        In logs, s_j = max(x_j, w_j * s_j-1) becomes a running maximum of
+        log x_k - L_k, L_j being the sum of log weights up to frame j.
+        """
+        log_weights = np.cumsum(np.log(decay_weights(
+            intervals(state, times), self.release)))
+        with np.errstate(divide='ignore'):
+            logs = np.log(np.concatenate([[score], current_scores(
+                labels, confidences, self.penalties)]))
+        logs[1:] -= log_weights
+        return np.exp(np.maximum.accumulate(logs)[1:] + log_weights), \
+            float(times[-1])
+
+
+SCORERS = {scorer.name: scorer for scorer in
+           (HalvingScorer, DecayScorer, WindowScorer, PeakHoldScorer)}
+
+
+def make_scorer(name, penalties=None, **options):
+    """Create the scorer registered under name with its options."""
+    if name not in SCORERS:
+        raise ValueError('unknown scorer %r, expected one of %s'
+                         % (name, ', '.join(sorted(SCORERS))))
+    return SCORERS[name](penalties=penalties, **options)
@@ -0,0 +1,74 @@
+"""Temporal frame skipping for per user frame streams.
+
+Consecutive frames from a driver's camera differ very little. The skipper
+keeps, per user, the last frame that was actually classified along with its
+result, and hands that result back for new frames whose mean absolute pixel
+difference from it is below a threshold. Comparing against the last
+classified frame (not the last received one) keeps slow drift from being
+skipped forever, and max_reuse forces a fresh classification every so often.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import cv2
+
+
+class FrameSkipper:
+    """Reuses the previous classification for near identical frames."""
+
+    def __init__(self, threshold, max_reuse=10, max_users=10000):
+        """Frame skipper constructor."""
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.max_users = max_users
+        self.skipped = 0
+        self.classified = 0
+        # username -> [last classified frame, its result, times reused]
+        self._streams = OrderedDict()
+        self._lock = Lock()
+
+    def lookup(self, username, frame):
+        """Return the reusable result for a (channels, x, y) frame, or None."""
+        with self._lock:
+            stream = self._streams.get(username)
+            if stream is None or stream[2] >= self.max_reuse or \
+                    mean_abs_difference(frame, stream[0]) >= self.threshold:
+                self.classified += 1
+                return None
+            stream[2] += 1
+            self._streams.move_to_end(username)
+            self.skipped += 1
+            return stream[1]
+
+    def update(self, username, frame, result):
+        """Remember a freshly classified frame and its result."""
+        with self._lock:
+            stream = self._streams.get(username)
+            if stream is None or stream[0].shape != frame.shape:
+                stream = [np.empty(frame.shape, dtype=np.float32), None, 0]
+                self._streams[username] = stream
+            np.copyto(stream[0], frame, casting='unsafe')
+            stream[1] = result
+            stream[2] = 0
+            self._streams.move_to_end(username)
+            while len(self._streams) > self.max_users:
+                self._streams.popitem(last=False)
+
+    def stats(self):
+        """Return frame skipping counters."""
+        with self._lock:
+            frames = self.skipped + self.classified
+            return {'users': len(self._streams),
+                    'skipped': self.skipped,
+                    'classified': self.classified,
+                    'skip_rate': self.skipped / frames if frames else 0.0}
+
+
+def mean_abs_difference(frame, other):
+    """Mean absolute pixel difference between two frames, without copies."""
+    # cv2.norm wants 2D input; the reshape is a view for contiguous frames
+    rows = frame.shape[0] * frame.shape[1]
+    return cv2.norm(np.asarray(frame, dtype=np.float32).reshape(rows, -1),
+                    other.reshape(rows, -1), cv2.NORM_L1) / frame.size
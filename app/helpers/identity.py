@@ -0,0 +1,104 @@
+"""Cache of user identities, so that a request resolves its user once.
+
+Authenticating a request, checking the requester's access and storing its
+image refs each used to look the user up by username again. The identity
+of a user, that is id, username, active flag and password hash, is cached
+per worker in a bounded LRU map with a time to live. User.save invalidates
+the entries of the user in this worker; other workers keep using theirs
+for up to the time to live, so a changed password or deactivation may take
+that long to be noticed by them.
+"""
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from time import monotonic
+
+from passlib.apps import custom_app_context as pwd_context
+
+identity_cache_lock = Lock()
+
+
+class Identity(namedtuple('Identity',
+                          ['id', 'username', 'active', 'password_hash'])):
+    """The columns of a user needed to authenticate and authorize it."""
+
+    __slots__ = ()
+
+    def verify_password(self, password):
+        """Verify plain text user provided password against stored hash."""
+        return pwd_context.verify(password, self.password_hash)
+
+
+class IdentityCache:
+    """Thread safe LRU map of username to identity with a time to live."""
+
+    def __init__(self, load, max_size=10000, ttl=30):
+        """Cache constructor.
+
+        load(username) returns the identity of a user, or None; it is
+        called on misses and expired entries.
+        """
+        self.load = load
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # bumped by every invalidation, so that an identity loaded while a
+        # user was being saved is not cached
+        self._generation = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, username):
+        """Return the identity of a user, or None if there is no such user."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        identity = self.load(username)
+        if identity is not None:
+            with self._lock:
+                if generation != self._generation:
+                    return identity
+                self._entries[username] = (monotonic() + self.ttl, identity)
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id, username):
+        """Forget the identity of a user that has changed.
+
+        Saves are rare, so the entries are scanned for the user id, which
+        also finds the user under the username it had before a rename.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items()
+                     if key == username or entry[1].id == user_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            return {'size': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'invalidations': self.invalidations}
+
+
+def get_identity_cache(app, load):
+    """Return the identity cache of the app, creating it once."""
+    with identity_cache_lock:
+        if 'identity_cache' not in app.extensions:
+            app.extensions['identity_cache'] = IdentityCache(
+                load, max_size=app.config['IDENTITY_CACHE_SIZE'],
+                ttl=app.config['IDENTITY_CACHE_TTL'])
+    return app.extensions['identity_cache']
@@ -0,0 +1,86 @@
+"""Index of image objects already in storage, for upload deduplication.
+
+Images are stored under keys derived from the SHA-256 of their bytes, so an
+upload of bytes a user has stored before can be skipped and the new image
+ref pointed at the existing objects. The index answers "which links hold
+these bytes" (the image and its thumbnail, if any) from a bounded in-process
+LRU map in front of the image_refs table, and counts the uploads (image
+and thumbnail) and bytes it saved. The bytes are those of the objects as
+stored, after any transform; they are only known for objects stored by this
+process, as the table does not record sizes.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+object_index_lock = Lock()
+
+
+class ObjectIndex:
+    """Thread safe LRU map of (user id, digest) to the stored links."""
+
+    def __init__(self, load, max_size=100000):
+        """Index constructor.
+
+        load(user_id, digest) returns the links of stored objects with that
+        digest, or None; it is called on misses of the in-process map.
+        """
+        self.load = load
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.puts_saved = 0
+        self.bytes_saved = 0
+        self._links = OrderedDict()
+        self._lock = Lock()
+
+    def lookup(self, user_id, digest):
+        """Return the links of stored bytes with digest, or None."""
+        key = (user_id, digest)
+        with self._lock:
+            entry = self._links.get(key)
+            if entry is not None:
+                self._links.move_to_end(key)
+        if entry is None:
+            links = self.load(user_id, digest)
+            if links is not None:
+                entry = (links, None)
+                self.remember(user_id, digest, links)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            links, size = entry
+            self.hits += 1
+            self.puts_saved += sum(link is not None for link in links)
+            self.bytes_saved += size or 0
+        return links
+
+    def remember(self, user_id, digest, links, size=None):
+        """Record the links bytes with digest were stored under.
+
+        size is the number of bytes stored under the links, if known.
+        """
+        with self._lock:
+            self._links[(user_id, digest)] = (links, size)
+            self._links.move_to_end((user_id, digest))
+            while len(self._links) > self.max_size:
+                self._links.popitem(last=False)
+
+    def stats(self):
+        """Return deduplication counters."""
+        with self._lock:
+            return {'objects': len(self._links),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'puts_saved': self.puts_saved,
+                    'bytes_saved': self.bytes_saved}
+
+
+def get_object_index(app, load):
+    """Return the object index of the app, creating it once."""
+    with object_index_lock:
+        if 'object_index' not in app.extensions:
+            app.extensions['object_index'] = ObjectIndex(
+                load, max_size=app.config['STORAGE_INDEX_SIZE'])
+    return app.extensions['object_index']
@@ -0,0 +1,82 @@
+"""Bounded LRU cache of classification results.
+
+Results are keyed per user, either by a SHA-256 hash of the uploaded bytes
+(exact repeats) or by a perceptual difference hash of the downscaled frame
+(near duplicates, e.g. a parked car sending the same view over and over).
+Keys always contain the username, so one user's uploads never produce
+another user's result.
+"""
+
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+import numpy as np
+import cv2
+
+
+def content_key(username, image):
+    """Build the cache key for the exact bytes of an upload."""
+    return (username, 'sha256', sha256(image).digest())
+
+
+def perceptual_key(username, frame):
+    """Build the cache key for a (channels, x, y) frame's difference hash."""
+    return (username, 'dhash', difference_hash(frame))
+
+
+def difference_hash(frame):
+    """Return the 64 bit difference hash of a (channels, x, y) frame.
+
+    The grayscale frame is shrunk to 9x8 pixels and every bit records
+    whether a pixel is brighter than its right hand neighbour, which is
+    stable under noise and small changes in exposure.
+    """
+    gray = np.asarray(frame, dtype=np.float32).mean(axis=0)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+
+
+class ResultCache:
+    """Thread safe LRU cache with a time to live per entry."""
+
+    def __init__(self, max_size=1024, ttl=300):
+        """Cache constructor."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        """Cache result under key, evicting the least recently used."""
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,54 @@
+"""Retention policy deciding which classified frames are stored in full.
+
+Most frames show safe driving and are never looked at again, yet storing
+one costs an upload and an image_refs row with ten probabilities. The
+selective policy stores a frame in full only if it was predicted as one of
+the distracted classes, or predicted with low confidence, and samples one
+in every sample_every safe frames of each user; the other frames only leave
+a compact score record, so every user's score timeline stays complete.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class RetentionPolicy:
+    """Thread safe selective retention with per user sampling counters."""
+
+    def __init__(self, safe_classes=(0,), min_confidence=0.6,
+                 sample_every=20, max_users=10000):
+        """Policy constructor, a sample_every of 0 keeps no safe frames."""
+        self.safe_classes = frozenset(safe_classes)
+        self.min_confidence = min_confidence
+        self.sample_every = sample_every
+        self.max_users = max_users
+        self.kept = 0
+        self.sampled = 0
+        self.dropped = 0
+        # safe frames seen per user, least recently seen users first
+        self._counts = OrderedDict()
+        self._lock = Lock()
+
+    def keep(self, user_id, prediction, confidence):
+        """Check whether a classified frame is to be stored in full."""
+        with self._lock:
+            if prediction not in self.safe_classes or \
+                    confidence < self.min_confidence:
+                self.kept += 1
+                return True
+            count = self._counts.pop(user_id, 0)
+            self._counts[user_id] = count + 1
+            while len(self._counts) > self.max_users:
+                self._counts.popitem(last=False)
+            if self.sample_every and count % self.sample_every == 0:
+                self.sampled += 1
+                return True
+            self.dropped += 1
+            return False
+
+    def stats(self):
+        """Return retention counters."""
+        with self._lock:
+            return {'kept': self.kept,
+                    'sampled': self.sampled,
+                    'dropped': self.dropped}
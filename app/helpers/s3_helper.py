@@ -1,28 +1,40 @@
-"""S3 helper using Boto3."""
+"""S3 helper using Boto3, used by the s3 storage backend.
 
-import boto3
-from flask import current_app
+Building a boto3 client resolves credentials and endpoints and starts with
+an empty connection pool, so the client is created once per app and process
+and shared by all its threads (boto3 clients are thread safe, sessions are
+not, hence the private session). A client inherited through a fork would share
+its pooled sockets with the parent, so a forked worker builds its own.
+"""
 
+import os
+from threading import Lock
 
-def upload_file_to_s3(image, fileStoreObj, acl="public-read"):
-    """S3 file uploader."""
-    app = current_app._get_current_object()
+import boto3
+from botocore.config import Config
 
-    s3 = boto3.client(
-       "s3",
-       aws_access_key_id=app.config['S3_KEY'],
-       aws_secret_access_key=app.config['S3_SECRET']
-       )
+_client_lock = Lock()
 
-    try:
-        s3.put_object(Body=image,
-                      Bucket=app.config['S3_BUCKET'],
-                      ACL=acl,
-                      ContentType=fileStoreObj.content_type,
-                      Key=fileStoreObj.filename)
 
-    except Exception as e:
-        print("An Error occurred: ", e)
-        return e
-    return "{}{}".format(app.config["S3_LOCATION"],
-                         fileStoreObj.filename)
+def get_s3_client(app):
+    """Return the S3 client of the app, creating it once per process."""
+    pid, client = app.extensions.get('s3_client', (None, None))
+    if pid == os.getpid():
+        return client
+    with _client_lock:
+        pid, client = app.extensions.get('s3_client', (None, None))
+        if pid != os.getpid():
+            session = boto3.session.Session(
+                aws_access_key_id=app.config['S3_KEY'],
+                aws_secret_access_key=app.config['S3_SECRET'])
+            client = session.client(
+                "s3",
+                endpoint_url=app.config['S3_ENDPOINT_URL'],
+                config=Config(
+                    max_pool_connections=app.config['S3_MAX_POOL_CONNECTIONS'],
+                    connect_timeout=app.config['S3_CONNECT_TIMEOUT'],
+                    read_timeout=app.config['S3_READ_TIMEOUT'],
+                    retries={'max_attempts': app.config['S3_MAX_ATTEMPTS'],
+                             'mode': 'standard'}))
+            app.extensions['s3_client'] = (os.getpid(), client)
+    return client
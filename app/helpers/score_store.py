@@ -0,0 +1,164 @@
+"""Server side running distraction score per user.
+
+Clients used to send the score of their previous frame with every upload,
+which goes wrong as soon as they reconnect or upload out of order. The store
+keeps every user's current score in a compact user_scores row and caches it
+in process, so scoring a frame needs no history scan and, on a cache hit, no
+read at all.
+
+Updates are atomic per user: within a process a lock serializes a user's
+frames, and across processes the row's frame counter and score act as a
+version. The new score is only written if the row still holds the cached
+ones; otherwise another worker got there first (or rescore.py rewrote the
+score), the cached score is dropped and the frames are aggregated again on
+top of the fresh row.
+
+Scores are computed by one of the scorers of the aggregator module; scorers
+that keep per user state of their own (e.g. the time of the last frame)
+have it stored as JSON next to the score.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from time import time
+import json
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+
+from ..models import db, UserScore
+from .aggregator import HalvingScorer
+
+
+class ScoreStore:
+    """Write through cache of the users' running distraction scores."""
+
+    def __init__(self, scorer=None, initial_score=0.0, max_users=10000,
+                 stripes=64):
+        """Score store constructor."""
+        self.scorer = scorer or HalvingScorer()
+        self.initial_score = initial_score
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+        # user id -> (score, frames, scorer state) as last written by this
+        # process
+        self._scores = OrderedDict()
+        self._lock = Lock()
+        self._user_locks = [Lock() for _ in range(stripes)]
+
+    def update(self, user_id, labels, confidences, prev_score=None,
+               times=None):
+        """Aggregate frames into a user's score and commit it.
+
+        Returns the score after each frame. prev_score, if given, overrides
+        the stored score as the score before the first frame. times are the
+        unix times the frames were taken at, now by default.
+        """
+        if not len(labels):
+            return []
+        if times is None:
+            times = [time()] * len(labels)
+        with self._user_locks[user_id % len(self._user_locks)]:
+            while True:
+                cached, frames, state = self._current(user_id)
+                score = cached if prev_score is None else prev_score
+                try:
+                    scores, state = self._aggregate(score, state, labels,
+                                                    confidences, times)
+                    entry = (scores[-1], frames + len(scores), state)
+                    updated = UserScore.compare_and_set(
+                        user_id, frames, cached,
+                        {'score': entry[0], 'frames': entry[1],
+                         'state': json.dumps(state)})
+                except Exception:
+                    # scorers may have changed the cached state in place
+                    self._forget(user_id)
+                    raise
+                if updated:
+                    self._remember(user_id, entry)
+                    return scores
+                # another process wrote the row since it was cached
+                self._forget(user_id)
+                with self._lock:
+                    self.conflicts += 1
+
+    def reset(self, user_id, score, frames, state=None):
+        """Overwrite a user's score, e.g. after re-scoring the history.
+
+        Other processes still caching the old score notice on their next
+        update, as the row no longer holds it.
+        """
+        with self._user_locks[user_id % len(self._user_locks)]:
+            values = {'score': score, 'frames': frames,
+                      'state': json.dumps(state) if state is not None
+                      else None}
+            try:
+                if not UserScore.query.filter_by(user_id=user_id).update(
+                        dict(values, updated_at=func.now()),
+                        synchronize_session=False):
+                    db.session.add(UserScore(user_id=user_id, **values))
+                db.session.commit()
+            finally:
+                self._forget(user_id)
+
+    def stats(self):
+        """Return score cache counters."""
+        with self._lock:
+            return {'users': len(self._scores),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'conflicts': self.conflicts}
+
+    def _aggregate(self, score, state, labels, confidences, times):
+        """Run the scorer over frames, one by one for a single frame."""
+        if len(labels) == 1:
+            score, state = self.scorer.update(score, state, labels[0],
+                                              confidences[0], times[0])
+            return [score], state
+        scores, state = self.scorer.update_batch(score, state, labels,
+                                                 confidences, times)
+        return scores.tolist(), state
+
+    def _current(self, user_id):
+        """Return the cached (score, frames, state) of a user."""
+        with self._lock:
+            entry = self._scores.get(user_id)
+            if entry is not None:
+                self._scores.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = self._load(user_id)
+        self._remember(user_id, entry)
+        return entry
+
+    def _load(self, user_id):
+        """Read a user's (score, frames, state), creating the row."""
+        row = db.session.query(UserScore.score, UserScore.frames,
+                               UserScore.state).filter_by(
+            user_id=user_id).first()
+        if row is not None:
+            return row.score, row.frames, \
+                json.loads(row.state) if row.state else None
+        try:
+            UserScore.create(user_id, self.initial_score)
+        except IntegrityError:
+            # created by a concurrent first upload of the same user
+            db.session.rollback()
+            return self._load(user_id)
+        return self.initial_score, 0, None
+
+    def _forget(self, user_id):
+        """Drop a user's cached score."""
+        with self._lock:
+            self._scores.pop(user_id, None)
+
+    def _remember(self, user_id, entry):
+        """Cache a user's score entry, evicting the oldest users."""
+        with self._lock:
+            self._scores[user_id] = entry
+            self._scores.move_to_end(user_id)
+            while len(self._scores) > self.max_users:
+                self._scores.popitem(last=False)
@@ -0,0 +1,9 @@
+"""Summary statistics of the counters the workers report."""
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest rank), or 0."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[int(round(pct / 100.0 * (len(ordered) - 1)))]
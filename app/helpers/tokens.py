@@ -0,0 +1,126 @@
+"""Signed bearer tokens, so that requests skip the password hash.
+
+Verifying a password runs a deliberately slow hash; at several frames per
+second per driver that used to be a large share of the CPU. Instead, /login
+issues a short-lived token: the user id, username, issue and expiry times
+and a random token id, signed with HMAC-SHA256 under a key derived from
+SECRET_KEY. A token is verified with a constant-time comparison of the
+signature and its expiry time, without touching the database.
+
+Revoked tokens (logout, refresh) and users whose tokens were all revoked
+(password change, deactivation) are kept in a table that every worker loads
+into a RevocationList and reloads every few seconds, so checking revocation
+costs no query per request either; a revoked token may still be accepted by
+other workers until their next reload.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+from threading import Lock
+from time import time, monotonic
+
+
+def _encode(data):
+    """URL safe base64 without padding."""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _decode(data):
+    """Inverse of _encode."""
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+class TokenSigner:
+    """Issues and verifies HMAC signed bearer tokens."""
+
+    def __init__(self, secret_key, ttl=900):
+        """Signer constructor, tokens are valid for ttl seconds."""
+        # a key of its own, so that tokens cannot be forged from other
+        # values signed with the secret key
+        self.key = hmac.new(secret_key.encode(), b'bearer-token',
+                            hashlib.sha256).digest()
+        self.ttl = ttl
+
+    def issue(self, user_id, username, now=None):
+        """Return a new token for a user and its claims."""
+        now = time() if now is None else now
+        claims = {'uid': user_id, 'sub': username, 'iat': now,
+                  'exp': now + self.ttl,
+                  'jti': binascii.hexlify(os.urandom(16)).decode()}
+        payload = _encode(json.dumps(claims, separators=(',', ':')).encode())
+        return (payload + b'.' + _encode(self._sign(payload))).decode(), \
+            claims
+
+    def verify(self, token, now=None):
+        """Return the claims of a valid token, or None."""
+        try:
+            payload, signature = token.encode('ascii').split(b'.')
+            signature = _decode(signature)
+        except (UnicodeEncodeError, ValueError, binascii.Error):
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        claims = json.loads(_decode(payload).decode())
+        if claims['exp'] <= (time() if now is None else now):
+            return None
+        return claims
+
+    def _sign(self, payload):
+        """HMAC-SHA256 of a token payload."""
+        return hmac.new(self.key, payload, hashlib.sha256).digest()
+
+
+class RevocationList:
+    """Revoked token ids and users, reloaded from storage periodically."""
+
+    def __init__(self, load, refresh_interval=5):
+        """List constructor.
+
+        load() returns (key, revoked_at) pairs of revocations that have not
+        expired, where key is a token id, or 'user:<id>' for all tokens of
+        a user issued up to revoked_at.
+        """
+        self.load = load
+        self.refresh_interval = refresh_interval
+        self.reloads = 0
+        self._revoked = {}
+        self._loaded_at = None
+        self._lock = Lock()
+
+    def is_revoked(self, claims):
+        """Check whether a token with valid signature has been revoked."""
+        if self._loaded_at is None or \
+                monotonic() - self._loaded_at >= self.refresh_interval:
+            self.reload()
+        revoked = self._revoked
+        if claims['jti'] in revoked:
+            return True
+        revoked_at = revoked.get('user:%s' % claims['uid'])
+        return revoked_at is not None and claims['iat'] <= revoked_at
+
+    def add(self, key, revoked_at):
+        """Record a revocation made by this worker right away."""
+        with self._lock:
+            revoked = dict(self._revoked)
+            revoked[key] = revoked_at
+            self._revoked = revoked
+
+    def reload(self):
+        """Load the current revocations, one thread at a time."""
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            # another thread is reloading, keep using the last snapshot
+            return
+        try:
+            self._revoked = dict(self.load())
+            self._loaded_at = monotonic()
+            self.reloads += 1
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """Return the revocation counters."""
+        return {'revoked': len(self._revoked), 'reloads': self.reloads}
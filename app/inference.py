@@ -0,0 +1,146 @@
+"""Out-of-process inference over local Unix domain sockets.
+
+An InferenceServer owns a Classifier and answers classification requests
+from web workers on a Unix domain socket, so a slow prediction never blocks a
+web worker from serving other endpoints. Several servers, each pinned to its
+own cores, can run next to each other (see inference_server.py); the
+InferenceClient spreads requests over them round robin and skips servers that
+are down until a retry interval has passed.
+"""
+
+import itertools
+import os
+import threading
+import time
+from multiprocessing.connection import Listener, Client
+
+
+class InferenceUnavailable(Exception):
+    """Raised when no inference server could answer a request."""
+
+
+class InferenceServer:
+    """Serves classification requests for one process owning the model."""
+
+    def __init__(self, address, scheduler, authkey):
+        """Server constructor."""
+        self.address = address
+        self.scheduler = scheduler
+        self.authkey = authkey
+        self.closed = False
+        self._listener = None
+
+    def serve_forever(self):
+        """Accept connections, handling each one on its own thread."""
+        # a socket file left behind by a previous run blocks the bind
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family='AF_UNIX',
+                                  authkey=self.authkey)
+        while not self.closed:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError):
+                # failed handshake, e.g. client with the wrong key, or
+                # the listener was closed
+                continue
+            threading.Thread(target=self.handle, args=(connection,),
+                             daemon=True).start()
+
+    def close(self):
+        """Stop accepting connections and remove the socket file."""
+        self.closed = True
+        if self._listener is not None:
+            self._listener.close()
+
+    def handle(self, connection):
+        """Answer requests on a connection until the client hangs up."""
+        with connection:
+            while True:
+                try:
+                    kind, payload = connection.recv()
+                except (OSError, EOFError):
+                    return
+                try:
+                    connection.send(('ok', self.dispatch(kind, payload)))
+                except (OSError, EOFError):
+                    return
+                except Exception as e:
+                    connection.send(('error', repr(e)))
+
+    def dispatch(self, kind, payload):
+        """Run a single request and return its result."""
+        if kind == 'classify':
+            return self.scheduler.classify(payload)
+        if kind == 'classify_batch':
+            classifier = self.scheduler.classifier
+            return classifier.predict_batch(
+                classifier.preprocess_batch(payload))
+        raise ValueError('unknown request %r' % kind)
+
+
+class InferenceClient:
+    """Routes classification requests to a pool of inference servers."""
+
+    def __init__(self, addresses, authkey, timeout=10, retry_interval=5):
+        """Client constructor."""
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._next = itertools.count()
+        self._down_until = {}
+        # connections are not thread safe, every thread gets its own
+        self._local = threading.local()
+
+    def classify(self, image_stream_data):
+        """Classify image file stream on one of the servers."""
+        return self.request('classify', image_stream_data)
+
+    def classify_batch(self, images):
+        """Classify image file streams with a single batched prediction."""
+        return self.request('classify_batch', images)
+
+    def request(self, kind, payload):
+        """Send a request to the next available server and return result."""
+        start = next(self._next)
+        for i in range(len(self.addresses)):
+            address = self.addresses[(start + i) % len(self.addresses)]
+            if self._down_until.get(address, 0) > time.monotonic():
+                continue
+            try:
+                status, result = self._roundtrip(address, kind, payload)
+            except (OSError, EOFError, TimeoutError):
+                self._drop(address)
+                self._down_until[address] = \
+                    time.monotonic() + self.retry_interval
+                continue
+            if status != 'ok':
+                raise RuntimeError('inference failed: %s' % result)
+            return result
+        raise InferenceUnavailable('no inference server available')
+
+    def _roundtrip(self, address, kind, payload):
+        """Send a request over this thread's connection to address."""
+        connections = self._connections()
+        if address not in connections:
+            connections[address] = Client(address, family='AF_UNIX',
+                                          authkey=self.authkey)
+        connection = connections[address]
+        connection.send((kind, payload))
+        if not connection.poll(self.timeout):
+            raise TimeoutError('inference server %s timed out' % address)
+        return connection.recv()
+
+    def _drop(self, address):
+        """Close and forget this thread's connection to address."""
+        connection = self._connections().pop(address, None)
+        if connection is not None:
+            connection.close()
+
+    def _connections(self):
+        """Return this thread's connections by address."""
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
@@ -0,0 +1,88 @@
+"""Background worker pool for asynchronous classification jobs.
+
+The API enqueues a job and answers right away; worker threads in the same
+process then run the job handler inside an application context. Job state
+lives in the database (see ClassificationJob), so the client can poll for the
+outcome on any web worker, not only on the one that accepted the job.
+"""
+
+import os
+import threading
+from collections import deque
+from queue import Queue
+from time import monotonic
+
+from .helpers.stats import percentile
+from .models import db
+
+
+class JobQueue:
+    """Bounded queue of jobs served by a pool of worker threads."""
+
+    def __init__(self, app, handler, workers=2, max_size=100):
+        """Job queue constructor."""
+        self.app = app
+        self.handler = handler
+        self.workers = workers
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        # seconds from enqueueing to completion of recent jobs
+        self.latencies = deque(maxlen=1000)
+        self._queue = Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def submit(self, job_id, payload):
+        """Enqueue a job, raising queue.Full if the queue is at capacity."""
+        self._ensure_workers()
+        self._queue.put_nowait((job_id, payload, monotonic()))
+
+    def stats(self):
+        """Return queue depth, job counters and latency percentiles."""
+        latencies = list(self.latencies)
+        return {'queue_depth': self._queue.qsize(),
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'latency_p50_ms': percentile(latencies, 50) * 1000,
+                'latency_p95_ms': percentile(latencies, 95) * 1000}
+
+    def _ensure_workers(self):
+        """Start the worker threads, again after a fork if necessary."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = [
+                    threading.Thread(target=self._run, daemon=True,
+                                     name='classification-job-%d' % i)
+                    for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        """Worker loop handling one job at a time."""
+        while True:
+            job_id, payload, queued_at = self._queue.get()
+            with self._lock:
+                self.running += 1
+            succeeded = False
+            with self.app.app_context():
+                try:
+                    self.handler(job_id, payload)
+                    succeeded = True
+                except Exception:
+                    self.app.logger.exception('classification job %s failed',
+                                              job_id)
+                finally:
+                    db.session.remove()
+            with self._lock:
+                self.running -= 1
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.latencies.append(monotonic() - queued_at)
@@ -1,13 +1,31 @@
 """Module contains all database models."""
 
+from datetime import datetime, timezone
+from hashlib import sha256
+import struct
+from time import time
+
 from flask_sqlalchemy import SQLAlchemy
 from passlib.apps import custom_app_context as pwd_context
+from sqlalchemy import and_
 from sqlalchemy.sql import func
 
-from .helpers.s3_helper import upload_file_to_s3
+from flask import current_app
+
+from .group_commit import get_group_commit_writer
+from .helpers.identity import Identity, get_identity_cache
+from .helpers.object_index import get_object_index
+from .storage import get_storage, object_key, thumbnail_key, \
+    file_extension
+from .transform import ImageTransform, TransformedImage
+from .uploads import get_upload_queue
 
 db = SQLAlchemy()
 
+# the class probabilities of an image ref, as little endian float32
+CLASSES = 10
+PROBABILITIES = struct.Struct('<%df' % CLASSES)
+
 
 class User(db.Model):
     """User model."""
@@ -38,60 +56,422 @@ class User(db.Model):
         """Save user to DB. This includes create and update operations."""
         db.session.add(self)
         db.session.commit()
+        User.identity_cache().invalidate(self.id, self.username)
+
+    @staticmethod
+    def find_identity(username):
+        """Return the cached identity of a user, or None."""
+        return User.identity_cache().get(username)
+
+    @staticmethod
+    def load_identity(username):
+        """Load the identity of a user from DB, or None."""
+        row = db.session.query(User.id, User.username, User.active,
+                               User.password_hash) \
+            .filter_by(username=username).first()
+        return Identity(*row) if row is not None else None
+
+    @staticmethod
+    def identity_cache():
+        """Return the app's cache of user identities."""
+        return get_identity_cache(current_app._get_current_object(),
+                                  User.load_identity)
 
     def __repr__(self):
         """User representation."""
         return '<user %r>' % (self.username)
 
 
+def _probability(label):
+    """Property accessing the probability of one class of an image ref."""
+    def get(self):
+        probabilities = self.probabilities
+        return probabilities[label] if probabilities is not None else None
+
+    def set(self, value):
+        probabilities = self.probabilities or [0.0] * CLASSES
+        probabilities[label] = value
+        self.probabilities = probabilities
+    return property(get, set, doc='Probability of class c%d.' % label)
+
+
+def utcnow():
+    """Return the current time in UTC, as taken_at defaults to."""
+    return datetime.now(timezone.utc)
+
+
+def column_values(row):
+    """Return the values of the columns set on a model instance."""
+    values = {}
+    for column in type(row).__table__.columns:
+        value = getattr(row, column.key)
+        # unset columns are left to their defaults
+        if value is not None:
+            values[column.key] = value
+    return values
+
+
+def group_commit(app, rows, then=None):
+    """Insert model instances of one user through the group commit writer.
+
+    Their ids are set and then() is called once they are committed: before
+    returning with 'flush' durability, on the writer thread with 'early',
+    where a failure is left to the user's next flush.
+    """
+    writer = get_group_commit_writer(app, db)
+    future = writer.submit(type(rows[0]).__table__,
+                           [column_values(row) for row in rows],
+                           owner=rows[0].user_id)
+
+    def committed(future):
+        for row, row_id in zip(rows, future.result()):
+            row.id = row_id
+        if then is not None:
+            then()
+
+    def done(future):
+        if future.exception() is None:
+            committed(future)
+    if writer.durability == 'flush':
+        committed(future)
+    else:
+        future.add_done_callback(done)
+
+
 class ImageRef(db.Model):
     """Image references associated with a user."""
 
     __tablename__ = 'image_refs'
+    # finds stored objects by content for upload deduplication, and walks
+    # the history of a user in order for keyset pagination
+    __table_args__ = (db.Index('ix_image_refs_user_id_sha256',
+                               'user_id', 'sha256'),
+                      db.Index('ix_image_refs_user_id_taken_at_id',
+                               'user_id', 'taken_at', 'id'))
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
-        db.Integer, db.ForeignKey('users.id'), index=True, nullable=False)
+        db.Integer, db.ForeignKey('users.id'), nullable=False)
     link = db.Column(db.String(200), index=True, nullable=False)
-    predicted_label = db.Column(db.String(10), index=True, nullable=False)
-    taken_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
-    distraction_score = db.Column(db.Float, index=True, nullable=False)
-    c0 = db.Column(db.Float)
-    c1 = db.Column(db.Float)
-    c2 = db.Column(db.Float)
-    c3 = db.Column(db.Float)
-    c4 = db.Column(db.Float)
-    c5 = db.Column(db.Float)
-    c6 = db.Column(db.Float)
-    c7 = db.Column(db.Float)
-    c8 = db.Column(db.Float)
-    c9 = db.Column(db.Float)
+    predicted_label = db.Column(db.String(10), nullable=False)
+    # defaults to the microsecond in Python, like the times cursors and
+    # rescore.py compare it with (SQLite's now() has whole seconds only)
+    taken_at = db.Column(db.DateTime(timezone=True), default=utcnow,
+                         server_default=func.now())
+    distraction_score = db.Column(db.Float, nullable=False)
+    # 40 bytes instead of ten float columns, read through the properties
+    packed_probabilities = db.Column(db.LargeBinary(PROBABILITIES.size))
     exported = db.Column(db.Boolean, index=True, nullable=False, default=False)
+    # 'pending' while a write-behind upload is queued, then 'stored'
+    upload_status = db.Column(db.String(10), index=True, nullable=False,
+                              default='stored')
+    # hex SHA-256 of the image bytes, which its storage key derives from
+    sha256 = db.Column(db.String(64))
+    # small JPEG of the image for listings, None without thumbnails
+    thumbnail_link = db.Column(db.String(200))
 
     def __init__(self, image, prediction, probabilities,
-                 username, fileStoreObj, distraction_score):
-        """Extract class variables from the provided params."""
+                 username, fileStoreObj, distraction_score, frame=None,
+                 user_id=None):
+        """Extract class variables from the provided params.
+
+        frame is the image as decoded by the classifier, if at hand, which
+        the storage transform reuses. user_id saves looking up username.
+        """
         self.image = image
+        self.frame = frame
         self.fileStoreObj = fileStoreObj
         self.distraction_score = distraction_score
-        self.user_id = User.query.filter_by(username=username).first().id,
+        self.user_id = user_id if user_id is not None else \
+            User.find_identity(username).id
         self.predicted_label = prediction
-        self.c0 = probabilities[0]
-        self.c1 = probabilities[1]
-        self.c2 = probabilities[2]
-        self.c3 = probabilities[3]
-        self.c4 = probabilities[4]
-        self.c5 = probabilities[5]
-        self.c6 = probabilities[6]
-        self.c7 = probabilities[7]
-        self.c8 = probabilities[8]
-        self.c9 = probabilities[9]
+        self.probabilities = probabilities
+
+    @property
+    def probabilities(self):
+        """Probabilities of the classes c0..c9, or None if not set."""
+        if self.packed_probabilities is None:
+            return None
+        return list(PROBABILITIES.unpack(self.packed_probabilities))
+
+    @probabilities.setter
+    def probabilities(self, probabilities):
+        """Pack the probabilities of the classes c0..c9."""
+        self.packed_probabilities = PROBABILITIES.pack(*probabilities)
+
+    # the former probability columns, read and written through the vector
+    c0 = _probability(0)
+    c1 = _probability(1)
+    c2 = _probability(2)
+    c3 = _probability(3)
+    c4 = _probability(4)
+    c5 = _probability(5)
+    c6 = _probability(6)
+    c7 = _probability(7)
+    c8 = _probability(8)
+    c9 = _probability(9)
 
     def save(self):
-        """Saving image aata to S2, and image ref object to DB."""
-        self.link = upload_file_to_s3(self.image, self.fileStoreObj)
-        db.session.add(self)
+        """Saving image data to storage, and image ref object to DB."""
+        ImageRef.save_all([self])
+
+    @staticmethod
+    def save_all(image_refs):
+        """Save several image refs to storage and DB in one transaction.
+
+        Images are stored under content addressed keys; with STORAGE_DEDUP
+        bytes the user stored before are not uploaded again and the links
+        point at the existing objects. With STORAGE_TRANSFORM the images are
+        re-encoded and thumbnailed before they are stored. With
+        UPLOAD_WRITE_BEHIND the rows are committed first, pending, and the
+        images are queued for upload in the background. With GROUP_COMMIT
+        the rows are inserted by the group commit writer, together with the
+        rows of concurrent requests.
+        """
+        app = current_app._get_current_object()
+        write_behind = app.config['UPLOAD_WRITE_BEHIND']
+        index = get_object_index(app, ImageRef.find_stored_links) \
+            if app.config['STORAGE_DEDUP'] else None
+        transform = ImageTransform.from_config(app) \
+            if app.config['STORAGE_TRANSFORM'] else None
+        day = datetime.utcnow().strftime('%Y/%m/%d')
+        uploads = []
+        for image_ref in image_refs:
+            image_ref.sha256 = sha256(image_ref.image).hexdigest()
+            links = index.lookup(image_ref.user_id, image_ref.sha256) \
+                if index else None
+            if links is not None:
+                image_ref.link, image_ref.thumbnail_link = links
+                continue
+            content_type = image_ref.fileStoreObj.content_type
+            extension = file_extension(image_ref.fileStoreObj.filename)
+            image_ref.stored = transform.apply(
+                image_ref.image, content_type, extension, image_ref.frame) \
+                if transform else TransformedImage(
+                    image_ref.image, content_type, extension, None)
+            image_ref.key = object_key(image_ref.user_id, day,
+                                       image_ref.sha256,
+                                       image_ref.stored.extension)
+            image_ref.thumbnail_key = thumbnail_key(image_ref.key) \
+                if image_ref.stored.thumbnail is not None else None
+            uploads.append(image_ref)
+            if write_behind:
+                image_ref.link = ''
+                image_ref.upload_status = 'pending'
+            else:
+                storage = get_storage(app)
+                image_ref.link = storage.put(
+                    image_ref.key, image_ref.stored.data,
+                    image_ref.stored.content_type)
+                if image_ref.thumbnail_key is not None:
+                    image_ref.thumbnail_link = storage.put(
+                        image_ref.thumbnail_key, image_ref.stored.thumbnail,
+                        'image/jpeg')
+        if not app.config['GROUP_COMMIT']:
+            db.session.add_all(image_refs)
+            db.session.commit()
+            ImageRef.after_commit(app, uploads, index)
+            return
+        group_commit(app, image_refs,
+                     lambda: ImageRef.after_commit(app, uploads, index))
+
+    @staticmethod
+    def after_commit(app, uploads, index):
+        """Queue the images of committed image refs or index them."""
+        if app.config['UPLOAD_WRITE_BEHIND'] and uploads:
+            queue = get_upload_queue(app, ImageRef.mark_stored)
+            for image_ref in uploads:
+                queue.submit(image_ref.id, image_ref.stored.data,
+                             image_ref.key, image_ref.stored.content_type,
+                             image_ref.stored.thumbnail,
+                             image_ref.thumbnail_key)
+        elif index is not None:
+            for image_ref in uploads:
+                stored = image_ref.stored
+                index.remember(image_ref.user_id, image_ref.sha256,
+                               (image_ref.link, image_ref.thumbnail_link),
+                               len(stored.data) + len(stored.thumbnail or b''))
+
+    @staticmethod
+    def wait_committed(user_id=None):
+        """Wait for frames acknowledged ahead of their commit.
+
+        Raises GroupCommitError if frames of user_id acknowledged early
+        failed to commit.
+        """
+        app = current_app._get_current_object()
+        if app.config['GROUP_COMMIT'] and \
+                app.config['GROUP_COMMIT_DURABILITY'] == 'early':
+            get_group_commit_writer(app, db).flush(user_id)
+
+    @staticmethod
+    def find_stored_links(user_id, digest):
+        """Return (link, thumbnail link) of an image with digest, or None."""
+        row = db.session.query(ImageRef.link, ImageRef.thumbnail_link) \
+            .filter_by(user_id=user_id, sha256=digest,
+                       upload_status='stored').first()
+        return (row.link, row.thumbnail_link) if row is not None else None
+
+    @staticmethod
+    def mark_stored(image_ref_id, link, thumbnail_link=None):
+        """Record the links of an image uploaded in the background."""
+        ImageRef.query.filter_by(id=image_ref_id).update(
+            {'link': link, 'thumbnail_link': thumbnail_link,
+             'upload_status': 'stored'},
+            synchronize_session=False)
         db.session.commit()
 
     def __repr__(self):
         """Image representation."""
         return self.link
+
+
+class ScoreRecord(db.Model):
+    """Compact record of a classified frame that was not stored in full."""
+
+    __tablename__ = 'score_records'
+    # reads a user's score timeline in order
+    __table_args__ = (db.Index('ix_score_records_user_id_taken_at',
+                               'user_id', 'taken_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('users.id'), nullable=False)
+    predicted_label = db.Column(db.SmallInteger, nullable=False)
+    confidence = db.Column(db.Float, nullable=False)
+    # defaults to the microsecond in Python, like the times cursors and
+    # rescore.py compare it with (SQLite's now() has whole seconds only)
+    taken_at = db.Column(db.DateTime(timezone=True), default=utcnow,
+                         server_default=func.now())
+    distraction_score = db.Column(db.Float, nullable=False)
+
+    @staticmethod
+    def save_all(score_records):
+        """Save several score records of a user to DB in one transaction.
+
+        With GROUP_COMMIT they are inserted by the group commit writer.
+        """
+        app = current_app._get_current_object()
+        if app.config['GROUP_COMMIT']:
+            group_commit(app, score_records)
+            return
+        db.session.add_all(score_records)
+        db.session.commit()
+
+    def __repr__(self):
+        """Score record representation."""
+        return '<score record %r %.3f>' % (self.user_id,
+                                           self.distraction_score)
+
+
+class UserScore(db.Model):
+    """Current running distraction score of a user."""
+
+    __tablename__ = 'user_scores'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'),
+                        primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    # frames aggregated so far; doubles as the row version that concurrent
+    # writers compare against before overwriting the score
+    frames = db.Column(db.Integer, nullable=False, default=0)
+    # JSON state of the configured scorer, e.g. the time of the last frame
+    state = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime(timezone=True),
+                           server_default=func.now(), onupdate=func.now())
+
+    @staticmethod
+    def create(user_id, score):
+        """Insert a user's first score row, IntegrityError if it exists."""
+        app = current_app._get_current_object()
+        if app.config['GROUP_COMMIT']:
+            get_group_commit_writer(app, db).submit(
+                UserScore.__table__,
+                [{'user_id': user_id, 'score': score, 'frames': 0}]).result()
+            return
+        db.session.add(UserScore(user_id=user_id, score=score, frames=0))
+        db.session.commit()
+
+    @staticmethod
+    def compare_and_set(user_id, frames, score, values):
+        """Update a user's row if it still holds frames and score.
+
+        Returns whether it did. With GROUP_COMMIT the update shares the
+        transaction of the group commit writer, and is waited for.
+        """
+        app = current_app._get_current_object()
+        values = dict(values, updated_at=func.now())
+        if app.config['GROUP_COMMIT']:
+            table = UserScore.__table__
+            statement = table.update().where(and_(
+                table.c.user_id == user_id, table.c.frames == frames,
+                table.c.score == score)).values(values)
+            return get_group_commit_writer(app, db).execute(
+                statement).result() > 0
+        updated = UserScore.query.filter_by(
+            user_id=user_id, frames=frames, score=score).update(
+                values, synchronize_session=False)
+        db.session.commit()
+        return updated > 0
+
+    def __repr__(self):
+        """Score representation."""
+        return '<user score %r %.3f>' % (self.user_id, self.score)
+
+
+class RevokedToken(db.Model):
+    """Revoked bearer token, or all tokens of a user issued before a time."""
+
+    __tablename__ = 'revoked_tokens'
+    # token id, or 'user:<id>' for all tokens of a user
+    key = db.Column(db.String(40), primary_key=True)
+    # epoch seconds, compared with the issue times of tokens
+    revoked_at = db.Column(db.Float, nullable=False)
+    # after this no revoked token is valid anyway and the row can go
+    expires_at = db.Column(db.Float, index=True, nullable=False)
+
+    @staticmethod
+    def revoke(key, revoked_at, expires_at):
+        """Record a revocation, dropping revocations that have expired."""
+        RevokedToken.query.filter(
+            RevokedToken.expires_at < revoked_at).delete(
+            synchronize_session=False)
+        db.session.merge(RevokedToken(key=key, revoked_at=revoked_at,
+                                      expires_at=expires_at))
+        db.session.commit()
+
+    @staticmethod
+    def load_active():
+        """Return (key, revoked_at) of all revocations not yet expired."""
+        return db.session.query(RevokedToken.key, RevokedToken.revoked_at) \
+            .filter(RevokedToken.expires_at > time()).all()
+
+    def __repr__(self):
+        """Revocation representation."""
+        return '<revoked token %r>' % (self.key)
+
+
+class ClassificationJob(db.Model):
+    """Asynchronous classification job and its outcome."""
+
+    __tablename__ = 'classification_jobs'
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('users.id'), index=True, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    result = db.Column(db.Text)
+    error = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime(timezone=True),
+                           server_default=func.now())
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    def save(self):
+        """Save job to DB. This includes create and update operations."""
+        db.session.add(self)
+        db.session.commit()
+
+    @property
+    def finished(self):
+        """Check whether the job has completed, successfully or not."""
+        return self.status in ('done', 'failed')
+
+    def __repr__(self):
+        """Job representation."""
+        return '<classification job %r %s>' % (self.id, self.status)
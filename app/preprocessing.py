@@ -0,0 +1,181 @@
+"""Image preprocessing stage turning uploaded bytes into classifier input.
+
+Uploads are decoded straight from the request buffer, JPEGs that are much
+larger than the model input are decoded at a reduced resolution, and the
+resized frame is written into a preallocated channels first tensor that is
+reused by every request served on the same thread.
+"""
+
+import struct
+import threading
+
+import numpy as np
+import cv2
+
+IMAGE_SIZE = 224
+# largest batch a thread keeps a tensor for, larger ones get a one-off tensor
+MAX_BATCH_SIZE = 32
+
+# JPEG start of frame markers carrying the image dimensions
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG colour types with an alpha channel: grayscale + alpha, RGBA
+PNG_ALPHA_COLOUR_TYPES = (4, 6)
+
+# reduced resolution decode flags by scale factor, largest first
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                        (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpeg_dimensions(data):
+    """Return (width, height) from a JPEG header, or None if not a JPEG."""
+    if data[:2] != b'\xff\xd8':
+        return None
+    offset = 2
+    length = len(data)
+    while offset + 9 <= length:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        # padding bytes before a marker
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return width, height
+        segment_length, = struct.unpack_from('>H', data, offset + 2)
+        offset += 2 + segment_length
+    return None
+
+
+def sniff_content_type(data):
+    """Return the MIME type of JPEG, PNG or GIF data, or None."""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == PNG_SIGNATURE:
+        return 'image/png'
+    if data[:4] == b'GIF8':
+        return 'image/gif'
+    return None
+
+
+def png_has_alpha(data):
+    """Check whether PNG data declares an alpha channel."""
+    return data[:8] == PNG_SIGNATURE and \
+        len(data) > 25 and data[25] in PNG_ALPHA_COLOUR_TYPES
+
+
+def decode_flag(data, min_side=IMAGE_SIZE):
+    """Pick the imdecode flag for data, reducing resolution when possible.
+
+    A JPEG is decoded at 1/2, 1/4 or 1/8 scale as long as the decoded image
+    still covers min_side pixels in both dimensions.
+    """
+    dimensions = jpeg_dimensions(data)
+    if dimensions is not None:
+        smallest_side = min(dimensions)
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if smallest_side // factor >= min_side:
+                return flag | cv2.IMREAD_IGNORE_ORIENTATION
+    if png_has_alpha(data):
+        return cv2.IMREAD_UNCHANGED
+    return cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+
+
+def to_bgr(raw_img):
+    """Convert a decoded image with alpha channel to 8 bit BGR.
+
+    Transparent pixels are composited onto black, so grayscale, colour and
+    alpha inputs all end up with the same three channel layout.
+    """
+    if raw_img.dtype != np.uint8:
+        raw_img = (raw_img >> 8).astype(np.uint8)
+    if raw_img.ndim == 2:
+        return cv2.cvtColor(raw_img, cv2.COLOR_GRAY2BGR)
+    channels = cv2.split(raw_img)
+    if len(channels) == 2:
+        colour = cv2.cvtColor(channels[0], cv2.COLOR_GRAY2BGR)
+    else:
+        colour = cv2.merge(channels[:3])
+    if len(channels) in (2, 4):
+        alpha = cv2.merge([channels[-1]] * 3)
+        colour = cv2.multiply(colour, alpha, scale=1 / 255.0)
+    return colour
+
+
+class Preprocessor:
+    """Decodes and resizes images into reusable per thread buffers."""
+
+    def __init__(self, size=IMAGE_SIZE, dtype='float32',
+                 max_batch_size=MAX_BATCH_SIZE):
+        """Preprocessor constructor."""
+        self.size = size
+        self.dtype = np.dtype(dtype)
+        self.max_batch_size = max_batch_size
+        self._local = threading.local()
+
+    def decode(self, image_stream_data):
+        """Decode image bytes to BGR without copying the request buffer."""
+        np_data_arr = np.frombuffer(image_stream_data, dtype=np.uint8)
+        flag = decode_flag(memoryview(image_stream_data), self.size)
+        raw_img = cv2.imdecode(np_data_arr, flag)
+        if raw_img is None:
+            raise ValueError('unable to decode image')
+        if flag == cv2.IMREAD_UNCHANGED:
+            raw_img = to_bgr(raw_img)
+        return raw_img
+
+    def preprocess(self, image_stream_data, decoded=None):
+        """Preprocess one image into a (1, channels, x, y) tensor.
+
+        The tensor is a buffer owned by the calling thread and is overwritten
+        by the next call on that thread, so it has to be consumed (or copied)
+        before then. If a list is passed as decoded, the decoded BGR frame is
+        appended to it, e.g. to be reused when storing the image.
+        """
+        return self.preprocess_batch([image_stream_data], decoded)
+
+    def preprocess_batch(self, images, decoded=None):
+        """Preprocess images into one (batch, channels, x, y) tensor.
+
+        The same buffer reuse rules as for preprocess apply.
+        """
+        np_batch_tensor = self._batch_buffer(len(images))
+        for image_stream_data, out in zip(images, np_batch_tensor):
+            self.preprocess_into(image_stream_data, out, decoded)
+        return np_batch_tensor
+
+    def preprocess_into(self, image_stream_data, out, decoded=None):
+        """Decode, resize and write an image into a (channels, x, y) array."""
+        resized = self._resized_buffer()
+        frame = self.decode(image_stream_data)
+        if decoded is not None:
+            decoded.append(frame)
+        cv2.resize(frame, (self.size, self.size), dst=resized)
+        # converting to channels first ordering while copying into the
+        # output, which also casts to the model input dtype
+        np.copyto(out, resized.transpose(2, 0, 1), casting='unsafe')
+        return out
+
+    def _resized_buffer(self):
+        """Return this thread's (x, y, channels) uint8 resize target."""
+        resized = getattr(self._local, 'resized', None)
+        if resized is None:
+            resized = np.empty((self.size, self.size, 3), dtype=np.uint8)
+            self._local.resized = resized
+        return resized
+
+    def _batch_buffer(self, batch_size):
+        """Return a view of this thread's tensor holding batch_size images."""
+        if batch_size > self.max_batch_size:
+            # not kept, so that one oversized batch does not pin its memory
+            return np.empty((batch_size, 3, self.size, self.size),
+                            dtype=self.dtype)
+        tensor = getattr(self._local, 'tensor', None)
+        if tensor is None or len(tensor) < batch_size:
+            tensor = np.empty((batch_size, 3, self.size, self.size),
+                              dtype=self.dtype)
+            self._local.tensor = tensor
+        return tensor[:batch_size]
@@ -0,0 +1,103 @@
+"""Micro-batching inference scheduler in front of the classifier.
+
+Concurrent requests hand their preprocessed image to the scheduler, which
+collects them into a single batch and runs one model prediction for all of
+them. A batch is dispatched as soon as it reaches the maximum batch size, or
+when the oldest waiting request has waited for the maximum wait time,
+whichever comes first.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import numpy as np
+
+
+class InferenceScheduler:
+    """Collects concurrent classification requests into batches."""
+
+    def __init__(self, classifier, max_batch_size=16, max_wait_ms=5):
+        """Scheduler constructor."""
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self.batches = 0
+        self.frames = 0
+
+    def classify(self, image_stream_data):
+        """Classify image file stream as part of the next batch."""
+        # decoding happens on the calling thread so that concurrent requests
+        # preprocess in parallel while the worker runs the model. The tensor
+        # lives in this thread's preprocessing buffer, which stays untouched
+        # while we wait for the result
+        np_image_tensor = self.classifier.preprocess(image_stream_data)
+        return self.submit(np_image_tensor).result()
+
+    def submit(self, np_image_tensor):
+        """Queue a preprocessed (1, channels, x, y) tensor for prediction.
+
+        Returns a future resolving to (probabilities, prediction, confidence).
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np_image_tensor, future))
+        return future
+
+    def stats(self):
+        """Return batching counters."""
+        return {'batches': self.batches,
+                'frames': self.frames,
+                'queue_depth': self._queue.qsize(),
+                'mean_batch_size': (self.frames / self.batches
+                                    if self.batches else 0.0)}
+
+    def _ensure_worker(self):
+        """Start the batching thread, again after a fork if necessary."""
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run,
+                                                name='inference-scheduler',
+                                                daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather a batch around it."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker loop running one prediction per collected batch."""
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch]
+            try:
+                np_batch_tensor = np.concatenate(
+                    [tensor for tensor, _ in batch], axis=0)
+                results = self.classifier.predict_batch(np_batch_tensor)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for future, result in zip(futures, results):
+                future.set_result(result)
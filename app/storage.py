@@ -0,0 +1,223 @@
+"""Pluggable object storage for stored images.
+
+Every backend stores opaque bytes under a key and exposes put(key, data,
+content_type) returning the public link of the object, get(key) returning
+its bytes (KeyError if there is none), exists(key) and delete(key). Besides
+S3 (or any S3 compatible server), images can be kept as files on local disk,
+for single node deployments and load tests at disk speed, or in memory for
+tests. Objects of the local and memory backends are served by the API below
+STORAGE_URL. The backend is selected by STORAGE_BACKEND and created once per
+app by get_storage.
+"""
+
+import os
+import posixpath
+import tempfile
+from hashlib import sha1
+from threading import Lock
+
+from botocore.exceptions import ClientError
+
+from .helpers.s3_helper import get_s3_client
+
+storage_lock = Lock()
+
+
+def file_extension(filename):
+    """Return the lower case extension of filename, 'bin' if it has none."""
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename \
+        else 'bin'
+
+
+def object_key(user_id, day, digest, extension):
+    """Build the content addressed key of an image.
+
+    The key is the SHA-256 hex digest of the uploaded bytes, prefixed by user
+    and day (YYYY/MM/DD) for listing, with the extension of the stored image.
+    """
+    return '%s/%s/%s.%s' % (user_id, day, digest, extension)
+
+
+def thumbnail_key(key):
+    """Build the key of the JPEG thumbnail of the image stored under key."""
+    return '%s.thumb.jpg' % key.rsplit('.', 1)[0]
+
+
+class S3Storage:
+    """Stores objects in an S3 bucket through the shared S3 client."""
+
+    name = 's3'
+
+    def __init__(self, client, bucket, location, acl='public-read'):
+        """Storage constructor, location is the prefix of the links."""
+        self.client = client
+        self.bucket = bucket
+        self.location = location
+        self.acl = acl
+
+    @classmethod
+    def from_config(cls, app):
+        """Create the storage from the app config."""
+        if not app.config.get('S3_BUCKET'):
+            raise ValueError('the s3 storage backend needs S3_BUCKET')
+        return cls(get_s3_client(app), app.config['S3_BUCKET'],
+                   app.config['S3_LOCATION'])
+
+    def put(self, key, data, content_type):
+        """Upload an object and return its link."""
+        self.client.put_object(Body=data, Bucket=self.bucket, ACL=self.acl,
+                               ContentType=content_type, Key=key)
+        return self.location + key
+
+    def get(self, key):
+        """Return the bytes of an object."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise KeyError(key)
+            raise
+        return response['Body'].read()
+
+    def exists(self, key):
+        """Check whether an object is stored under key."""
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return False
+            raise
+        return True
+
+    def delete(self, key):
+        """Remove an object, if there is one."""
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class LocalStorage:
+    """Stores objects as files below a root directory.
+
+    Objects are written to a temporary file in the target directory, fsynced
+    and renamed into place, so readers never see a partial object and a
+    crash leaves at most a stray temporary file. The last directory of a key
+    is sharded into 256 subdirectories by a hash of the key, so that a busy
+    user's day does not end up as one huge directory.
+    """
+
+    name = 'local'
+
+    def __init__(self, root, url):
+        """Storage constructor, url is the prefix of the returned links."""
+        self.root = os.path.abspath(root)
+        self.url = url
+
+    @classmethod
+    def from_config(cls, app):
+        """Create the storage from the app config."""
+        return cls(app.config['STORAGE_ROOT'], app.config['STORAGE_URL'])
+
+    def path(self, key):
+        """Return the file an object is stored in."""
+        parts = key.split('/')
+        if key.startswith('/') or '' in parts or '.' in parts \
+                or '..' in parts:
+            raise ValueError('invalid storage key %r' % key)
+        shard = sha1(key.encode()).hexdigest()[:2]
+        directory, name = posixpath.split(key)
+        return os.path.join(self.root, *directory.split('/'), shard, name) \
+            if directory else os.path.join(self.root, shard, name)
+
+    def put(self, key, data, content_type):
+        """Atomically write an object and return its link."""
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return self.url + key
+
+    def get(self, key):
+        """Return the bytes of an object."""
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def exists(self, key):
+        """Check whether an object is stored under key."""
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key):
+        """Remove an object, if there is one."""
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class MemoryStorage:
+    """Keeps objects in a dict of the process, for tests."""
+
+    name = 'memory'
+
+    def __init__(self, url):
+        """Storage constructor, url is the prefix of the returned links."""
+        self.url = url
+        self._objects = {}
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, app):
+        """Create the storage from the app config."""
+        return cls(app.config['STORAGE_URL'])
+
+    def put(self, key, data, content_type):
+        """Keep an object and return its link."""
+        with self._lock:
+            self._objects[key] = bytes(data)
+        return self.url + key
+
+    def get(self, key):
+        """Return the bytes of an object."""
+        with self._lock:
+            return self._objects[key]
+
+    def exists(self, key):
+        """Check whether an object is stored under key."""
+        with self._lock:
+            return key in self._objects
+
+    def delete(self, key):
+        """Remove an object, if there is one."""
+        with self._lock:
+            self._objects.pop(key, None)
+
+
+STORAGE_BACKENDS = {backend.name: backend
+                    for backend in (S3Storage, LocalStorage, MemoryStorage)}
+
+
+def load_storage(app):
+    """Create the storage backend selected by the app config."""
+    name = app.config['STORAGE_BACKEND']
+    if name not in STORAGE_BACKENDS:
+        raise ValueError('unknown storage backend %r, expected one of %s'
+                         % (name, ', '.join(sorted(STORAGE_BACKENDS))))
+    return STORAGE_BACKENDS[name].from_config(app)
+
+
+def get_storage(app):
+    """Return the storage backend of the app, creating it once."""
+    with storage_lock:
+        if 'storage' not in app.extensions:
+            app.extensions['storage'] = load_storage(app)
+    return app.extensions['storage']
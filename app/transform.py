@@ -0,0 +1,90 @@
+"""Storage side transform of images before they are stored.
+
+Uploads are often multi-megabyte phone photos, while the model only ever
+looks at 224x224 pixels. Before an image is stored it is re-encoded as a
+JPEG of configurable quality, scaled down to at most max_side pixels, and a
+small thumbnail is encoded next to it for history listings. The transform
+reuses the frame the classifier decoded (at reduced resolution for large
+JPEGs, see preprocessing.py) and only decodes the upload itself when no
+frame is at hand, e.g. for results served from a cache or classified on an
+inference server. With keep_original the upload is stored unchanged and only
+the thumbnail is added; uploads that cannot be decoded are stored unchanged
+without a thumbnail.
+"""
+
+from collections import namedtuple
+
+import cv2
+
+from .preprocessing import Preprocessor
+
+# data and content type of the image to store, the extension of its key and
+# the JPEG thumbnail (None without thumbnails)
+TransformedImage = namedtuple('TransformedImage', ['data', 'content_type',
+                                                   'extension', 'thumbnail'])
+
+
+def scale_to(frame, max_side):
+    """Scale frame down so that its longer side is at most max_side."""
+    height, width = frame.shape[:2]
+    if max(height, width) <= max_side:
+        return frame
+    factor = max_side / float(max(height, width))
+    size = (max(1, int(round(width * factor))),
+            max(1, int(round(height * factor))))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_jpeg(frame, quality):
+    """Encode a BGR frame as a JPEG of quality (0-100)."""
+    ok, data = cv2.imencode('.jpg', frame,
+                            [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError('unable to encode image')
+    return data.tobytes()
+
+
+class ImageTransform:
+    """Re-encodes and thumbnails images before they are stored."""
+
+    def __init__(self, quality=85, max_side=640, thumbnail_side=128,
+                 thumbnail_quality=70, keep_original=False):
+        """Transform constructor, a thumbnail_side of 0 disables thumbnails."""
+        self.quality = quality
+        self.max_side = max_side
+        self.thumbnail_side = thumbnail_side
+        self.thumbnail_quality = thumbnail_quality
+        self.keep_original = keep_original
+        # decodes large JPEGs at a resolution just covering max_side
+        self.preprocessor = Preprocessor(size=max_side)
+
+    @classmethod
+    def from_config(cls, app):
+        """Create the transform from the app config."""
+        return cls(quality=app.config['STORAGE_JPEG_QUALITY'],
+                   max_side=app.config['STORAGE_MAX_SIDE'],
+                   thumbnail_side=app.config['STORAGE_THUMBNAIL_SIDE'],
+                   thumbnail_quality=app.config['STORAGE_THUMBNAIL_QUALITY'],
+                   keep_original=app.config['STORAGE_KEEP_ORIGINAL'])
+
+    def apply(self, image, content_type, extension, frame=None):
+        """Return the TransformedImage to store for an upload.
+
+        frame is the upload decoded to BGR, if the caller has it already.
+        """
+        if self.keep_original and not self.thumbnail_side:
+            return TransformedImage(image, content_type, extension, None)
+        if frame is None:
+            try:
+                frame = self.preprocessor.decode(image)
+            except ValueError:
+                return TransformedImage(image, content_type, extension, None)
+        thumbnail = None
+        if self.thumbnail_side:
+            thumbnail = encode_jpeg(scale_to(frame, self.thumbnail_side),
+                                    self.thumbnail_quality)
+        if self.keep_original:
+            return TransformedImage(image, content_type, extension, thumbnail)
+        return TransformedImage(
+            encode_jpeg(scale_to(frame, self.max_side), self.quality),
+            'image/jpeg', 'jpg', thumbnail)
@@ -0,0 +1,266 @@
+"""Write-behind uploads of stored images.
+
+With write-behind enabled, ImageRef.save commits the row right away with a
+pending upload status and hands the image bytes to the app's UploadQueue,
+so storage latency no longer adds to the classification
+response. Worker threads upload the images, retrying with exponential
+backoff, and record the link once the upload succeeded.
+
+When the in-memory queue is full, when an upload still fails after its last
+attempt and when the process exits, images are spilled to disk (written to a
+temporary file, fsynced and renamed into place) and a drain thread feeds them
+back to the workers whenever the queue has room, including spill files left
+behind by an earlier process. Uploads and link updates are idempotent, so two
+processes sharing the spill directory at worst upload a file twice. Only an
+upload in progress when the process is killed is lost; its row stays
+pending.
+"""
+
+import atexit
+import json
+import os
+import random
+import threading
+from collections import deque, namedtuple
+from queue import Queue, Full, Empty
+from time import time, sleep
+
+from .helpers.stats import percentile
+from .storage import get_storage
+
+UploadTask = namedtuple('UploadTask', ['image_ref_id', 'image', 'key',
+                                       'content_type', 'thumbnail',
+                                       'thumbnail_key', 'queued_at',
+                                       'spill_path'])
+
+SPILL_SUFFIX = '.upload'
+
+upload_queue_lock = threading.Lock()
+
+
+class UploadQueue:
+    """Bounded queue of image uploads served by a pool of worker threads."""
+
+    def __init__(self, app, on_stored, workers=4, max_size=1000,
+                 max_attempts=5, backoff=0.5, spill_dir='upload_spill',
+                 spill_interval=5):
+        """Upload queue constructor.
+
+        on_stored(image_ref_id, link, thumbnail_link) records a finished
+        upload; it is called by the workers inside an application context.
+        """
+        self.app = app
+        self.on_stored = on_stored
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.spill_dir = spill_dir
+        self.spill_interval = spill_interval
+        self.uploaded = 0
+        self.retries = 0
+        self.failures = 0
+        self.spilled = 0
+        # seconds from commit of the row to the finished upload
+        self.lags = deque(maxlen=1000)
+        self.pid = os.getpid()
+        self.closed = False
+        self._queue = Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        # spill files currently queued or uploading in this process
+        self._draining = set()
+        os.makedirs(spill_dir, exist_ok=True)
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True,
+                             name='image-upload-%d' % i)
+            for i in range(workers)]
+        self._threads.append(threading.Thread(
+            target=self._drain, daemon=True, name='image-upload-drain'))
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def submit(self, image_ref_id, image, key, content_type,
+               thumbnail=None, thumbnail_key=None):
+        """Queue an image and its JPEG thumbnail, if any, for upload.
+
+        Images that do not fit the queue are spilled to disk.
+        """
+        task = UploadTask(image_ref_id, image, key, content_type, thumbnail,
+                          thumbnail_key, time(), None)
+        try:
+            self._queue.put_nowait(task)
+        except Full:
+            self._spill(task)
+
+    def stats(self):
+        """Return queue depth, upload counters and lag percentiles."""
+        with self._lock:
+            lags = list(self.lags)
+            return {'queue_depth': self._queue.qsize(),
+                    'spill_depth': len(self._spill_files()),
+                    'uploaded': self.uploaded,
+                    'retries': self.retries,
+                    'failures': self.failures,
+                    'spilled': self.spilled,
+                    'lag_p50_ms': percentile(lags, 50) * 1000,
+                    'lag_p95_ms': percentile(lags, 95) * 1000}
+
+    def close(self):
+        """Stop draining and spill the images still in memory to disk."""
+        self.closed = True
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except Empty:
+                return
+            if task.spill_path is None:
+                self._spill(task)
+
+    def _run(self):
+        """Worker loop uploading one image at a time."""
+        while True:
+            task = self._queue.get()
+            try:
+                self._upload(task)
+            except Exception:
+                self.app.logger.exception('upload of image ref %s failed',
+                                          task.image_ref_id)
+            finally:
+                with self._lock:
+                    self._draining.discard(task.spill_path)
+
+    def _upload(self, task):
+        """Upload an image with retries and record its link."""
+        with self.app.app_context():
+            storage = get_storage(self.app)
+            for attempt in range(self.max_attempts):
+                try:
+                    link = storage.put(task.key, task.image,
+                                       task.content_type)
+                    thumbnail_link = None
+                    if task.thumbnail_key is not None:
+                        thumbnail_link = storage.put(
+                            task.thumbnail_key, task.thumbnail, 'image/jpeg')
+                    break
+                except Exception as e:
+                    self.app.logger.warning('upload of %s failed: %r',
+                                            task.key, e)
+                if attempt + 1 < self.max_attempts:
+                    with self._lock:
+                        self.retries += 1
+                    # exponential backoff with jitter
+                    sleep(self.backoff * 2 ** attempt *
+                          random.uniform(0.5, 1.5))
+            else:
+                with self._lock:
+                    self.failures += 1
+                if task.spill_path is None:
+                    self._spill(task)
+                return
+            self.on_stored(task.image_ref_id, link, thumbnail_link)
+        if task.spill_path is not None:
+            try:
+                os.remove(task.spill_path)
+            except FileNotFoundError:
+                # drained and uploaded by another process as well
+                pass
+        with self._lock:
+            self.uploaded += 1
+            self.lags.append(time() - task.queued_at)
+
+    def _spill(self, task):
+        """Durably write an upload task to the spill directory."""
+        path = os.path.join(self.spill_dir, '%s%s' % (task.image_ref_id,
+                                                      SPILL_SUFFIX))
+        header = json.dumps({'image_ref_id': task.image_ref_id,
+                             'key': task.key,
+                             'content_type': task.content_type,
+                             'thumbnail_key': task.thumbnail_key,
+                             'thumbnail_size': len(task.thumbnail or b''),
+                             'queued_at': task.queued_at})
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        with open(temporary, 'wb') as f:
+            f.write(header.encode() + b'\n')
+            f.write(task.image)
+            if task.thumbnail is not None:
+                f.write(task.thumbnail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        with self._lock:
+            self.spilled += 1
+
+    def _drain(self):
+        """Feed spilled uploads back to the workers when there is room."""
+        while not self.closed:
+            try:
+                self._drain_once()
+            except OSError as e:
+                self.app.logger.error('draining %s failed: %r',
+                                      self.spill_dir, e)
+            sleep(self.spill_interval)
+
+    def _drain_once(self):
+        """Queue as many spilled uploads as there is room for."""
+        for path in self._spill_files():
+            with self._lock:
+                if path in self._draining:
+                    continue
+            if self._queue.full():
+                break
+            try:
+                task = _load_spilled(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self._draining.add(path)
+            try:
+                self._queue.put_nowait(task)
+            except Full:
+                with self._lock:
+                    self._draining.discard(path)
+                break
+
+    def _spill_files(self):
+        """Return the spill files in the order they were written."""
+        paths = [os.path.join(self.spill_dir, name)
+                 for name in os.listdir(self.spill_dir)
+                 if name.endswith(SPILL_SUFFIX)]
+        return sorted(paths, key=_mtime)
+
+
+def get_upload_queue(app, on_stored):
+    """Return the upload queue of the app, creating it once per process."""
+    with upload_queue_lock:
+        queue = app.extensions.get('upload_queue')
+        if queue is None or queue.pid != os.getpid():
+            queue = app.extensions['upload_queue'] = UploadQueue(
+                app, on_stored,
+                workers=app.config['UPLOAD_WORKERS'],
+                max_size=app.config['UPLOAD_QUEUE_SIZE'],
+                max_attempts=app.config['UPLOAD_MAX_ATTEMPTS'],
+                backoff=app.config['UPLOAD_BACKOFF'],
+                spill_dir=app.config['UPLOAD_SPILL_DIR'],
+                spill_interval=app.config['UPLOAD_SPILL_INTERVAL'])
+    return queue
+
+
+def _load_spilled(path):
+    """Read an upload task back from a spill file."""
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline().decode())
+        data = f.read()
+    thumbnail_size = header.get('thumbnail_size', 0)
+    image = data[:len(data) - thumbnail_size]
+    thumbnail = data[len(image):] if header.get('thumbnail_key') else None
+    return UploadTask(header['image_ref_id'], image, header['key'],
+                      header['content_type'], thumbnail,
+                      header.get('thumbnail_key'), header['queued_at'], path)
+
+
+def _mtime(path):
+    """Modification time of path, 0 if it vanished meanwhile."""
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
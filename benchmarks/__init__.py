@@ -0,0 +1 @@
+"""Benchmarks for the classification path, run from the repository root."""
@@ -0,0 +1,80 @@
+"""Cost of authenticating a request with Basic auth and a bearer token.
+
+Times the verify callbacks on their own, and a full GET of the user record
+through the test client, once with the password in a Basic header and once
+with the token /login returned. Basic auth looks the user up and hashes the
+password on every request; a token is checked by its HMAC signature and the
+in-memory revocation list. The database is the one of the 'testing' config,
+whose tables are created and dropped again, exactly as the unit tests do.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_auth --repeat 200
+"""
+
+import argparse
+from base64 import b64encode
+
+from app import create_app
+from app.api import endpoints
+from app.models import db, User
+
+from .utils import print_table, time_call, write_json
+
+
+def measure(app, repeat):
+    """Time verification and a full request with both schemes."""
+    client = app.test_client()
+    basic = {'Authorization': 'Basic ' + b64encode(b'bench:bench').decode()}
+    response = client.post('api/v0.1/login', headers=basic)
+    token = response.get_json()['token']
+    bearer = {'Authorization': 'Bearer ' + token}
+    url = 'api/v0.1/users/%d' % User.query.filter_by(
+        username='bench').first().id
+
+    def get(headers):
+        assert client.get(url, headers=headers).status_code == 200
+
+    rows = []
+    with app.test_request_context():
+        row = time_call(lambda: endpoints.verify_password('bench', 'bench'),
+                        repeat)
+        row.update(scheme='basic', step='verify')
+        rows.append(row)
+        row = time_call(lambda: endpoints.verify_token(token), repeat)
+        row.update(scheme='bearer', step='verify')
+        rows.append(row)
+    for scheme, headers in (('basic', basic), ('bearer', bearer)):
+        row = time_call(lambda: get(headers), repeat)
+        row.update(scheme=scheme, step='request')
+        rows.append(row)
+    return rows
+
+
+def main():
+    """Run the authentication benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    app = create_app(config_mode='testing')
+    with app.app_context():
+        db.create_all()
+        try:
+            user = User(username='bench', firstname='Bench',
+                        lastname='Mark', email='bench@example.com')
+            user.hash_password('bench')
+            user.save()
+            rows = measure(app, args.repeat)
+        finally:
+            db.session.remove()
+            db.drop_all()
+    print_table(rows, ['scheme', 'step', 'n', 'mean_ms', 'p50_ms',
+                       'p95_ms'])
+    if args.output:
+        write_json(args.output, rows)
+
+
+if __name__ == '__main__':
+    main()
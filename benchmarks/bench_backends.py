@@ -0,0 +1,92 @@
+"""Latency and memory of the Keras model and its exported copies.
+
+For every model file found (see convert_model.py) whose runtime is
+installed, loads it in a fresh process and reports the load time, the
+resident memory added by loading it and the prediction latency per batch
+size.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_backends --batch-sizes 1 8 32
+"""
+
+import argparse
+import importlib.util
+import multiprocessing
+import time
+from pathlib import Path
+
+import numpy as np
+import psutil
+
+from app.backends import load_backend
+from app.classifier import MODEL_PATH
+
+from .utils import percentile, print_table
+
+STEM = str(Path(MODEL_PATH).with_suffix(''))
+MODELS = [('keras', MODEL_PATH, 'keras'),
+          ('onnx', STEM + '.onnx', 'onnxruntime'),
+          ('onnx', STEM + '_float16.onnx', 'onnxruntime'),
+          ('onnx', STEM + '_int8.onnx', 'onnxruntime'),
+          ('tflite', STEM + '.tflite', 'tensorflow'),
+          ('tflite', STEM + '_float16.tflite', 'tensorflow'),
+          ('tflite', STEM + '_int8.tflite', 'tensorflow')]
+
+
+def measure(backend, path, batch_sizes, repeat, results):
+    """Load one model in this process and time its predictions."""
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+    model = load_backend(backend, path)
+    load_seconds = time.perf_counter() - start
+    rows = []
+    for batch_size in batch_sizes:
+        batch = np.random.RandomState(0).uniform(
+            0, 255, (batch_size, 3, 224, 224)).astype(np.float32)
+        model.predict(batch)
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.predict(batch)
+            latencies.append(time.perf_counter() - start)
+        rows.append({'model': Path(path).name, 'backend': backend,
+                     'batch': batch_size, 'load_s': load_seconds,
+                     'rss_mib': (process.memory_info().rss - rss_before) /
+                     2 ** 20,
+                     'p50_ms': percentile(latencies, 50) * 1000,
+                     'p95_ms': percentile(latencies, 95) * 1000,
+                     'ms_per_image': percentile(latencies, 50) * 1000 /
+                     batch_size})
+    results.put(rows)
+
+
+def main():
+    """Run the backend benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for backend, path, runtime in MODELS:
+        if not Path(path).exists() or \
+                importlib.util.find_spec(runtime) is None:
+            continue
+        # a fresh process per model keeps the memory figures separate
+        results = context.Queue()
+        process = context.Process(target=measure,
+                                  args=(backend, path, args.batch_sizes,
+                                        args.repeat, results))
+        process.start()
+        rows.extend(results.get())
+        process.join()
+
+    print_table(rows, ['model', 'backend', 'batch', 'load_s', 'rss_mib',
+                       'p50_ms', 'p95_ms', 'ms_per_image'])
+
+
+if __name__ == '__main__':
+    main()
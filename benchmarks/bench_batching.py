@@ -0,0 +1,60 @@
+"""Throughput vs latency of micro-batched and one-at-a-time inference.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_batching --concurrency 1 8 32 --requests 20
+"""
+
+import argparse
+
+from app.classifier import Classifier
+from app.scheduler import InferenceScheduler
+
+from .utils import run_concurrently, print_table
+
+
+def main():
+    """Run the batching benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=20,
+                        help='requests per concurrent client')
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[8, 32])
+    parser.add_argument('--waits', type=float, nargs='+', default=[2, 10],
+                        help='maximum batch wait in milliseconds')
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    classifier = Classifier()
+    # warm up the model so the first measured call is not an outlier
+    classifier.classify(image)
+
+    rows = []
+    for concurrency in args.concurrency:
+        result = run_concurrently(lambda: classifier.classify(image),
+                                  concurrency, args.requests)
+        result.update(mode='one-at-a-time', concurrency=concurrency,
+                      max_batch=1, max_wait_ms=0.0, mean_batch=1.0)
+        rows.append(result)
+        for max_batch in args.batch_sizes:
+            for max_wait in args.waits:
+                scheduler = InferenceScheduler(classifier,
+                                               max_batch_size=max_batch,
+                                               max_wait_ms=max_wait)
+                result = run_concurrently(lambda: scheduler.classify(image),
+                                          concurrency, args.requests)
+                result.update(mode='batched', concurrency=concurrency,
+                              max_batch=max_batch, max_wait_ms=max_wait,
+                              mean_batch=scheduler.stats()['mean_batch_size'])
+                rows.append(result)
+
+    print_table(rows, ['mode', 'concurrency', 'max_batch', 'max_wait_ms',
+                       'mean_batch', 'throughput_per_s', 'p50_ms', 'p95_ms',
+                       'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
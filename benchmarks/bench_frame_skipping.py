@@ -0,0 +1,103 @@
+"""Frame skipping on a synthetic low-motion sequence.
+
+Builds a driver stream from the test image: every frame gets sensor noise
+and a slight brightness flicker, and every --event-every frames the scene
+changes for real (the camera view shifts). The sequence is classified once
+frame by frame and once with the FrameSkipper, reporting the fraction of
+frames skipped, how often the skipped stream's prediction disagrees with the
+full one, and the resulting difference in distraction score.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_frame_skipping --frames 300 --thresholds 2 4 8
+"""
+
+import argparse
+import time
+
+import numpy as np
+import cv2
+
+from app.classifier import Classifier
+from app.helpers.aggregator import aggregate_score
+from app.helpers.frame_skipper import FrameSkipper
+
+from .utils import print_table
+
+
+def low_motion_sequence(image, frames, event_every, seed=0):
+    """Encode a list of JPEG frames with noise and occasional motion."""
+    random = np.random.RandomState(seed)
+    base = cv2.imdecode(np.frombuffer(image, dtype=np.uint8),
+                        cv2.IMREAD_COLOR).astype(np.float32)
+    height, width = base.shape[:2]
+    shift = 0
+    sequence = []
+    for i in range(frames):
+        if i and i % event_every == 0:
+            shift = random.randint(-width // 8, width // 8)
+        frame = np.roll(base, shift, axis=1)
+        frame = frame * random.uniform(0.98, 1.02) + \
+            random.normal(0, 2, frame.shape)
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+        sequence.append(cv2.imencode('.jpg', frame)[1].tobytes())
+    return sequence
+
+
+def run(classifier, sequence, skipper=None):
+    """Classify the sequence and return predictions, scores and time."""
+    predictions = []
+    scores = []
+    score = 0.0
+    start = time.perf_counter()
+    for image in sequence:
+        frame = classifier.preprocess(image)
+        result = skipper.lookup('driver', frame[0]) if skipper else None
+        if result is None:
+            result = classifier.predict_batch(frame)[0]
+            if skipper:
+                skipper.update('driver', frame[0], result)
+        score = aggregate_score(score, result[1], result[2])
+        predictions.append(result[1])
+        scores.append(score)
+    return predictions, scores, time.perf_counter() - start
+
+
+def main():
+    """Run the frame skipping benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--event-every', type=int, default=50)
+    parser.add_argument('--thresholds', type=float, nargs='+',
+                        default=[2, 4, 8])
+    parser.add_argument('--max-reuse', type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        sequence = low_motion_sequence(f.read(), args.frames,
+                                       args.event_every)
+    classifier = Classifier()
+    classifier.warmup()
+
+    full_predictions, full_scores, full_time = run(classifier, sequence)
+    rows = [{'threshold': 0.0, 'skipped': 0.0, 'disagreement': 0.0,
+             'max_score_diff': 0.0, 'ms_per_frame':
+             full_time / len(sequence) * 1000}]
+    for threshold in args.thresholds:
+        skipper = FrameSkipper(threshold, max_reuse=args.max_reuse)
+        predictions, scores, elapsed = run(classifier, sequence, skipper)
+        rows.append({
+            'threshold': threshold,
+            'skipped': skipper.stats()['skip_rate'],
+            'disagreement': float(np.mean(np.not_equal(predictions,
+                                                       full_predictions))),
+            'max_score_diff': float(np.max(np.abs(
+                np.subtract(scores, full_scores)))),
+            'ms_per_frame': elapsed / len(sequence) * 1000})
+
+    print_table(rows, ['threshold', 'skipped', 'disagreement',
+                       'max_score_diff', 'ms_per_frame'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Image ref inserts per second with and without group commit.
+
+Concurrent client threads each save image refs one at a time, as the
+classification endpoints do: once committing every row on its own, and with
+the group commit writer in both durability modes. Images go to the memory
+storage backend, untransformed and not deduplicated, so that the database
+dominates. The database is the one of the 'testing' config (point
+TEST_DATABASE_URL at a local Postgres to measure that), whose tables are
+created and dropped again, exactly as the unit tests do.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_group_commit --concurrency 16 --rows 100
+"""
+
+import argparse
+
+from app import create_app
+from app.models import db, User, ImageRef
+
+from .utils import print_table, run_concurrently, write_json
+
+MODES = ('off', 'flush', 'early')
+
+
+class Upload:
+    """Stand-in for the request's FileStorage object."""
+
+    filename = 'frame.jpg'
+    content_type = 'image/jpeg'
+
+
+def measure(mode, args):
+    """Save image refs from concurrent threads, return rows/s and stats."""
+    app = create_app(config_mode='testing')
+    app.config.update(STORAGE_BACKEND='memory', STORAGE_TRANSFORM=False,
+                      STORAGE_DEDUP=False, UPLOAD_WRITE_BEHIND=False,
+                      GROUP_COMMIT=mode != 'off',
+                      GROUP_COMMIT_DURABILITY=(mode if mode != 'off'
+                                               else 'flush'),
+                      GROUP_COMMIT_MAX_ROWS=args.max_rows,
+                      GROUP_COMMIT_MAX_WAIT_MS=args.max_wait_ms)
+    with app.app_context():
+        db.create_all()
+        try:
+            user = User(username='bench', firstname='Bench',
+                        lastname='Mark', email='bench@example.com')
+            user.hash_password('bench')
+            user.save()
+
+            def save():
+                with app.app_context():
+                    ImageRef(image=b'image', fileStoreObj=Upload(),
+                             prediction='c0', probabilities=[0.1] * 10,
+                             username='bench', distraction_score=1.0,
+                             user_id=user.id).save()
+
+            row = run_concurrently(save, args.concurrency, args.rows)
+            if mode == 'early':
+                # the rows acknowledged early still have to be committed
+                ImageRef.wait_committed()
+            row['rows'] = ImageRef.query.count()
+            writer = app.extensions.get('group_commit_writer')
+            stats = writer.stats() if writer is not None else {}
+        finally:
+            db.session.remove()
+            db.drop_all()
+    row.update(mode=mode,
+               mean_flush_rows=stats.get('mean_flush_rows', 1.0),
+               flush_p95_ms=stats.get('flush_p95_ms', 0.0))
+    return row
+
+
+def main():
+    """Run the group commit benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=50,
+                        help='rows saved by every client thread')
+    parser.add_argument('--max-rows', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    rows = [measure(mode, args) for mode in args.modes]
+    print_table(rows, ['mode', 'rows', 'throughput_per_s', 'p50_ms',
+                       'p95_ms', 'mean_flush_rows', 'flush_p95_ms'])
+    if args.output:
+        write_json(args.output, rows)
+
+
+if __name__ == '__main__':
+    main()
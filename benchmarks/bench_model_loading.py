@@ -0,0 +1,97 @@
+"""Cold start time and resident memory per worker for model loading modes.
+
+Forks a number of workers the way gunicorn does and reports, per worker, the
+time until it has served its first prediction and its memory use:
+
+- per-worker: every worker loads its own copy of the model after the fork
+- preload: the parent loads the model once before forking (gunicorn master)
+
+RSS counts shared pages in every worker; USS is the memory unique to the
+worker and PSS splits shared pages between the processes sharing them.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_model_loading --workers 4
+"""
+
+import argparse
+import gc
+import multiprocessing
+import time
+
+import psutil
+
+from app.classifier import Classifier
+
+from .utils import print_table
+
+
+def worker(classifier, warmup_runs, image, results):
+    """Serve one prediction and report timings and memory."""
+    start = time.perf_counter()
+    classifier.load()
+    loaded = time.perf_counter()
+    classifier.warmup(warmup_runs)
+    warm = time.perf_counter()
+    classifier.classify(image)
+    first = time.perf_counter()
+    memory = psutil.Process().memory_full_info()
+    results.put({'load_s': loaded - start,
+                 'warmup_s': warm - loaded,
+                 'first_request_ms': (first - warm) * 1000,
+                 'cold_start_s': first - start,
+                 'rss_mib': memory.rss / 2 ** 20,
+                 'uss_mib': memory.uss / 2 ** 20,
+                 'pss_mib': getattr(memory, 'pss', 0) / 2 ** 20})
+
+
+def run(mode, workers, warmup_runs, image):
+    """Fork workers in the given mode and return their mean figures."""
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    classifier = Classifier()
+    parent_load = 0.0
+    if mode == 'preload':
+        start = time.perf_counter()
+        classifier.load()
+        parent_load = time.perf_counter() - start
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+    processes = [context.Process(target=worker,
+                                 args=(classifier, warmup_runs, image,
+                                       results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if hasattr(gc, 'unfreeze'):
+        gc.unfreeze()
+    summary = {key: sum(row[key] for row in rows) / len(rows)
+               for key in rows[0]}
+    summary.update(mode=mode, warmup_runs=warmup_runs,
+                   parent_load_s=parent_load)
+    return summary
+
+
+def main():
+    """Run the model loading benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--warmup-runs', type=int, nargs='+', default=[0, 1])
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image = f.read()
+
+    rows = [run(mode, args.workers, warmup_runs, image)
+            for mode in ('per-worker', 'preload')
+            for warmup_runs in args.warmup_runs]
+    print_table(rows, ['mode', 'warmup_runs', 'parent_load_s', 'load_s',
+                       'warmup_s', 'first_request_ms', 'cold_start_s',
+                       'rss_mib', 'uss_mib', 'pss_mib'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""History page latency by depth, with offset and with keyset cursors.
+
+Seeds image_refs with a million rows spread over a number of drivers and
+requests pages of the first driver's history through GET /classifier at
+increasing depths: once skipping to the depth with offset, once continuing
+from the next_cursor of the page before it, and once more with a cursor
+after dropping the composite (user_id, taken_at, id) index. Requests
+authenticate with a bearer token, so that the password hash does not
+dominate. The database is the one of the 'testing' config (point
+TEST_DATABASE_URL at a local Postgres to measure that), whose tables are
+created and dropped again, exactly as the unit tests do.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pagination --rows 1000000 --users 10
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from app import create_app
+from app.helpers.pagination import encode_cursor
+from app.models import db, User, ImageRef, PROBABILITIES
+
+from .utils import print_table, time_call, write_json
+
+
+def seed(rows, users, batch_size):
+    """Insert the users and rows of image refs, return the first user."""
+    for i in range(users):
+        user = User(username='bench%d' % i, firstname='Bench',
+                    lastname='Mark', email='bench%d@example.com' % i)
+        user.hash_password('bench')
+        user.save()
+    first = User.query.filter_by(username='bench0').one()
+    start = datetime(2026, 1, 1)
+    packed = PROBABILITIES.pack(*[0.1] * 10)
+    table = ImageRef.__table__
+    for offset in range(0, rows, batch_size):
+        # frames of all drivers interleaved, two per second each, so that
+        # pages end between frames of the same time
+        db.session.execute(table.insert(), [
+            {'user_id': first.id + i % users,
+             'link': 'frame%d.jpg' % i,
+             'predicted_label': '0',
+             'taken_at': start + timedelta(seconds=i // (2 * users)),
+             'distraction_score': 1.0,
+             'packed_probabilities': packed,
+             'exported': False,
+             'upload_status': 'stored'}
+            for i in range(offset, min(offset + batch_size, rows))])
+        db.session.commit()
+    return first
+
+
+def measure(client, headers, depth, limit, cursor, repeat):
+    """Time requests of the page at depth, by offset or by cursor."""
+    if cursor is None:
+        url = 'api/v0.1/classifier?limit=%d&offset=%d' % (limit, depth)
+    else:
+        url = 'api/v0.1/classifier?limit=%d&cursor=%s' % (limit, cursor)
+
+    def get():
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.data
+    return time_call(get, repeat)
+
+
+def main():
+    """Run the pagination benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--depths', type=float, nargs='+',
+                        default=[0, 0.01, 0.1, 0.5, 0.99],
+                        help='pages to request, as fractions of the history')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    app = create_app(config_mode='testing')
+    client = app.test_client()
+    results = []
+    with app.app_context():
+        db.create_all()
+        try:
+            user = seed(args.rows, args.users, args.batch_size)
+            history = db.session.query(
+                ImageRef.taken_at, ImageRef.id).filter_by(
+                user_id=user.id).order_by(ImageRef.taken_at,
+                                          ImageRef.id).all()
+            response = client.post('api/v0.1/login', headers={
+                'Authorization': 'Basic YmVuY2gwOmJlbmNo'})
+            headers = {'Authorization':
+                       'Bearer ' + response.get_json()['token']}
+            depths = [int(fraction * (len(history) - args.limit))
+                      for fraction in args.depths]
+
+            def run(mode):
+                for depth in depths:
+                    # the cursor the page before this one returned
+                    cursor = (encode_cursor(*history[depth - 1])
+                              if depth else None)
+                    row = measure(client, headers, depth, args.limit,
+                                  cursor if mode != 'offset' else None,
+                                  args.repeat)
+                    row.update(mode=mode, depth=depth)
+                    results.append(row)
+            run('offset')
+            run('cursor')
+            db.session.execute(db.text(
+                'DROP INDEX ix_image_refs_user_id_taken_at_id'))
+            db.session.commit()
+            run('cursor_no_index')
+        finally:
+            db.session.remove()
+            db.drop_all()
+    print_table(results, ['mode', 'depth', 'n', 'mean_ms', 'p50_ms',
+                          'p95_ms'])
+    if args.output:
+        write_json(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Stage by stage benchmark of the classification request path.
+
+Times every stage of a classification separately, across frame sizes and
+formats, and the whole POST /api/v0.1/classifier request through the Flask
+test client with images kept in the memory storage backend:
+
+    decode        JPEG / PNG decode (reduced resolution where applicable)
+    resize        resize of the decoded frame to 224x224
+    layout        channels first copy into the model input tensor
+    predict       model prediction at batch sizes 1..64
+    aggregate     aggregate_score
+    image_ref     ImageRef construction and commit
+    s3_upload     S3 storage put (only with --s3, talks to the bucket)
+    request       full classify() request
+
+Stages touching the database use the 'testing' config; its tables are
+created and dropped again, exactly as the unit tests do. Results are written
+as JSON so runs on different commits can be compared with
+benchmarks/compare.py.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pipeline --output bench_results/run.json
+"""
+
+import argparse
+import io
+from base64 import b64encode
+
+import numpy as np
+import cv2
+
+from app import create_app
+from app.api.endpoints import classifier
+from app.helpers.aggregator import aggregate_score
+from app.models import db, User, ImageRef
+from app.storage import S3Storage
+
+from .utils import time_call, write_json, print_table
+
+SIZES = ((480, 640), (1080, 1920), (3024, 4032))
+FORMATS = ('jpg', 'png')
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+class Upload:
+    """Stand-in for the request's FileStorage object."""
+
+    filename = 'frame.jpg'
+    content_type = 'image/jpeg'
+
+
+def synthetic_frame(fmt, shape):
+    """Encode a smooth synthetic colour frame."""
+    height, width = shape
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.dstack([(x + y) % 256, (2 * x) % 256, (3 * y) % 256])
+    return cv2.imencode('.' + fmt, image.astype(np.uint8))[1].tobytes()
+
+
+def bench_preprocessing(repeat):
+    """Time decode, resize and layout per format and frame size."""
+    preprocessor = classifier.preprocessor
+    resized = np.empty((224, 224, 3), dtype=np.uint8)
+    out = np.empty((3, 224, 224), dtype=preprocessor.dtype)
+    results = []
+    for fmt in FORMATS:
+        for shape in SIZES:
+            image = synthetic_frame(fmt, shape)
+            decoded = preprocessor.decode(image)
+            params = {'format': fmt, 'size': '%dx%d' % shape[::-1],
+                      'bytes': len(image)}
+            stages = (
+                ('decode', lambda: preprocessor.decode(image)),
+                ('resize', lambda: cv2.resize(decoded, (224, 224),
+                                              dst=resized)),
+                ('layout', lambda: np.copyto(out, resized.transpose(2, 0, 1),
+                                             casting='unsafe')))
+            for stage, func in stages:
+                result = time_call(func, repeat)
+                result.update(stage=stage, params=params)
+                results.append(result)
+    return results
+
+
+def bench_predict(repeat):
+    """Time model prediction per batch size."""
+    results = []
+    for batch_size in BATCH_SIZES:
+        batch = np.random.RandomState(0).uniform(
+            0, 255, (batch_size, 3, 224, 224)).astype(np.float32)
+        result = time_call(lambda: classifier.predict_batch(batch), repeat)
+        result.update(stage='predict', params={'batch': batch_size},
+                      ms_per_image=result['p50_ms'] / batch_size)
+        results.append(result)
+    return results
+
+
+def bench_aggregate(repeat):
+    """Time aggregate_score."""
+    result = time_call(lambda: aggregate_score(5.0, 3, 0.8), repeat * 100)
+    result.update(stage='aggregate', params={})
+    return [result]
+
+
+def bench_database(app, image, repeat, s3):
+    """Time ImageRef construction and commit, S3 upload and full requests."""
+    client = app.test_client()
+    probabilities = [0.1] * 10
+    headers = {'Authorization': 'Basic ' +
+               b64encode(b'bench:bench').decode()}
+    results = []
+    with app.app_context():
+        db.create_all()
+        try:
+            user = User(username='bench', firstname='Bench',
+                        lastname='Mark', email='bench@example.com')
+            user.hash_password('bench')
+            user.save()
+
+            def image_ref():
+                image_ref = ImageRef(image=image, fileStoreObj=Upload(),
+                                     prediction=0,
+                                     probabilities=probabilities,
+                                     username='bench', distraction_score=1.0)
+                image_ref.save()
+
+            def post():
+                response = client.post(
+                    'api/v0.1/classifier', headers=headers,
+                    data={'data': (io.BytesIO(image), 'frame.jpg'),
+                          'prev_score': 5})
+                assert response.status_code == 200, response.data
+
+            for stage, func in (('image_ref', image_ref), ('request', post)):
+                result = time_call(func, repeat)
+                result.update(stage=stage, params={'bytes': len(image)})
+                results.append(result)
+
+            if s3:
+                storage = S3Storage.from_config(app)
+                result = time_call(
+                    lambda: storage.put(Upload.filename, image,
+                                        Upload.content_type), repeat)
+                result.update(stage='s3_upload',
+                              params={'bytes': len(image)})
+                results.append(result)
+        finally:
+            db.session.remove()
+            db.drop_all()
+    return results
+
+
+def main():
+    """Run the pipeline benchmark suite."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default='bench_results/pipeline.json')
+    parser.add_argument('--s3', action='store_true',
+                        help='also time real uploads to the test bucket')
+    args = parser.parse_args()
+
+    app = create_app(config_mode='testing')
+    app.config['STORAGE_BACKEND'] = 'memory'
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    classifier.warmup()
+
+    results = bench_preprocessing(args.repeat)
+    results += bench_predict(args.repeat)
+    results += bench_aggregate(args.repeat)
+    results += bench_database(app, image, args.repeat, args.s3)
+
+    write_json(args.output, results)
+    for result in results:
+        result['params'] = ' '.join('%s=%s' % item for item in
+                                    sorted(result['params'].items()))
+    print_table(results, ['stage', 'params', 'n', 'mean_ms', 'p50_ms',
+                          'p95_ms'])
+    print('results written to %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
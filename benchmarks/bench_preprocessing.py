@@ -0,0 +1,94 @@
+"""Per-frame time and allocated bytes of image preprocessing.
+
+Compares the original decode / resize / swapaxes path with the buffer reusing
+Preprocessor on synthetic frames of several sizes and formats. Allocations
+are measured with tracemalloc, which sees numpy and OpenCV output arrays but
+not the decoder's internal scratch memory.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_preprocessing --repeat 50
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+
+from app.preprocessing import Preprocessor
+
+from .utils import print_table
+
+FRAMES = (('jpg', (480, 640), 3),
+          ('jpg', (1080, 1920), 3),
+          ('jpg', (3024, 4032), 3),
+          ('jpg', (1080, 1920), 1),
+          ('png', (480, 640), 3),
+          ('png', (480, 640), 4))
+
+
+def legacy_preprocess(image_stream_data):
+    """Preprocessing as originally done in Classifier.classify."""
+    # np.fromstring copied the upload; spelled as an explicit copy because
+    # newer numpy releases removed its binary mode
+    np_data_arr = np.frombuffer(image_stream_data, dtype='uint8').copy()
+    raw_img = cv2.imdecode(np_data_arr, cv2.IMREAD_UNCHANGED)
+    np_image = cv2.resize(raw_img, (224, 224))
+    np_image_tensor = np.expand_dims(np_image, axis=0)
+    np_image_tensor = np.swapaxes(np.swapaxes(np_image_tensor, 1, 3), 2, 3)
+    # Keras converts its input to a contiguous float32 array before predict
+    return np.ascontiguousarray(np_image_tensor, dtype='float32')
+
+
+def synthetic_frame(fmt, shape, channels):
+    """Encode a smooth synthetic frame, closer to a photo than noise."""
+    height, width = shape
+    y, x = np.mgrid[0:height, 0:width]
+    layers = [((x * (c + 1) + y) % 256).astype(np.uint8)
+              for c in range(channels)]
+    image = layers[0] if channels == 1 else np.dstack(layers)
+    return cv2.imencode('.' + fmt, image)[1].tobytes()
+
+
+def measure(func, image, repeat):
+    """Return mean seconds and peak traced bytes per call."""
+    # first call outside the measurement allocates the reused buffers
+    func(image)
+    tracemalloc.start()
+    func(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(image)
+    return (time.perf_counter() - start) / repeat, peak
+
+
+def main():
+    """Run the preprocessing benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    preprocessor = Preprocessor()
+    rows = []
+    for fmt, shape, channels in FRAMES:
+        image = synthetic_frame(fmt, shape, channels)
+        name = '%s %dx%d/%dch' % (fmt, shape[1], shape[0], channels)
+        for label, func in (('before', legacy_preprocess),
+                            ('after', preprocessor.preprocess)):
+            try:
+                seconds, peak = measure(func, image, args.repeat)
+            except Exception as e:
+                print('%s %s failed: %s' % (label, name, e))
+                continue
+            rows.append({'frame': name, 'path': label,
+                         'ms_per_frame': seconds * 1000,
+                         'kib_allocated': peak / 1024.0})
+
+    print_table(rows, ['frame', 'path', 'ms_per_frame', 'kib_allocated'])
+
+
+if __name__ == '__main__':
+    main()
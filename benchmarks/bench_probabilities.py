@@ -0,0 +1,169 @@
+"""Row size, insert throughput and table/index size of image_refs layouts.
+
+Seeds two copies of the image_refs table, one with the former ten float
+probability columns and their indexes on predicted_label and
+distraction_score, and one with the probabilities packed into a single
+float32 column, inserting the same rows into both in batches. Sizes are
+read from dbstat on SQLite and from pg_table_size / pg_indexes_size on
+Postgres. The database is the one of the 'testing' config (point
+TEST_DATABASE_URL at a local Postgres to measure that); the benchmark
+tables are dropped again afterwards.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_probabilities --rows 100000
+"""
+
+import argparse
+import random
+import time
+
+import sqlalchemy as sa
+
+from app import create_app
+from app.models import db, PROBABILITIES, CLASSES
+
+from .utils import print_table, write_json
+
+
+def layouts(metadata):
+    """Return the tables of the 'columns' and 'packed' layouts."""
+    def common(name, *columns):
+        table = sa.Table(
+            name, metadata,
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('user_id', sa.Integer, nullable=False),
+            sa.Column('link', sa.String(200), nullable=False),
+            sa.Column('predicted_label', sa.String(10), nullable=False),
+            sa.Column('taken_at', sa.DateTime(timezone=True),
+                      server_default=sa.func.now()),
+            sa.Column('distraction_score', sa.Float, nullable=False),
+            *columns,
+            sa.Column('exported', sa.Boolean, nullable=False),
+            sa.Column('upload_status', sa.String(10), nullable=False),
+            sa.Column('sha256', sa.String(64)),
+            sa.Column('thumbnail_link', sa.String(200)))
+        for column in ('user_id', 'link', 'exported', 'upload_status'):
+            sa.Index('ix_%s_%s' % (name, column), table.c[column])
+        sa.Index('ix_%s_user_id_sha256' % name, table.c.user_id,
+                 table.c.sha256)
+        return table
+
+    columns = common('bench_refs_columns',
+                     *[sa.Column('c%d' % label, sa.Float)
+                       for label in range(CLASSES)])
+    sa.Index('ix_bench_refs_columns_predicted_label',
+             columns.c.predicted_label)
+    sa.Index('ix_bench_refs_columns_distraction_score',
+             columns.c.distraction_score)
+    packed = common('bench_refs_packed',
+                    sa.Column('packed_probabilities',
+                              sa.LargeBinary(PROBABILITIES.size)))
+    return {'columns': columns, 'packed': packed}
+
+
+def seed_rows(count, seed=0):
+    """Return (common values, probabilities) of count image refs."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        probabilities = [rng.random() for _ in range(CLASSES)]
+        total = sum(probabilities)
+        probabilities = [p / total for p in probabilities]
+        label = max(range(CLASSES), key=probabilities.__getitem__)
+        rows.append(({'user_id': i % 100 + 1,
+                      'link': '/api/v0.1/storage/%d/2026/10/18/%064x.jpg'
+                              % (i % 100 + 1, rng.getrandbits(256)),
+                      'predicted_label': str(label),
+                      'distraction_score': rng.uniform(0, 10),
+                      'exported': False,
+                      'upload_status': 'stored',
+                      'sha256': '%064x' % rng.getrandbits(256)},
+                     probabilities))
+    return rows
+
+
+def insert(engine, table, layout, rows, batch_size):
+    """Insert rows in batches and return the rows per second."""
+    def values(common, probabilities):
+        row = dict(common)
+        if layout == 'packed':
+            row['packed_probabilities'] = PROBABILITIES.pack(*probabilities)
+        else:
+            row.update(('c%d' % label, p)
+                       for label, p in enumerate(probabilities))
+        return row
+
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        with engine.begin() as connection:
+            connection.execute(table.insert(), [
+                values(*row) for row in rows[i:i + batch_size]])
+    return len(rows) / (time.perf_counter() - start)
+
+
+def sizes(engine, table):
+    """Return the table and index sizes of table in bytes."""
+    indexes = [index.name for index in table.indexes]
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            return connection.execute(sa.text(
+                'SELECT pg_table_size(:name), pg_indexes_size(:name)'),
+                {'name': table.name}).fetchone()
+        pages = dict(connection.execute(sa.text(
+            'SELECT name, SUM(pgsize) FROM dbstat GROUP BY name')).fetchall())
+    return pages[table.name], sum(pages.get(name, 0) for name in indexes)
+
+
+def row_size(engine, table, rows):
+    """Return the mean bytes of a stored row, without page overhead."""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            return float(connection.execute(sa.text(
+                'SELECT avg(pg_column_size(t.*)) FROM %s AS t'
+                % table.name)).scalar())
+        payload = connection.execute(sa.text(
+            "SELECT SUM(payload) FROM dbstat WHERE name = :name AND "
+            "pagetype = 'leaf'"), {'name': table.name}).scalar()
+    return payload / rows
+
+
+def main():
+    """Run the probability layout benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    app = create_app(config_mode='testing')
+    rows = seed_rows(args.rows)
+    metadata = sa.MetaData()
+    tables = layouts(metadata)
+    results = []
+    with app.app_context():
+        engine = db.engine
+        metadata.create_all(engine)
+        try:
+            for layout, table in tables.items():
+                throughput = insert(engine, table, layout, rows,
+                                    args.batch_size)
+                table_bytes, index_bytes = sizes(engine, table)
+                results.append({'layout': layout,
+                                'rows': args.rows,
+                                'row_bytes': row_size(engine, table,
+                                                      args.rows),
+                                'rows_per_s': throughput,
+                                'table_mb': table_bytes / 2 ** 20,
+                                'index_mb': index_bytes / 2 ** 20,
+                                'indexes': len(table.indexes)})
+        finally:
+            metadata.drop_all(engine)
+    print_table(results, ['layout', 'rows', 'row_bytes', 'rows_per_s',
+                          'table_mb', 'index_mb', 'indexes'])
+    if args.output:
+        write_json(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
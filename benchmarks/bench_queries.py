@@ -0,0 +1,125 @@
+"""SQL statements issued per request, by endpoint.
+
+Counts the statements the database engine executes while serving each
+endpoint through the test client with Basic auth, once on the first
+request of the user ('cold') and once on a repeated request ('warm'). The
+model is replaced by a constant prediction and images go to the memory
+storage backend. The database is the one of the 'testing' config, whose
+tables are created and dropped again, exactly as the unit tests do.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_queries --output results/queries.json
+"""
+
+import argparse
+import io
+from base64 import b64encode
+from unittest import mock
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User
+
+from .utils import print_table, write_json
+
+PROBABILITIES = [0.9] + [0.1 / 9] * 9
+
+
+def requests(client, user_id, image):
+    """Return (endpoint, request function) pairs to count."""
+    user = {'username': 'bench', 'firstname': 'Bench', 'lastname': 'Mark',
+            'email': 'bench@example.com', 'active': 'true'}
+
+    def frames(count):
+        return {'data': [(io.BytesIO(image + b'%d' % i), 'frame.jpg')
+                         for i in range(count)]}
+    url = 'api/v0.1/users/%d' % user_id
+    return [
+        ('POST /login', lambda headers: client.post(
+            'api/v0.1/login', headers=headers)),
+        ('GET /users/<id>', lambda headers: client.get(
+            url, headers=headers)),
+        ('PUT /users/<id>', lambda headers: client.put(
+            url, headers=headers, json=user)),
+        ('POST /classifier', lambda headers: client.post(
+            'api/v0.1/classifier', headers=headers, data=frames(1),
+            content_type='multipart/form-data')),
+        ('POST /classifier/batch', lambda headers: client.post(
+            'api/v0.1/classifier/batch', headers=headers, data=frames(4),
+            content_type='multipart/form-data')),
+        ('GET /classifier', lambda headers: client.get(
+            'api/v0.1/classifier', headers=headers)),
+        ('GET /classifier/scores', lambda headers: client.get(
+            'api/v0.1/classifier/scores', headers=headers)),
+    ]
+
+
+def count_statements(engine, func):
+    """Call func and return its response and the statements it issued."""
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return response, len(statements)
+
+
+def main():
+    """Run the queries per endpoint benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    app = create_app(config_mode='testing')
+    app.config.update(STORAGE_BACKEND='memory', STORAGE_TRANSFORM=False,
+                      UPLOAD_WRITE_BEHIND=False)
+    client = app.test_client()
+    headers = {'Authorization': 'Basic ' +
+               b64encode(b'bench:bench').decode()}
+    rows = []
+    with app.app_context():
+        engine = db.engine
+        db.create_all()
+        try:
+            user = User(username='bench', firstname='Bench',
+                        lastname='Mark', email='bench@example.com')
+            user.hash_password('bench')
+            user.save()
+            user_id = user.id
+            db.session.remove()
+        except Exception:
+            db.drop_all()
+            raise
+    try:
+        with mock.patch('app.api.endpoints.classify_image',
+                        return_value=((PROBABILITIES, 0, 0.9), False)), \
+                mock.patch('app.api.endpoints.classify_images',
+                           side_effect=lambda images, *args: [
+                               (PROBABILITIES, 0, 0.9)] * len(images)):
+            for endpoint, func in requests(client, user_id, image):
+                response, cold = count_statements(
+                    engine, lambda: func(headers))
+                assert response.status_code < 400, (endpoint, response.data)
+                _, warm = count_statements(engine, lambda: func(headers))
+                rows.append({'endpoint': endpoint, 'cold': cold,
+                             'warm': warm})
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+    print_table(rows, ['endpoint', 'cold', 'warm'])
+    if args.output:
+        write_json(args.output, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Storage puts, rows and time per frame under the retention policies.
+
+Replays a simulated drive, mostly confident safe driving (c0) frames with
+bursts of distraction, through classify_and_store with the model replaced by
+the simulated predictions, once storing every frame ('all') and once with
+the 'selective' policy. Images go to the memory storage backend; the
+database is the one of the 'testing' config, whose tables are created and
+dropped again, exactly as the unit tests do.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_retention --frames 2000 --safe-share 0.85
+"""
+
+import argparse
+import random
+import time
+from unittest import mock
+
+from app import create_app
+from app import storage
+from app.api import endpoints
+from app.models import db, User, ImageRef, ScoreRecord
+
+from .utils import print_table
+
+
+class Upload:
+    """Stand-in for the request's FileStorage object."""
+
+    filename = 'frame.jpg'
+    content_type = 'image/jpeg'
+
+
+def simulated_drive(frames, safe_share, seed=0):
+    """Return (prediction, confidence) of every frame of a drive."""
+    rng = random.Random(seed)
+    drive = []
+    while len(drive) < frames:
+        if rng.random() < safe_share:
+            drive.append((0, rng.uniform(0.55, 1.0)))
+        else:
+            # distractions last a few frames
+            label = rng.randrange(1, 10)
+            drive.extend((label, rng.uniform(0.4, 1.0))
+                         for _ in range(rng.randint(1, 5)))
+    return drive[:frames]
+
+
+def replay(app, drive, image):
+    """Classify and store a drive, return puts, rows and ms per frame."""
+    results = [(_probabilities(label, confidence), label, confidence)
+               for label, confidence in drive]
+    with app.app_context():
+        db.create_all()
+        try:
+            user = User(username='bench', firstname='Bench',
+                        lastname='Mark', email='bench@example.com')
+            user.hash_password('bench')
+            user.save()
+            puts = []
+            put = storage.get_storage(app).put
+
+            def counted_put(key, data, content_type):
+                puts.append(len(data))
+                return put(key, data, content_type)
+
+            with mock.patch('app.api.endpoints.classify_image',
+                            side_effect=[(result, False)
+                                         for result in results]), \
+                    mock.patch.object(storage.get_storage(app), 'put',
+                                      side_effect=counted_put):
+                start = time.perf_counter()
+                for i in range(len(drive)):
+                    # distinct bytes, so that no upload is deduplicated
+                    endpoints.classify_and_store(
+                        image + b'%d' % i, Upload(), 'bench')
+                elapsed = time.perf_counter() - start
+            return {'puts': len(puts),
+                    'put_bytes': sum(puts),
+                    'image_refs': ImageRef.query.count(),
+                    'score_records': ScoreRecord.query.count(),
+                    'ms_per_frame': elapsed * 1000 / len(drive)}
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+def _probabilities(label, confidence):
+    """Spread the remaining probability over the other classes."""
+    probabilities = [(1 - confidence) / 9] * 10
+    probabilities[label] = confidence
+    return probabilities
+
+
+def main():
+    """Run the retention benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--safe-share', type=float, default=0.85)
+    parser.add_argument('--sample-every', type=int, default=20)
+    parser.add_argument('--min-confidence', type=float, default=0.6)
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    drive = simulated_drive(args.frames, args.safe_share)
+
+    rows = []
+    for policy in ('all', 'selective'):
+        app = create_app(config_mode='testing')
+        # the transform and deduplication are measured elsewhere
+        app.config.update(STORAGE_BACKEND='memory', STORAGE_TRANSFORM=False,
+                          STORAGE_DEDUP=False, UPLOAD_WRITE_BEHIND=False,
+                          RETENTION_POLICY=policy,
+                          RETENTION_SAMPLE_EVERY=args.sample_every,
+                          RETENTION_MIN_CONFIDENCE=args.min_confidence)
+        row = replay(app, drive, image)
+        row['policy'] = policy
+        rows.append(row)
+    print('%d frames, %d safe' % (len(drive),
+                                  sum(label == 0 for label, _ in drive)))
+    print_table(rows, ['policy', 'puts', 'put_bytes', 'image_refs',
+                       'score_records', 'ms_per_frame'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Per upload latency of a fresh S3 client per upload vs the shared client.
+
+Uploads the test image to a local S3 stand-in, once building a new boto3
+client for every upload (as upload_file_to_s3 used to) and once through
+the s3 storage backend with the app's pooled client, serially and from several
+threads at once. Without --endpoint-url a moto server (pip install
+'moto[server]') is started on a free local port; any S3 compatible server,
+e.g. MinIO, can be given instead along with its credentials.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_s3 --repeat 200 --concurrency 1 8 16
+    python -m benchmarks.bench_s3 --endpoint-url http://localhost:9000 \\
+        --access-key minioadmin --secret-key minioadmin
+"""
+
+import argparse
+import logging
+import socket
+
+import boto3
+
+from app import create_app
+from app.helpers import s3_helper
+from app.storage import S3Storage
+
+from .utils import time_call, run_concurrently, print_table
+
+
+class Upload:
+    """Stand-in for the request's FileStorage object."""
+
+    filename = 'frame.jpg'
+    content_type = 'image/jpeg'
+
+
+def start_moto_server():
+    """Start a moto S3 server on a free port and return its URL."""
+    from moto.server import ThreadedMotoServer
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    # one access log line per upload would drown the results
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+    server.start()
+    return 'http://127.0.0.1:%d' % port
+
+
+def per_upload_client(app, image):
+    """Upload the way upload_file_to_s3 did, with a client per upload."""
+    s3 = boto3.client("s3",
+                      endpoint_url=app.config['S3_ENDPOINT_URL'],
+                      aws_access_key_id=app.config['S3_KEY'],
+                      aws_secret_access_key=app.config['S3_SECRET'])
+    s3.put_object(Body=image, Bucket=app.config['S3_BUCKET'],
+                  ACL='public-read', ContentType=Upload.content_type,
+                  Key=Upload.filename)
+
+
+def shared_client(app, image):
+    """Upload through the s3 storage backend and its shared client."""
+    S3Storage.from_config(app).put(Upload.filename, image,
+                                   Upload.content_type)
+
+
+def main():
+    """Run the S3 client benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--endpoint-url')
+    parser.add_argument('--access-key', default='bench')
+    parser.add_argument('--secret-key', default='bench')
+    parser.add_argument('--bucket', default='bench')
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 8])
+    parser.add_argument('--pool-size', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app(config_mode='testing')
+    app.config.update(
+        S3_ENDPOINT_URL=args.endpoint_url or start_moto_server(),
+        S3_KEY=args.access_key, S3_SECRET=args.secret_key,
+        S3_BUCKET=args.bucket, S3_MAX_POOL_CONNECTIONS=args.pool_size)
+    s3_helper.get_s3_client(app).create_bucket(Bucket=args.bucket)
+    with open(args.image, 'rb') as f:
+        image = f.read()
+
+    rows = []
+    for name, upload in (('per_upload_client', per_upload_client),
+                         ('shared_client', shared_client)):
+        result = time_call(lambda: upload(app, image), args.repeat)
+        rows.append({'client': name, 'threads': 1,
+                     'p50_ms': result['p50_ms'], 'p95_ms': result['p95_ms'],
+                     'uploads_per_s': 1000 / result['mean_ms']})
+        for concurrency in args.concurrency:
+            if concurrency == 1:
+                continue
+            result = run_concurrently(
+                lambda: upload(app, image), concurrency,
+                max(1, args.repeat // concurrency))
+            rows.append({'client': name, 'threads': concurrency,
+                         'p50_ms': result['p50_ms'],
+                         'p95_ms': result['p95_ms'],
+                         'uploads_per_s': result['throughput_per_s']})
+    print_table(rows, ['client', 'threads', 'p50_ms', 'p95_ms',
+                       'uploads_per_s'])
+
+
+if __name__ == '__main__':
+    main()
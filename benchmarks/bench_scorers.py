@@ -0,0 +1,78 @@
+"""Per frame cost of the incremental scorers against history length.
+
+For every scorer and history length, the scorer is first brought up to date
+with that many frames of synthetic history (one batch), then timed scoring
+further frames one by one with update, as the server does per upload, and
+as a single update_batch call, as re-scoring does. The cost of update should
+not grow with the history, as the scorer's state is bounded.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_scorers --history 10 1000 100000 1000000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.helpers.aggregator import make_scorer, SCORERS
+
+from .utils import print_table
+
+
+def synthetic_history(frames, seed=0):
+    """Return labels, confidences and times of frames about 0.2s apart."""
+    random = np.random.RandomState(seed)
+    return (random.randint(0, 10, frames),
+            random.uniform(0.1, 1.0, frames),
+            np.cumsum(random.exponential(0.2, frames)))
+
+
+def bench(name, history, frames):
+    """Time update and update_batch after history frames of a scorer."""
+    scorer = make_scorer(name)
+    labels, confidences, times = synthetic_history(history + frames)
+    scores, state = scorer.update_batch(0.0, None, labels[:history],
+                                        confidences[:history],
+                                        times[:history])
+    score = scores[-1]
+    new_labels = labels[history:].tolist()
+    new_confidences = confidences[history:].tolist()
+    new_times = times[history:].tolist()
+
+    start = time.perf_counter()
+    for label, confidence, taken_at in zip(new_labels, new_confidences,
+                                           new_times):
+        score, state = scorer.update(score, state, label, confidence,
+                                     taken_at)
+    update_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scorer.update_batch(scores[-1], state, labels[history:],
+                        confidences[history:], times[history:])
+    batch_time = time.perf_counter() - start
+
+    return {'scorer': name, 'history': history,
+            'update_us': update_time / frames * 1e6,
+            'batch_us': batch_time / frames * 1e6,
+            'state_bytes': len(json.dumps(state))}
+
+
+def main():
+    """Run the scorer benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--history', type=int, nargs='+',
+                        default=[10, 1000, 100000, 1000000])
+    parser.add_argument('--frames', type=int, default=10000)
+    parser.add_argument('--scorers', nargs='+', default=sorted(SCORERS))
+    args = parser.parse_args()
+
+    rows = [bench(name, history, args.frames)
+            for name in args.scorers for history in args.history]
+    print_table(rows, ['scorer', 'history', 'update_us', 'batch_us',
+                       'state_bytes'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Put and get throughput of the storage backends.
+
+Stores the test image under distinct content addressed keys in every
+storage backend, serially and from several threads at once, and reads the
+objects back. The local backend writes below a temporary directory unless
+--root is given (use it to measure a particular disk). The s3 backend talks
+to a moto server (pip install 'moto[server]') started on a free local port,
+or to any S3 compatible server given with --endpoint-url; see bench_s3.py.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_storage --repeat 500 --concurrency 1 8
+    python -m benchmarks.bench_storage --backends local --root /mnt/ssd/bench
+"""
+
+import argparse
+import itertools
+import shutil
+import tempfile
+from hashlib import sha256
+
+from app import create_app
+from app.helpers import s3_helper
+from app.storage import STORAGE_BACKENDS, object_key, load_storage
+
+from .bench_s3 import start_moto_server
+from .utils import time_call, run_concurrently, print_table
+
+
+def make_storage(app, name, args):
+    """Create the storage backend name for the benchmark."""
+    app.config['STORAGE_BACKEND'] = name
+    if name == 's3':
+        app.config.update(
+            S3_ENDPOINT_URL=args.endpoint_url or start_moto_server(),
+            S3_KEY=args.access_key, S3_SECRET=args.secret_key,
+            S3_BUCKET=args.bucket,
+            S3_LOCATION='http://%s.s3.amazonaws.com/' % args.bucket,
+            S3_MAX_POOL_CONNECTIONS=max(args.concurrency))
+        s3_helper.get_s3_client(app).create_bucket(Bucket=args.bucket)
+    return load_storage(app)
+
+
+def main():
+    """Run the storage benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--image', default='tests/static/test_img.jpg')
+    parser.add_argument('--backends', nargs='+', default=['memory', 'local',
+                                                          's3'],
+                        choices=sorted(STORAGE_BACKENDS))
+    parser.add_argument('--root', help='directory of the local backend')
+    parser.add_argument('--endpoint-url')
+    parser.add_argument('--access-key', default='bench')
+    parser.add_argument('--secret-key', default='bench')
+    parser.add_argument('--bucket', default='bench')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 8])
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    root = args.root or tempfile.mkdtemp(prefix='bench_storage_')
+    app = create_app(config_mode='testing')
+    app.config['STORAGE_ROOT'] = root
+    megabytes = len(image) / 1e6
+    # every put gets a new key, as every distinct frame does
+    counter = itertools.count()
+
+    def next_key():
+        digest = sha256(str(next(counter)).encode()).hexdigest()
+        return object_key(1, '2018/02/25', digest, 'jpg')
+
+    rows = []
+    try:
+        for name in args.backends:
+            storage = make_storage(app, name, args)
+            keys = []
+
+            def put():
+                key = next_key()
+                storage.put(key, image, 'image/jpeg')
+                keys.append(key)
+
+            def get():
+                storage.get(keys[len(keys) // 2])
+
+            for operation, func in (('put', put), ('get', get)):
+                for concurrency in args.concurrency:
+                    if concurrency == 1:
+                        result = time_call(func, args.repeat)
+                        per_s = 1000 / result['mean_ms']
+                    else:
+                        result = run_concurrently(
+                            func, concurrency,
+                            max(1, args.repeat // concurrency))
+                        per_s = result['throughput_per_s']
+                    rows.append({'backend': name, 'operation': operation,
+                                 'threads': concurrency,
+                                 'p50_ms': result['p50_ms'],
+                                 'p95_ms': result['p95_ms'],
+                                 'objects_per_s': per_s,
+                                 'mb_per_s': per_s * megabytes})
+    finally:
+        if not args.root:
+            shutil.rmtree(root)
+    print('object size: %d bytes' % len(image))
+    print_table(rows, ['backend', 'operation', 'threads', 'p50_ms', 'p95_ms',
+                       'objects_per_s', 'mb_per_s'])
+
+
+if __name__ == '__main__':
+    main()
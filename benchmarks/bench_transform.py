@@ -0,0 +1,111 @@
+"""Stored bytes and storage time per frame with and without the transform.
+
+For phone sized frames (and --image, if given) compares storing the upload
+as it is with the storage transform: re-encoding at STORAGE_JPEG_QUALITY
+and STORAGE_MAX_SIDE plus a thumbnail. Reports the bytes stored per frame,
+the transform time (starting from the frame the classifier decoded, as in
+the request path, and from the raw upload) and the time to put the stored
+objects into a storage backend: the local backend below a temporary
+directory by default, or S3 on a local moto server with --backend s3.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_transform --repeat 20
+    python -m benchmarks.bench_transform --backend s3 --quality 75
+"""
+
+import argparse
+import shutil
+import tempfile
+
+from app import create_app
+from app.api.endpoints import classifier
+from app.transform import ImageTransform
+
+from .bench_pipeline import synthetic_frame
+from .bench_storage import make_storage
+from .utils import time_call, print_table
+
+SIZES = ((1080, 1920), (3024, 4032))
+
+
+def put_all(storage, objects):
+    """Store (key, data, content type) objects."""
+    for key, data, content_type in objects:
+        storage.put(key, data, content_type)
+
+
+def main():
+    """Run the storage transform benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--image', help='an upload to measure as well')
+    parser.add_argument('--backend', default='local',
+                        choices=['memory', 'local', 's3'])
+    parser.add_argument('--endpoint-url')
+    parser.add_argument('--access-key', default='bench')
+    parser.add_argument('--secret-key', default='bench')
+    parser.add_argument('--bucket', default='bench')
+    # objects are put one at a time
+    parser.set_defaults(concurrency=[1])
+    parser.add_argument('--quality', type=int)
+    parser.add_argument('--max-side', type=int)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(config_mode='testing')
+    if args.quality is not None:
+        app.config['STORAGE_JPEG_QUALITY'] = args.quality
+    if args.max_side is not None:
+        app.config['STORAGE_MAX_SIDE'] = args.max_side
+    root = tempfile.mkdtemp(prefix='bench_transform_')
+    app.config['STORAGE_ROOT'] = root
+    transform = ImageTransform.from_config(app)
+
+    uploads = [('%dx%d' % shape[::-1], synthetic_frame('jpg', shape))
+               for shape in SIZES]
+    if args.image:
+        with open(args.image, 'rb') as f:
+            uploads.append((args.image, f.read()))
+
+    rows = []
+    try:
+        storage = make_storage(app, args.backend, args)
+        for name, image in uploads:
+            decoded = []
+            classifier.preprocess(image, decoded)
+            stored = transform.apply(image, 'image/jpeg', 'jpg', decoded[0])
+            variants = (
+                ('original', None, [('o.jpg', image, 'image/jpeg')]),
+                ('transformed',
+                 lambda: transform.apply(image, 'image/jpeg', 'jpg',
+                                         decoded[0]),
+                 [('t.jpg', stored.data, stored.content_type),
+                  ('t.thumb.jpg', stored.thumbnail, 'image/jpeg')]))
+            for variant, func, objects in variants:
+                put = time_call(lambda: put_all(storage, objects),
+                                args.repeat)
+                transform_ms = time_call(func, args.repeat)['p50_ms'] \
+                    if func else 0.0
+                rows.append({'frame': name, 'variant': variant,
+                             'stored_bytes': sum(len(data) for _, data, _
+                                                 in objects),
+                             'transform_ms': transform_ms,
+                             'put_p50_ms': put['p50_ms'],
+                             'put_p95_ms': put['p95_ms']})
+            # without a decoded frame, e.g. after a result cache hit
+            result = time_call(
+                lambda: transform.apply(image, 'image/jpeg', 'jpg'),
+                args.repeat)
+            rows.append({'frame': name, 'variant': 'transformed+decode',
+                         'stored_bytes': rows[-1]['stored_bytes'],
+                         'transform_ms': result['p50_ms'],
+                         'put_p50_ms': rows[-1]['put_p50_ms'],
+                         'put_p95_ms': rows[-1]['put_p95_ms']})
+    finally:
+        shutil.rmtree(root)
+    print_table(rows, ['frame', 'variant', 'stored_bytes', 'transform_ms',
+                       'put_p50_ms', 'put_p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
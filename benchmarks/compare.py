@@ -0,0 +1,58 @@
+"""Compare two benchmark JSON files and flag regressions.
+
+Results are matched by stage and parameters; a result whose median latency
+grew by more than the threshold counts as a regression and makes the script
+exit with status 1.
+
+Usage (from the repository root):
+    python -m benchmarks.compare bench_results/base.json bench_results/new.json
+"""
+
+import argparse
+import json
+import sys
+
+from .utils import print_table
+
+
+def load(path):
+    """Load a results file keyed by (stage, parameters)."""
+    with open(path) as f:
+        data = json.load(f)
+    return data['environment'], {
+        (result['stage'], json.dumps(result['params'], sort_keys=True)):
+        result for result in data['results']}
+
+
+def main():
+    """Compare the two result files."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='p50_ms')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown counted as regression')
+    args = parser.parse_args()
+
+    base_env, base = load(args.base)
+    new_env, new = load(args.new)
+    print('base %s, new %s' % (base_env['commit'], new_env['commit']))
+
+    rows = []
+    regressions = 0
+    for key in sorted(set(base) & set(new)):
+        before = base[key][args.metric]
+        after = new[key][args.metric]
+        change = (after - before) / before if before else 0.0
+        regressed = change > args.threshold
+        regressions += regressed
+        rows.append({'stage': key[0], 'params': key[1], 'base': before,
+                     'new': after, 'change_pct': change * 100,
+                     'status': 'REGRESSION' if regressed else 'ok'})
+    print_table(rows, ['stage', 'params', 'base', 'new', 'change_pct',
+                       'status'])
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Shared helpers for the benchmark scripts."""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+
+from app.helpers.stats import percentile
+
+
+def summarize(latencies, elapsed):
+    """Summarize request latencies (seconds) collected over elapsed seconds."""
+    return {'requests': len(latencies),
+            'throughput_per_s': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000}
+
+
+def run_concurrently(func, concurrency, requests_per_client):
+    """Call func from concurrency threads and summarize the latencies."""
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        own = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            func()
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as an aligned text table."""
+    widths = [max(len(column), *(len(_format(row[column])) for row in rows))
+              for column in columns]
+    print('  '.join(column.rjust(width)
+                    for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(_format(row[column]).rjust(width)
+                        for column, width in zip(columns, widths)))
+
+
+def _format(value):
+    """Format a table cell."""
+    if isinstance(value, float):
+        return '%.2f' % value
+    return str(value)
+
+
+def time_call(func, repeat, warmup=1):
+    """Call func repeatedly and return latency statistics in milliseconds."""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return {'n': repeat,
+            'mean_ms': sum(latencies) / repeat * 1000,
+            'min_ms': min(latencies) * 1000,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000}
+
+
+def environment():
+    """Describe the commit and machine the results were measured on."""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()}
+
+
+def write_json(path, results):
+    """Write benchmark results with their environment as JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f,
+                  indent=2, sort_keys=True)
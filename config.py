@@ -14,15 +14,168 @@ class Config(object):
 
     ALLOWED_EXTENSIONS = set(['png', 'jpg', 'jpeg', 'gif'])
 
-    S3_KEY = os.environ['S3_ACCESS_KEY_ID']
-    S3_SECRET = os.environ['S3_SECRET_ACCESS_KEY']
+    # bearer tokens issued by /login are signed with a key derived from
+    # SECRET_KEY and valid for TOKEN_TTL seconds; every worker reloads the
+    # revoked tokens each TOKEN_REVOCATION_REFRESH seconds, so a revoked
+    # token may still be accepted by other workers for that long
+    TOKEN_TTL = 900
+    TOKEN_REVOCATION_REFRESH = 5
+
+    # id, active flag and password hash of up to IDENTITY_CACHE_SIZE users
+    # are cached per worker; saving a user invalidates the entry in this
+    # worker, other workers notice changes after IDENTITY_CACHE_TTL seconds
+    IDENTITY_CACHE_SIZE = 10000
+    IDENTITY_CACHE_TTL = 30
+
+    # where images are stored: 's3', 'local' (files below STORAGE_ROOT, for
+    # single node deployments and load tests) or 'memory' (for tests); the
+    # API serves objects of the local and memory backends below STORAGE_URL
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 's3')
+    STORAGE_ROOT = os.environ.get('STORAGE_ROOT',
+                                  os.path.join(basedir, 'storage'))
+    STORAGE_URL = '/api/v0.1/storage/'
+
+    # credentials of the s3 storage backend, boto3 looks them up itself
+    # (e.g. in ~/.aws or from an instance role) when not set
+    S3_KEY = os.environ.get('S3_ACCESS_KEY_ID')
+    S3_SECRET = os.environ.get('S3_SECRET_ACCESS_KEY')
+    # S3 compatible endpoint to use instead of AWS, e.g. a MinIO server
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    # the S3 client is shared by all threads of a worker process; keep the
+    # pool at least as large as the number of threads uploading at once
+    S3_MAX_POOL_CONNECTIONS = 10
+    S3_MAX_ATTEMPTS = 3
+    S3_CONNECT_TIMEOUT = 5
+    S3_READ_TIMEOUT = 10
+
+    # upload images in the background after committing their rows, with
+    # UPLOAD_WORKERS threads (keep S3_MAX_POOL_CONNECTIONS at least as
+    # large), retrying failed uploads with exponential backoff from
+    # UPLOAD_BACKOFF seconds; images that do not fit the queue or keep
+    # failing are spilled to UPLOAD_SPILL_DIR and retried from there
+    UPLOAD_WRITE_BEHIND = False
+    UPLOAD_WORKERS = 4
+    UPLOAD_QUEUE_SIZE = 1000
+    UPLOAD_MAX_ATTEMPTS = 5
+    UPLOAD_BACKOFF = 0.5
+    UPLOAD_SPILL_DIR = os.path.join(basedir, 'upload_spill')
+    UPLOAD_SPILL_INTERVAL = 5
+
+    # write the image refs, score records and running scores of concurrent
+    # requests in shared transactions, committed once GROUP_COMMIT_MAX_ROWS
+    # rows are waiting or the oldest has waited GROUP_COMMIT_MAX_WAIT_MS;
+    # GROUP_COMMIT_DURABILITY 'flush' answers requests after the commit,
+    # 'early' before it, losing the rows of the last few milliseconds if
+    # the process dies
+    GROUP_COMMIT = False
+    GROUP_COMMIT_MAX_ROWS = 64
+    GROUP_COMMIT_MAX_WAIT_MS = 10
+    GROUP_COMMIT_DURABILITY = 'flush'
+
+    # images are stored under keys derived from a hash of their bytes; opt
+    # in to skip uploading bytes the user stored before, looking them up in
+    # an index caching STORAGE_INDEX_SIZE hashes per worker
+    STORAGE_DEDUP = False
+    STORAGE_INDEX_SIZE = 100000
+
+    # opt in to re-encode images before storing them (by default uploads are
+    # stored as they are), as JPEGs of STORAGE_JPEG_QUALITY at most
+    # STORAGE_MAX_SIDE pixels wide and high (and no larger than the frame the
+    # classifier decoded), next to a thumbnail of at most
+    # STORAGE_THUMBNAIL_SIDE pixels (0 for none) that the history endpoint
+    # links to; STORAGE_KEEP_ORIGINAL stores uploads as they are, still
+    # adding the thumbnail
+    STORAGE_TRANSFORM = False
+    STORAGE_JPEG_QUALITY = 85
+    STORAGE_MAX_SIDE = 640
+    STORAGE_THUMBNAIL_SIDE = 128
+    STORAGE_THUMBNAIL_QUALITY = 70
+    STORAGE_KEEP_ORIGINAL = False
+
+    # inference backend ('keras', 'onnx' or 'tflite') and the model file it
+    # loads; convert_model.py exports the Keras model for the other backends
+    CLASSIFIER_BACKEND = os.environ.get('CLASSIFIER_BACKEND', 'keras')
+    CLASSIFIER_MODEL_PATH = os.environ.get(
+        'CLASSIFIER_MODEL_PATH', 'app/static/CNN_two_convs_25022018_0900.h5')
+
+    # load the classifier model in create_app instead of on first request,
+    # followed by a number of warmup predictions; leave this off under
+    # gunicorn, whose hooks load the model in the master (unless
+    # GUNICORN_PRELOAD_MODEL=0) and warm it up in each worker after the fork
+    CLASSIFIER_PRELOAD = False
+    CLASSIFIER_WARMUP_RUNS = 1
+
+    # micro-batching of concurrent classification requests
+    INFERENCE_BATCHING = False
+    INFERENCE_MAX_BATCH_SIZE = 16
+    INFERENCE_MAX_WAIT_MS = 5
+
+    # Unix domain sockets of out-of-process inference servers (see
+    # inference_server.py), empty to classify inside the web worker
+    INFERENCE_SOCKETS = os.environ.get('INFERENCE_SOCKETS', '').split()
+    INFERENCE_TIMEOUT = 10
+    INFERENCE_RETRY_INTERVAL = 5
+    # classify in the web worker when no inference server is reachable
+    INFERENCE_FALLBACK = True
+
+    # per user cache of classification results for repeated frames, 0 to
+    # disable; the perceptual hash also catches near duplicate frames
+    RESULT_CACHE_SIZE = 0
+    RESULT_CACHE_TTL = 300
+    RESULT_CACHE_PERCEPTUAL = False
+
+    # reuse a user's last classification while the mean absolute pixel
+    # difference (0-255) to the last classified frame stays below the
+    # threshold, at most FRAME_SKIP_MAX_REUSE times in a row; 0 to disable
+    FRAME_SKIP_THRESHOLD = 0
+    FRAME_SKIP_MAX_REUSE = 10
+
+    # background workers for asynchronous classification jobs, and the
+    # longest a client may long-poll for a job result (seconds)
+    JOB_WORKERS = 2
+    JOB_QUEUE_SIZE = 100
+    JOB_MAX_WAIT = 30
+    JOB_POLL_INTERVAL = 0.1
+
+    # running distraction score kept per user by the server: the score
+    # before a user's first frame, and how many users' scores each worker
+    # caches in memory
+    SCORE_INITIAL = 0.0
+    SCORE_CACHE_USERS = 10000
+    # scoring rule, one of the scorers in app/helpers/aggregator.py:
+    # 'halving' (original), 'decay' (half_life, min_interval), 'window'
+    # (window, max_frames) or 'peak' (release), times in seconds
+    SCORER = os.environ.get('SCORER', 'halving')
+    SCORER_OPTIONS = {}
+
+    # which classified frames are stored in full, as image and image ref:
+    # 'all', or 'selective' to store only frames predicted as none of the
+    # RETENTION_SAFE_CLASSES, frames predicted with a confidence below
+    # RETENTION_MIN_CONFIDENCE and one in RETENTION_SAMPLE_EVERY safe frames
+    # of every user (0 for none); the other frames only leave a compact
+    # score record, so the score timeline stays complete
+    RETENTION_POLICY = os.environ.get('RETENTION_POLICY', 'all')
+    RETENTION_SAFE_CLASSES = [0]
+    RETENTION_MIN_CONFIDENCE = 0.6
+    RETENTION_SAMPLE_EVERY = 20
+
+    # most frames accepted in one request to the batch classifier endpoint,
+    # which is also the largest tensor each thread keeps for preprocessing
+    CLASSIFY_BATCH_MAX_FRAMES = 32
+
+    # most records one page of the history or score timeline may hold
+    PAGE_MAX_LIMIT = 1000
+
+    # largest single frame accepted on the streaming classifier endpoint
+    STREAM_MAX_FRAME_BYTES = 10 * 1024 * 1024
 
 
 class TestConfig(Config):
     """Config class for test environment."""
 
     SQLALCHEMY_DATABASE_URI = os.environ['TEST_DATABASE_URL']
-    S3_BUCKET = os.environ['TEST_S3_BUCKET']
+    STORAGE_BACKEND = os.environ.get('TEST_STORAGE_BACKEND', 'memory')
+    S3_BUCKET = os.environ.get('TEST_S3_BUCKET')
     S3_LOCATION = 'http://{}.s3.amazonaws.com/'.format(S3_BUCKET)
 
 
@@ -30,7 +183,7 @@ class DevConfig(Config):
     """Config class for dev environment."""
 
     SQLALCHEMY_DATABASE_URI = os.environ['DEV_DATABASE_URL']
-    S3_BUCKET = os.environ['DEV_S3_BUCKET']
+    S3_BUCKET = os.environ.get('DEV_S3_BUCKET')
     S3_LOCATION = 'http://{}.s3.amazonaws.com/'.format(S3_BUCKET)
 
 
@@ -39,8 +192,9 @@ class PrdConfig(Config):
 
     DEBUG = False
     TESTING = False
+    UPLOAD_WRITE_BEHIND = True
     SQLALCHEMY_DATABASE_URI = os.environ['PRD_DATABASE_URL']
-    S3_BUCKET = os.environ['PRD_S3_BUCKET']
+    S3_BUCKET = os.environ.get('PRD_S3_BUCKET')
     S3_LOCATION = 'http://{}.s3.amazonaws.com/'.format(S3_BUCKET)
 
 
@@ -0,0 +1,208 @@
+"""Export the Keras classifier model for the lighter CPU backends.
+
+Writes an ONNX or TensorFlow Lite copy of the model, optionally quantized to
+float16 or int8, to be used with CLASSIFIER_BACKEND / CLASSIFIER_MODEL_PATH:
+
+    python convert_model.py onnx
+    python convert_model.py onnx --quantize int8 --calibration-dir frames/
+    python convert_model.py tflite --quantize float16
+
+int8 quantization is static (activations calibrated on the images in
+--calibration-dir) when calibration images are given and dynamic (weights
+only) otherwise.
+
+The converters only take tf.keras models, while the model was saved by
+standalone Keras 2.1 on Theano with channels first data. It is therefore
+rebuilt from the .h5 file as a tf.keras model computing channels last inside
+(TensorFlow has no channels first convolutions on CPU) but still taking the
+(batch, channels, x, y) tensors of the other backends. This needs a separate
+environment from setup/environment.yml: TensorFlow 2 up to 2.15 (whose
+tf.keras is Keras 2) and h5py, plus tf2onnx, onnxruntime and, for float16,
+onnxconverter-common to export ONNX models.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+from app.classifier import MODEL_PATH
+from app.preprocessing import Preprocessor
+
+CALIBRATION_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# layers whose kernels Theano applies flipped (true convolution)
+CONVOLUTIONS = ('Conv1D', 'Conv2D', 'Conv3D')
+
+
+def _text(value):
+    """Decode an HDF5 string attribute."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def load_tf_keras_model(model_path):
+    """Rebuild the standalone Keras model as a channels last tf.keras model.
+
+    Only Sequential models are supported, which the classifier model is.
+    """
+    import h5py
+    import tensorflow as tf
+
+    with h5py.File(model_path, 'r') as f:
+        config = json.loads(_text(f.attrs['model_config']))
+        backend = _text(f.attrs.get('backend', 'tensorflow'))
+        group = f['model_weights'] if 'model_weights' in f else f
+        weights = {}
+        for name in group.attrs['layer_names']:
+            layer = group[_text(name)]
+            weights[_text(name)] = [
+                layer[_text(weight)][()]
+                for weight in layer.attrs['weight_names']]
+    if config['class_name'] != 'Sequential':
+        raise ValueError('only Sequential models can be converted')
+    layers = config['config']
+    if isinstance(layers, dict):
+        layers = layers['layers']
+
+    input_shape = layers[0]['config'].pop('batch_input_shape')[1:]
+    model = tf.keras.Sequential(name='classifier')
+    model.add(tf.keras.layers.InputLayer(input_shape=input_shape))
+    # channels first input as for the other backends, channels last inside
+    model.add(tf.keras.layers.Permute((2, 3, 1), name='to_channels_last'))
+    channels_last = True
+    for layer in layers:
+        if layer['config'].get('data_format') == 'channels_first':
+            layer['config']['data_format'] = 'channels_last'
+        if channels_last and layer['config'].get('axis') == 1:
+            # e.g. batch normalization over the channels
+            layer['config']['axis'] = -1
+        if channels_last and layer['class_name'] == 'Flatten':
+            # flatten in the original order, which the next layer expects
+            model.add(tf.keras.layers.Permute((3, 1, 2),
+                                              name='to_channels_first'))
+            channels_last = False
+        model.add(tf.keras.layers.deserialize(layer))
+
+    for name, values in weights.items():
+        layer = model.get_layer(name)
+        if values and backend == 'theano' and \
+                layer.__class__.__name__ in CONVOLUTIONS:
+            # TensorFlow cross-correlates, so flip the spatial axes
+            spatial = values[0].ndim - 2
+            values[0] = values[0][(slice(None, None, -1),) * spatial]
+        layer.set_weights(values)
+    return model
+
+
+def calibration_batches(calibration_dir, limit=200):
+    """Yield preprocessed single image batches for quantization."""
+    preprocessor = Preprocessor()
+    paths = sorted(path for path in Path(calibration_dir).iterdir()
+                   if path.suffix.lower() in CALIBRATION_EXTENSIONS)
+    for path in paths[:limit]:
+        # copy, as the preprocessor reuses its buffer on the next call
+        yield preprocessor.preprocess(path.read_bytes()).copy()
+
+
+class CalibrationReader:
+    """ONNX Runtime calibration data reader over preprocessed batches."""
+
+    def __init__(self, input_name, batches):
+        """Reader constructor."""
+        self.input_name = input_name
+        self.batches = iter(batches)
+
+    def get_next(self):
+        """Return the next input feed, or None when exhausted."""
+        batch = next(self.batches, None)
+        if batch is None:
+            return None
+        return {self.input_name: batch}
+
+
+def convert_onnx(model, output, quantize, calibration_dir):
+    """Export to ONNX and optionally quantize."""
+    import onnx
+    import tf2onnx
+    import tensorflow as tf
+
+    signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]),
+                               tf.float32, name='image')]
+    onnx_model, _ = tf2onnx.convert.from_keras(model, signature, opset=13)
+
+    if quantize == 'float16':
+        from onnxconverter_common import float16
+        onnx_model = float16.convert_float_to_float16(onnx_model,
+                                                      keep_io_types=True)
+    if quantize != 'int8':
+        onnx.save(onnx_model, output)
+        return
+
+    from onnxruntime import quantization
+    float_output = output + '.float32'
+    onnx.save(onnx_model, float_output)
+    try:
+        if calibration_dir:
+            quantization.quantize_static(
+                float_output, output,
+                CalibrationReader(onnx_model.graph.input[0].name,
+                                  calibration_batches(calibration_dir)),
+                weight_type=quantization.QuantType.QInt8)
+        else:
+            quantization.quantize_dynamic(
+                float_output, output,
+                weight_type=quantization.QuantType.QInt8)
+    finally:
+        os.remove(float_output)
+
+
+def convert_tflite(model, output, quantize, calibration_dir):
+    """Export to TensorFlow Lite and optionally quantize."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    if quantize == 'int8' and calibration_dir:
+        def representative_dataset():
+            for batch in calibration_batches(calibration_dir):
+                yield [batch]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = \
+            [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output, 'wb') as f:
+        f.write(converter.convert())
+
+
+CONVERTERS = {'onnx': convert_onnx, 'tflite': convert_tflite}
+
+
+def default_output(backend, quantize):
+    """Name the output after the source model, backend and quantization."""
+    stem = str(Path(MODEL_PATH).with_suffix(''))
+    suffix = '_%s' % quantize if quantize else ''
+    return '%s%s.%s' % (stem, suffix, backend)
+
+
+def main():
+    """Convert the model."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('backend', choices=sorted(CONVERTERS))
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output')
+    parser.add_argument('--quantize', choices=['float16', 'int8'])
+    parser.add_argument('--calibration-dir')
+    args = parser.parse_args()
+
+    model = load_tf_keras_model(args.model)
+    output = args.output or default_output(args.backend, args.quantize)
+    CONVERTERS[args.backend](model, output, args.quantize,
+                             args.calibration_dir)
+    print('wrote %s (%.1f MiB)' % (output,
+                                   os.path.getsize(output) / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Gunicorn settings sharing one classifier model across forked workers.
+
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app (and with PRELOAD_MODEL the Keras model) is loaded once in the master
+process. Forked workers then share the weight pages copy-on-write instead of
+each loading a private copy, and every worker runs warmup predictions before
+it starts accepting requests. Only preload the model with a fork safe Keras
+backend (Theano, or TensorFlow without a session created in the master).
+"""
+
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', 'unix:finalProject.sock')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+umask = 0o007
+preload_app = True
+
+PRELOAD_MODEL = os.environ.get('GUNICORN_PRELOAD_MODEL', '1') == '1'
+
+
+def when_ready(server):
+    """Load the model in the master, before any worker is forked."""
+    if not PRELOAD_MODEL:
+        return
+    from app.api.endpoints import classifier
+    classifier.load()
+    server.log.info('classifier loaded in %.2fs', classifier.load_seconds)
+    # move everything allocated so far out of the collector's reach, so
+    # garbage collection in the workers does not touch (and copy) the pages
+    # shared with the master
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Warm up the model before the worker reports ready."""
+    from app.api.endpoints import classifier
+    runs = worker.wsgi.config['CLASSIFIER_WARMUP_RUNS']
+    classifier.warmup(runs)
+    worker.log.info('classifier warmed up with %d run(s)', runs)
@@ -0,0 +1,84 @@
+"""Standalone inference service owning the classifier model.
+
+Starts one inference process per socket, each pinned to its own CPU cores,
+listening on Unix domain sockets that web workers reach through
+INFERENCE_SOCKETS:
+
+    python inference_server.py --config production \
+        --socket /tmp/octo-inference-0.sock --socket /tmp/octo-inference-1.sock
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+
+from config import app_config
+
+
+def serve(address, cpus, config):
+    """Load the model in this process and serve requests on address."""
+    from app.classifier import Classifier
+    from app.inference import InferenceServer
+    from app.scheduler import InferenceScheduler
+
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    classifier = Classifier(model_path=config.CLASSIFIER_MODEL_PATH,
+                            backend=config.CLASSIFIER_BACKEND)
+    classifier.load()
+    classifier.warmup(config.CLASSIFIER_WARMUP_RUNS)
+    # requests arriving concurrently on different connections share batches
+    scheduler = InferenceScheduler(
+        classifier,
+        max_batch_size=config.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=config.INFERENCE_MAX_WAIT_MS)
+    print('inference server on %s, cpus %s' % (address, sorted(cpus)))
+    InferenceServer(address, scheduler,
+                    config.SECRET_KEY.encode()).serve_forever()
+
+
+def split_cpus(count):
+    """Divide the available CPUs into count disjoint sets."""
+    if hasattr(os, 'sched_getaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+    if count > len(available):
+        return [set() for _ in range(count)]
+    return [set(available[i::count]) for i in range(count)]
+
+
+def main():
+    """Start the inference processes and wait for them."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--config', default='development',
+                        choices=sorted(app_config))
+    parser.add_argument('--socket', action='append', dest='sockets',
+                        help='socket path, one process per socket '
+                             '(default: INFERENCE_SOCKETS from config)')
+    args = parser.parse_args()
+
+    config = app_config[args.config]
+    sockets = args.sockets or config.INFERENCE_SOCKETS
+    if not sockets:
+        parser.error('no sockets given and INFERENCE_SOCKETS is empty')
+
+    processes = [multiprocessing.Process(target=serve,
+                                         args=(address, cpus, config))
+                 for address, cpus in zip(sockets, split_cpus(len(sockets)))]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        for process in processes:
+            process.terminate()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""add revoked tokens
+
+Revision ID: 03a392d5ade5
+Revises: 8bca8d373d7b
+Create Date: 2026-10-18 14:25:33.405298
+
+Adds the revoked_tokens table of bearer tokens revoked before they expire,
+indexed on expires_at, by which the active ones are loaded and the expired
+ones purged.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '03a392d5ade5'
+down_revision = '8bca8d373d7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_tokens',
+    sa.Column('key', sa.String(length=40), nullable=False),
+    sa.Column('revoked_at', sa.Float(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_revoked_tokens_expires_at'), 'revoked_tokens', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_revoked_tokens_expires_at'), table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
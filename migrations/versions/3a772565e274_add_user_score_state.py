@@ -0,0 +1,27 @@
+"""add user score state
+
+Revision ID: 3a772565e274
+Revises: adf265afb4d9
+Create Date: 2026-10-18 14:22:41.902385
+
+Adds the state column of user_scores, where time-aware scoring strategies
+keep what they need besides the score.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a772565e274'
+down_revision = 'adf265afb4d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user_scores', sa.Column('state', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_scores') as batch_op:
+        batch_op.drop_column('state')
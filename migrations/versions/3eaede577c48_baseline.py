@@ -0,0 +1,81 @@
+"""baseline
+
+Revision ID: 3eaede577c48
+Revises:
+Create Date: 2026-10-18 14:20:41.301942
+
+The users and image_refs tables as db.create_all() created them before
+the first migration. Databases created that way are marked as being at this
+revision with 'python migrate.py db stamp 3eaede577c48' and then upgraded,
+see migrations/README.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3eaede577c48'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('firstname', sa.String(length=64), nullable=False),
+    sa.Column('lastname', sa.String(length=64), nullable=False),
+    sa.Column('email', sa.String(length=64), nullable=False),
+    sa.Column('username', sa.String(length=64), nullable=False),
+    sa.Column('password_hash', sa.String(length=120), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_active'), 'users', ['active'], unique=False)
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_firstname'), 'users', ['firstname'], unique=False)
+    op.create_index(op.f('ix_users_lastname'), 'users', ['lastname'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('image_refs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('link', sa.String(length=200), nullable=False),
+    sa.Column('predicted_label', sa.String(length=10), nullable=False),
+    sa.Column('taken_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('distraction_score', sa.Float(), nullable=False),
+    sa.Column('c0', sa.Float(), nullable=True),
+    sa.Column('c1', sa.Float(), nullable=True),
+    sa.Column('c2', sa.Float(), nullable=True),
+    sa.Column('c3', sa.Float(), nullable=True),
+    sa.Column('c4', sa.Float(), nullable=True),
+    sa.Column('c5', sa.Float(), nullable=True),
+    sa.Column('c6', sa.Float(), nullable=True),
+    sa.Column('c7', sa.Float(), nullable=True),
+    sa.Column('c8', sa.Float(), nullable=True),
+    sa.Column('c9', sa.Float(), nullable=True),
+    sa.Column('exported', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_image_refs_distraction_score'), 'image_refs', ['distraction_score'], unique=False)
+    op.create_index(op.f('ix_image_refs_exported'), 'image_refs', ['exported'], unique=False)
+    op.create_index(op.f('ix_image_refs_link'), 'image_refs', ['link'], unique=False)
+    op.create_index(op.f('ix_image_refs_predicted_label'), 'image_refs', ['predicted_label'], unique=False)
+    op.create_index(op.f('ix_image_refs_user_id'), 'image_refs', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_image_refs_user_id'), table_name='image_refs')
+    op.drop_index(op.f('ix_image_refs_predicted_label'), table_name='image_refs')
+    op.drop_index(op.f('ix_image_refs_link'), table_name='image_refs')
+    op.drop_index(op.f('ix_image_refs_exported'), table_name='image_refs')
+    op.drop_index(op.f('ix_image_refs_distraction_score'), table_name='image_refs')
+    op.drop_table('image_refs')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_lastname'), table_name='users')
+    op.drop_index(op.f('ix_users_firstname'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_users_active'), table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,83 @@
+"""pack image ref probabilities
+
+Revision ID: 652807d396e7
+Revises: 03a392d5ade5
+Create Date: 2026-10-18 14:26:13.518204
+
+Replaces the ten float columns c0..c9 of image_refs by one column holding
+the probabilities packed as little endian float32, and drops the indexes on
+predicted_label and distraction_score, which no query uses. Existing rows
+are converted in batches of BATCH_SIZE, in id order.
+"""
+import struct
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '652807d396e7'
+down_revision = '03a392d5ade5'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+CLASSES = 10
+PROBABILITIES = struct.Struct('<%df' % CLASSES)
+COLUMNS = ['c%d' % label for label in range(CLASSES)]
+
+
+def upgrade():
+    op.add_column('image_refs', sa.Column('packed_probabilities', sa.LargeBinary(length=PROBABILITIES.size), nullable=True))
+    update = sa.text('UPDATE image_refs SET packed_probabilities = :packed '
+                     'WHERE id = :id').bindparams(
+        sa.bindparam('packed', type_=sa.LargeBinary))
+    for rows in batches(COLUMNS):
+        op.get_bind().execute(update, [
+            {'id': row[0],
+             'packed': PROBABILITIES.pack(*(
+                 value if value is not None else float('nan')
+                 for value in row[1:]))}
+            for row in rows])
+    with op.batch_alter_table('image_refs') as batch_op:
+        batch_op.drop_index('ix_image_refs_distraction_score')
+        batch_op.drop_index('ix_image_refs_predicted_label')
+        for column in COLUMNS:
+            batch_op.drop_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('image_refs') as batch_op:
+        for column in COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Float(), nullable=True))
+        batch_op.create_index('ix_image_refs_predicted_label', ['predicted_label'], unique=False)
+        batch_op.create_index('ix_image_refs_distraction_score', ['distraction_score'], unique=False)
+    update = sa.text('UPDATE image_refs SET %s WHERE id = :id' % ', '.join(
+        '%s = :%s' % (column, column) for column in COLUMNS))
+    for rows in batches(['packed_probabilities']):
+        op.get_bind().execute(update, [
+            dict(zip(COLUMNS, unpack(row[1])), id=row[0]) for row in rows])
+    with op.batch_alter_table('image_refs') as batch_op:
+        batch_op.drop_column('packed_probabilities')
+
+
+def batches(columns):
+    """Yield rows of id and columns of image_refs, BATCH_SIZE at a time."""
+    select = sa.text('SELECT id, %s FROM image_refs WHERE id > :last '
+                     'ORDER BY id LIMIT :limit' % ', '.join(columns))
+    last = 0
+    while True:
+        rows = op.get_bind().execute(select, {'last': last,
+                                              'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def unpack(packed):
+    """Probabilities of a packed vector, None for the missing ones."""
+    if packed is None:
+        return [None] * CLASSES
+    return [value if value == value else None
+            for value in PROBABILITIES.unpack(bytes(packed))]
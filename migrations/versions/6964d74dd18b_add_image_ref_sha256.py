@@ -0,0 +1,30 @@
+"""add image ref sha256
+
+Revision ID: 6964d74dd18b
+Revises: c90bd81d1caa
+Create Date: 2026-10-18 14:23:52.648113
+
+Adds the sha256 column of image_refs and the index on (user_id, sha256)
+through which duplicate frames of a user are found. Existing rows keep a
+NULL digest and are never matched as duplicates.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6964d74dd18b'
+down_revision = 'c90bd81d1caa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('image_refs', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.create_index('ix_image_refs_user_id_sha256', 'image_refs', ['user_id', 'sha256'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_image_refs_user_id_sha256', table_name='image_refs')
+    with op.batch_alter_table('image_refs') as batch_op:
+        batch_op.drop_column('sha256')
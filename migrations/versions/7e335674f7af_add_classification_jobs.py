@@ -0,0 +1,38 @@
+"""add classification jobs
+
+Revision ID: 7e335674f7af
+Revises: 3eaede577c48
+Create Date: 2026-10-18 14:21:37.114052
+
+Adds the classification_jobs table of the asynchronous classification
+endpoints.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e335674f7af'
+down_revision = '3eaede577c48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('classification_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.String(length=200), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_classification_jobs_user_id'), 'classification_jobs', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_classification_jobs_user_id'), table_name='classification_jobs')
+    op.drop_table('classification_jobs')
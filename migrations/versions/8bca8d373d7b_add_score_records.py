@@ -0,0 +1,38 @@
+"""add score records
+
+Revision ID: 8bca8d373d7b
+Revises: 8f3ad115fffc
+Create Date: 2026-10-18 14:24:59.731826
+
+Adds the score_records table, which keeps the score of every classified
+frame whether or not the selective retention policy stores its image, and
+its index on (user_id, taken_at) for the score timeline.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8bca8d373d7b'
+down_revision = '8f3ad115fffc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('score_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('predicted_label', sa.SmallInteger(), nullable=False),
+    sa.Column('confidence', sa.Float(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('distraction_score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_score_records_user_id_taken_at', 'score_records', ['user_id', 'taken_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_score_records_user_id_taken_at', table_name='score_records')
+    op.drop_table('score_records')
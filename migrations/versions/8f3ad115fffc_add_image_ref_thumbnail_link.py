@@ -0,0 +1,27 @@
+"""add image ref thumbnail link
+
+Revision ID: 8f3ad115fffc
+Revises: 6964d74dd18b
+Create Date: 2026-10-18 14:24:26.017459
+
+Adds the thumbnail_link column of image_refs. Rows stored before
+thumbnails were made have none.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3ad115fffc'
+down_revision = '6964d74dd18b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('image_refs', sa.Column('thumbnail_link', sa.String(length=200), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('image_refs') as batch_op:
+        batch_op.drop_column('thumbnail_link')
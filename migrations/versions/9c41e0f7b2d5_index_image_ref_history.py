@@ -0,0 +1,28 @@
+"""index image ref history
+
+Revision ID: 9c41e0f7b2d5
+Revises: 652807d396e7
+Create Date: 2026-10-18 16:02:37.884105
+
+Adds the composite index on (user_id, taken_at, id) of image_refs that the
+keyset pagination of the classification history walks, and drops the index
+on user_id alone, whose lookups the new index serves as well.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41e0f7b2d5'
+down_revision = '652807d396e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_image_refs_user_id_taken_at_id', 'image_refs', ['user_id', 'taken_at', 'id'], unique=False)
+    op.drop_index('ix_image_refs_user_id', table_name='image_refs')
+
+
+def downgrade():
+    op.create_index('ix_image_refs_user_id', 'image_refs', ['user_id'], unique=False)
+    op.drop_index('ix_image_refs_user_id_taken_at_id', table_name='image_refs')
@@ -0,0 +1,32 @@
+"""add user scores
+
+Revision ID: adf265afb4d9
+Revises: 7e335674f7af
+Create Date: 2026-10-18 14:22:08.530617
+
+Adds the user_scores table holding each user's running distraction score.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'adf265afb4d9'
+down_revision = '7e335674f7af'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_scores',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('frames', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_scores')
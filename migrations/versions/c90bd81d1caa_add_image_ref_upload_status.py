@@ -0,0 +1,32 @@
+"""add image ref upload status
+
+Revision ID: c90bd81d1caa
+Revises: 3a772565e274
+Create Date: 2026-10-18 14:23:15.276940
+
+Adds the indexed upload_status column of image_refs that write-behind
+uploads track. Existing rows, whose images are all stored, get 'stored'
+through a temporary server default, since the column is NOT NULL.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c90bd81d1caa'
+down_revision = '3a772565e274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('image_refs', sa.Column('upload_status', sa.String(length=10), server_default='stored', nullable=False))
+    with op.batch_alter_table('image_refs') as batch_op:
+        batch_op.alter_column('upload_status', server_default=None)
+    op.create_index(op.f('ix_image_refs_upload_status'), 'image_refs', ['upload_status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_image_refs_upload_status'), table_name='image_refs')
+    with op.batch_alter_table('image_refs') as batch_op:
+        batch_op.drop_column('upload_status')
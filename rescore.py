@@ -0,0 +1,179 @@
+"""Re-score stored classification history under a new penalty table.
+
+Recomputes distraction_score of a user's (or every user's) frames from the
+stored predictions and taken_at times: image refs, whose label and
+confidence come from their packed c0..c9 probabilities, merged with the score
+records of frames the retention policy did not store in full. The history is
+streamed in taken_at order in chunks and the new scores are written back
+with bulk updates. The final score and scorer state replace the user's
+running score, so new frames build on the re-scored history. Scores are
+computed by the configured scorer (SCORER, SCORER_OPTIONS) unless another
+one is named:
+
+    python rescore.py -c development user -u hansi -p 1,7,6,7,6,5,4,10,7,3
+    python rescore.py -c production all_users --initial-score 0 -s decay
+"""
+
+import heapq
+from datetime import timezone
+from itertools import islice
+
+from flask import current_app
+from flask_script import Manager
+from sqlalchemy import and_, or_
+import numpy as np
+
+from app import create_app
+from app.models import db, User, ImageRef, ScoreRecord, PROBABILITIES
+from app.api.endpoints import get_score_store
+from app.helpers.aggregator import make_scorer, PENALTY_VECTOR
+
+manager = Manager(create_app)
+manager.add_option('-c', '--config', dest='config_mode',
+                   default='development')
+
+
+def parse_penalties(penalties):
+    """Parse a comma separated penalty per class label."""
+    if penalties is None:
+        return PENALTY_VECTOR
+    values = [float(value) for value in penalties.split(',')]
+    if len(values) != len(PENALTY_VECTOR):
+        raise ValueError('expected %d penalties, got %d'
+                         % (len(PENALTY_VECTOR), len(values)))
+    return np.array(values)
+
+
+def configured_scorer(name, penalties):
+    """Create the named or configured scorer with the given penalties."""
+    return make_scorer(name or current_app.config['SCORER'],
+                       parse_penalties(penalties),
+                       **current_app.config['SCORER_OPTIONS'])
+
+
+def epoch(taken_at):
+    """Unix time of a taken_at, as time() gives it for new frames.
+
+    Databases without time zone support (SQLite) return naive datetimes of
+    their UTC timestamps.
+    """
+    if taken_at.tzinfo is None:
+        taken_at = taken_at.replace(tzinfo=timezone.utc)
+    return taken_at.timestamp()
+
+
+def history_chunks(model, columns, user_id, chunk_size):
+    """Yield a user's rows of model in taken_at order, chunk_size at a time.
+
+    Rows hold id, taken_at and columns. Chunks are fetched by keyset on
+    (taken_at, id) so every chunk is an index range scan no matter how deep
+    into the history it is.
+    """
+    last = None
+    while True:
+        query = db.session.query(model.id, model.taken_at, *columns).filter(
+            model.user_id == user_id)
+        if last is not None:
+            query = query.filter(or_(
+                model.taken_at > last[1],
+                and_(model.taken_at == last[1], model.id > last[0])))
+        rows = query.order_by(model.taken_at.asc(),
+                              model.id.asc()).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]
+
+
+def image_ref_frames(user_id, chunk_size):
+    """Yield (taken_at, model, id, label, confidence) of image refs."""
+    for rows in history_chunks(ImageRef, [ImageRef.packed_probabilities],
+                               user_id, chunk_size):
+        probabilities = np.array([PROBABILITIES.unpack(row[2])
+                                  for row in rows], dtype=np.float64)
+        for row, label, confidence in zip(rows, probabilities.argmax(axis=1),
+                                          probabilities.max(axis=1)):
+            yield row[1], ImageRef, row[0], label, confidence
+
+
+def score_record_frames(user_id, chunk_size):
+    """Yield (taken_at, model, id, label, confidence) of score records."""
+    for rows in history_chunks(ScoreRecord, [ScoreRecord.predicted_label,
+                                             ScoreRecord.confidence],
+                               user_id, chunk_size):
+        for row in rows:
+            yield row[1], ScoreRecord, row[0], row[2], row[3]
+
+
+def rescore_user(user_id, scorer, initial_score, chunk_size):
+    """Re-score one user's history and return the number of rows updated.
+
+    The user's running score continues from the re-scored history.
+    """
+    score = initial_score
+    state = None
+    updated = 0
+    frames = heapq.merge(image_ref_frames(user_id, chunk_size),
+                         score_record_frames(user_id, chunk_size),
+                         key=lambda frame: frame[0])
+    while True:
+        chunk = list(islice(frames, chunk_size))
+        if not chunk:
+            break
+        scores, state = scorer.update_batch(
+            score, state, [frame[3] for frame in chunk],
+            [frame[4] for frame in chunk],
+            [epoch(frame[0]) for frame in chunk])
+        for model in (ImageRef, ScoreRecord):
+            db.session.bulk_update_mappings(
+                model, [{'id': frame[2],
+                         'distraction_score': float(new_score)}
+                        for frame, new_score in zip(chunk, scores)
+                        if frame[1] is model])
+        db.session.commit()
+        score = float(scores[-1])
+        updated += len(chunk)
+    get_score_store(current_app._get_current_object()).reset(
+        user_id, score, updated, state)
+    return updated
+
+
+@manager.option('-u', '--username', dest='username', required=True)
+@manager.option('-p', '--penalties', dest='penalties', default=None,
+                help='comma separated penalty for classes c0..c9')
+@manager.option('--initial-score', dest='initial_score', type=float,
+                default=0.0)
+@manager.option('--chunk-size', dest='chunk_size', type=int, default=1000)
+@manager.option('-s', '--scorer', dest='scorer', default=None)
+def user(username, penalties, initial_score, chunk_size, scorer):
+    """Re-score the history of a single user."""
+    found = User.query.filter_by(username=username).first()
+    if found is None:
+        print('no user %r' % username)
+        return 1
+    updated = rescore_user(found.id, configured_scorer(scorer, penalties),
+                           initial_score, chunk_size)
+    print('%s: %d frames re-scored' % (username, updated))
+    return 0
+
+
+@manager.option('-p', '--penalties', dest='penalties', default=None,
+                help='comma separated penalty for classes c0..c9')
+@manager.option('--initial-score', dest='initial_score', type=float,
+                default=0.0)
+@manager.option('--chunk-size', dest='chunk_size', type=int, default=1000)
+@manager.option('-s', '--scorer', dest='scorer', default=None)
+def all_users(penalties, initial_score, chunk_size, scorer):
+    """Re-score the history of every user."""
+    scorer = configured_scorer(scorer, penalties)
+    total = 0
+    for user_id, username in db.session.query(User.id, User.username).all():
+        updated = rescore_user(user_id, scorer, initial_score, chunk_size)
+        print('%s: %d frames re-scored' % (username, updated))
+        total += updated
+    print('%d frames re-scored in total' % total)
+    return 0
+
+
+if __name__ == '__main__':
+    manager.run()
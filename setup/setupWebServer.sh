@@ -59,7 +59,7 @@ User=ubuntu
 Group=www-data
 WorkingDirectory=/home/ubuntu/finalProject
 Environment="PATH=/home/ubuntu/anaconda/finalproject/bin"
-ExecStart=/home/ubuntu/anaconda/§finalproject/bin/gunicorn --workers 3 --bind unix:finalProject.sock -m 007 wsgi:app
+ExecStart=/home/ubuntu/anaconda/§finalproject/bin/gunicorn -c gunicorn.conf.py wsgi:app
 [Install]
 WantedBy=multi-user.target" > /etc/systemd/system/finalProject.service
 
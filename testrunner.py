@@ -51,6 +51,226 @@ def other():
         return 0
     return 1
 
+@manager.command
+def scheduler():
+    """Run the inference scheduler unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_scheduler*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def preprocessing():
+    """Run the image preprocessing unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_preprocessing*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def inference():
+    """Run the inference server unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_inference*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def result_cache():
+    """Run the result cache unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_result_cache*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def frame_skipper():
+    """Run the frame skipper unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_frame_skipper*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def backends():
+    """Run the inference backend unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_backends*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def jobs():
+    """Run the classification job unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_jobs*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def aggregator():
+    """Run the score aggregation unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_aggregator*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def score_store():
+    """Run the server side score store unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_score_store*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def s3_helper():
+    """Run the shared S3 client unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_s3_helper*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def uploads():
+    """Run the write-behind upload unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_uploads*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def object_index():
+    """Run the upload deduplication unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_object_index*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def storage():
+    """Run the storage backend conformance unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_storage*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def transform():
+    """Run the storage transform unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_transform*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def retention():
+    """Run the retention policy unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_retention*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def tokens():
+    """Run the bearer token unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_tokens*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def identity():
+    """Run the user identity cache unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_identity*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def group_commit():
+    """Run the group commit writer unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_group_commit*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def probabilities():
+    """Run the packed probabilities unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_probabilities*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
+@manager.command
+def pagination():
+    """Run the pagination cursor unit tests in /tests dir."""
+    tests = unittest.TestLoader().discover('./tests',
+                                           pattern='test_pagination*.py')
+    result = unittest.TextTestRunner(verbosity=2).run(tests)
+    if result.wasSuccessful():
+        return 0
+    return 1
+
+
 @manager.command
 def full():
     """Run all unit tests in /tests dir."""
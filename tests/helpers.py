@@ -0,0 +1,26 @@
+"""Stand-ins and fixtures shared by the unit tests."""
+
+from app.models import db, User
+
+
+class Upload:
+    """Stand-in for the request's FileStorage object."""
+
+    def __init__(self, filename='frame.jpg', content_type='image/jpeg'):
+        """Upload constructor."""
+        self.filename = filename
+        self.content_type = content_type
+
+
+def create_test_user():
+    """Create all tables and the test user hansi, return its id.
+
+    Must be called inside an application context.
+    """
+    db.create_all()
+    user = User(username='hansi', firstname='Hans', lastname='Gruber',
+                email='hans.gruber@nakatomi.com')
+    user.hash_password('python')
+    user.save()
+    return user.id
+
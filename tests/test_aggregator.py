@@ -0,0 +1,100 @@
+"""Score aggregation unit test."""
+
+import unittest
+import numpy as np
+from app.helpers.aggregator import aggregate_score, aggregate_scores, \
+    make_scorer, SCORERS
+
+
+class AggregatorTestCase(unittest.TestCase):
+    """Class representing score aggregation unit tests."""
+
+    def setUp(self):
+        """Initialize a random sequence of classifications."""
+        random = np.random.RandomState(0)
+        self.labels = random.randint(0, 10, 1000)
+        self.confidences = random.uniform(0.1, 1.0, 1000)
+        # a frame every two seconds or so, a few at the same instant and a
+        # ten minute pause
+        self.times = np.cumsum(random.exponential(2.0, 1000))
+        self.times[100:105] = self.times[99]
+        self.times[500:] += 600
+
+    def test_batch_matches_frame_by_frame(self):
+        """Returns the same running scores as chaining aggregate_score."""
+        expected = []
+        score = 5.0
+        for label, confidence in zip(self.labels, self.confidences):
+            score = aggregate_score(score, int(label), confidence)
+            expected.append(score)
+
+        np.testing.assert_allclose(
+            aggregate_scores(5.0, self.labels, self.confidences), expected)
+
+    def test_batch_with_custom_penalties(self):
+        """Applies a replacement penalty table."""
+        scores = aggregate_scores(0.0, [0, 1], [1.0, 1.0],
+                                  penalties=[2] * 10)
+
+        np.testing.assert_allclose(scores, [1.0, 1.5])
+
+    def test_batch_of_nothing(self):
+        """Returns an empty array for an empty sequence."""
+        self.assertEqual(len(aggregate_scores(5.0, [], [])), 0)
+
+    def test_scorer_batches_match_frame_by_frame(self):
+        """Returns the same scores and state from update_batch as update."""
+        for name in SCORERS:
+            scorer = make_scorer(name)
+            score, state = 5.0, None
+            expected = []
+            for label, confidence, taken_at in zip(
+                    self.labels, self.confidences, self.times):
+                score, state = scorer.update(score, state, int(label),
+                                             confidence, float(taken_at))
+                expected.append(score)
+
+            # two batches, the second continuing from the first's state
+            first, state = scorer.update_batch(
+                5.0, None, self.labels[:300], self.confidences[:300],
+                self.times[:300])
+            second, state = scorer.update_batch(
+                first[-1], state, self.labels[300:], self.confidences[300:],
+                self.times[300:])
+
+            np.testing.assert_allclose(np.concatenate([first, second]),
+                                       expected, err_msg=name)
+
+    def test_decay_forgets_after_pause(self):
+        """Weighs a frame after a long pause almost as the whole score."""
+        scorer = make_scorer('decay', half_life=10)
+        score, state = scorer.update(10.0, 0.0, 0, 1.0, 0.2)
+        self.assertGreater(score, 9.0)
+        score, state = scorer.update(10.0, 0.0, 0, 1.0, 600.0)
+        self.assertAlmostEqual(score, 1.0, places=3)
+
+    def test_window_mean_of_recent_frames(self):
+        """Averages the frames inside the window only."""
+        scorer = make_scorer('window', window=10, max_frames=4)
+        state = None
+        for label, taken_at in ((7, 0.0), (1, 5.0), (3, 8.0)):
+            score, state = scorer.update(0.0, state, label, 1.0, taken_at)
+        self.assertAlmostEqual(score, (10 + 7 + 7) / 3)
+        score, state = scorer.update(score, state, 0, 1.0, 12.0)
+        self.assertAlmostEqual(score, (7 + 7 + 1) / 3)
+
+    def test_peak_hold_releases_slowly(self):
+        """Holds a high score and releases it by half per release time."""
+        scorer = make_scorer('peak', release=30)
+        score, state = scorer.update(0.0, None, 7, 1.0, 0.0)
+        score, state = scorer.update(score, state, 0, 1.0, 30.0)
+        self.assertAlmostEqual(score, 5.0)
+
+    def test_unknown_scorer(self):
+        """Raises ValueError for an unknown scorer name."""
+        with self.assertRaises(ValueError):
+            make_scorer('median')
+
+
+if __name__ == "__main__":
+    unittest.main()
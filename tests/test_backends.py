@@ -0,0 +1,205 @@
+"""Inference backend equivalence test.
+
+Compares exported models against the Keras model on a fixture set, checking
+top-1 agreement and the maximum drift of any class probability: the models
+found next to the Keras model (see convert_model.py), and float32 ONNX and
+TensorFlow Lite models exported on the fly where the converters are
+installed. The Keras reference runs on standalone Keras where Theano is
+installed (setup/environment.yml) and is otherwise the tf.keras model
+convert_model.py rebuilds, so the test runs in the conversion environment
+too. Backends whose model file or runtime is missing are skipped.
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+import importlib.util
+from pathlib import Path
+import numpy as np
+import cv2
+from app.backends import load_backend
+from app.classifier import MODEL_PATH
+from app.preprocessing import Preprocessor
+
+STEM = str(Path(MODEL_PATH).with_suffix(''))
+
+# backend, model file, runtime module, min top-1 agreement, max drift
+EXPORTS = [('onnx', STEM + '.onnx', 'onnxruntime', 1.0, 1e-4),
+           ('onnx', STEM + '_float16.onnx', 'onnxruntime', 1.0, 1e-2),
+           ('onnx', STEM + '_int8.onnx', 'onnxruntime', 0.9, 0.1),
+           ('tflite', STEM + '.tflite', 'tensorflow', 1.0, 1e-4),
+           ('tflite', STEM + '_float16.tflite', 'tensorflow', 1.0, 1e-2),
+           ('tflite', STEM + '_int8.tflite', 'tensorflow', 0.9, 0.1)]
+
+
+def installed(*modules):
+    """Check whether all modules can be imported."""
+    return all(importlib.util.find_spec(module) is not None
+               for module in modules)
+
+
+def fixture_batch():
+    """Build the fixture set from the test image and variations of it."""
+    image = cv2.imread('tests/static/test_img.jpg', cv2.IMREAD_COLOR)
+    variants = [image,
+                image[:, ::-1],
+                cv2.convertScaleAbs(image, alpha=1.3, beta=10),
+                cv2.convertScaleAbs(image, alpha=0.7),
+                cv2.GaussianBlur(image, (9, 9), 0),
+                image[image.shape[0] // 4:, image.shape[1] // 4:],
+                np.rot90(image).copy(),
+                cv2.cvtColor(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY),
+                             cv2.COLOR_GRAY2BGR)]
+    frames = [cv2.imencode('.png', variant)[1].tobytes()
+              for variant in variants]
+    return Preprocessor().preprocess_batch(frames).copy()
+
+
+def save_theano_model(path, rng):
+    """Save a small channels first model as Keras 2.1 on Theano does.
+
+    Returns the kernels and biases of its convolution and dense layers.
+    """
+    import h5py
+
+    def layer(class_name, **config):
+        return {'class_name': class_name,
+                'config': dict(config, trainable=True)}
+    layers = [layer('Conv2D', name='conv2d_1', filters=4,
+                    kernel_size=[3, 3], strides=[1, 1], padding='valid',
+                    data_format='channels_first', dilation_rate=[1, 1],
+                    activation='relu', use_bias=True,
+                    batch_input_shape=[None, 3, 12, 12], dtype='float32'),
+              layer('MaxPooling2D', name='max_pooling2d_1',
+                    pool_size=[2, 2], strides=[2, 2], padding='valid',
+                    data_format='channels_first'),
+              layer('Flatten', name='flatten_1'),
+              layer('Dropout', name='dropout_1', rate=0.5),
+              layer('Dense', name='dense_1', units=10,
+                    activation='softmax', use_bias=True)]
+    weights = {'conv2d_1': [rng.randn(3, 3, 3, 4).astype('float32'),
+                            rng.randn(4).astype('float32')],
+               'dense_1': [rng.randn(4 * 5 * 5, 10).astype('float32'),
+                           rng.randn(10).astype('float32')]}
+    with h5py.File(path, 'w') as f:
+        f.attrs['keras_version'] = b'2.1.2'
+        f.attrs['backend'] = b'theano'
+        f.attrs['model_config'] = json.dumps(
+            {'class_name': 'Sequential', 'config': layers}).encode()
+        group = f.create_group('model_weights')
+        group.attrs['layer_names'] = [
+            spec['config']['name'].encode() for spec in layers]
+        for spec in layers:
+            name = spec['config']['name']
+            layer_group = group.create_group(name)
+            values = weights.get(name, [])
+            names = ['%s/%s:0' % (name, weight)
+                     for weight in ('kernel', 'bias')][:len(values)]
+            layer_group.attrs['weight_names'] = [n.encode() for n in names]
+            for weight_name, value in zip(names, values):
+                layer_group.create_dataset(weight_name, data=value)
+    return weights
+
+
+def theano_predict(batch, weights):
+    """Predict with the small model the way Theano computes it."""
+    kernel, bias = weights['conv2d_1']
+    dense, dense_bias = weights['dense_1']
+    # Theano convolves, i.e. cross-correlates with the flipped kernel
+    flipped = kernel[::-1, ::-1]
+    size = batch.shape[2] - 2
+    conv = np.zeros((len(batch), 4, size, size), dtype='float64')
+    for i in range(3):
+        for j in range(3):
+            conv += np.einsum('bcxy,co->boxy',
+                              batch[:, :, i:i + size, j:j + size],
+                              flipped[i, j])
+    conv = np.maximum(conv + bias[:, None, None], 0)
+    pooled = conv[:, :, :10, :10].reshape(len(batch), 4, 5, 2, 5, 2) \
+        .max(axis=(3, 5))
+    logits = pooled.reshape(len(batch), -1).dot(dense) + dense_bias
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class BackendsTestCase(unittest.TestCase):
+    """Class representing inference backend equivalence tests."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Compute the reference predictions and export models once."""
+        cls.batch = fixture_batch()
+        cls.reference = None
+        cls.exports = list(EXPORTS)
+        cls.export_dir = tempfile.mkdtemp()
+        if not Path(MODEL_PATH).exists():
+            return
+        if installed('keras', 'theano'):
+            cls.reference = load_backend('keras', MODEL_PATH).predict(
+                cls.batch)
+        elif installed('tensorflow', 'h5py'):
+            import convert_model
+            model = convert_model.load_tf_keras_model(MODEL_PATH)
+            cls.reference = model.predict(cls.batch, verbose=0)
+            exported = Path(cls.export_dir)
+            if installed('tf2onnx', 'onnxruntime'):
+                convert_model.convert_onnx(
+                    model, str(exported / 'model.onnx'), None, None)
+                cls.exports.append(('onnx', str(exported / 'model.onnx'),
+                                    'onnxruntime', 1.0, 1e-4))
+            convert_model.convert_tflite(
+                model, str(exported / 'model.tflite'), None, None)
+            cls.exports.append(('tflite', str(exported / 'model.tflite'),
+                                'tensorflow', 1.0, 1e-4))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the models exported on the fly."""
+        shutil.rmtree(cls.export_dir)
+
+    def test_exported_backends_match_keras(self):
+        """Exported models agree with Keras within their tolerance."""
+        if self.reference is None:
+            self.skipTest('Keras model or a runtime to load it not found')
+        tested = 0
+        for backend, path, runtime, agreement, drift in self.exports:
+            if not Path(path).exists() or not installed(runtime):
+                continue
+            with self.subTest(model=path):
+                probabilities = load_backend(backend, path).predict(
+                    self.batch)
+                self.assertEqual(probabilities.shape, self.reference.shape)
+                self.assertGreaterEqual(
+                    np.mean(probabilities.argmax(axis=1) ==
+                            self.reference.argmax(axis=1)), agreement)
+                self.assertLessEqual(
+                    np.abs(probabilities - self.reference).max(), drift)
+            tested += 1
+        if not tested:
+            self.skipTest('no exported models found')
+
+    def test_theano_model_is_rebuilt_for_tf_keras(self):
+        """Rebuilds a channels first Theano model with equal predictions."""
+        if not installed('tensorflow', 'h5py'):
+            self.skipTest('TensorFlow or h5py not installed')
+        import convert_model
+        rng = np.random.RandomState(0)
+        path = str(Path(self.export_dir) / 'theano.h5')
+        weights = save_theano_model(path, rng)
+        batch = rng.rand(4, 3, 12, 12).astype('float32')
+
+        model = convert_model.load_tf_keras_model(path)
+
+        np.testing.assert_allclose(model.predict(batch, verbose=0),
+                                   theano_predict(batch, weights),
+                                   rtol=1e-4, atol=1e-6)
+
+    def test_unknown_backend_is_rejected(self):
+        """Raises ValueError for a backend name that is not registered."""
+        with self.assertRaises(ValueError):
+            load_backend('caffe', MODEL_PATH)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,11 @@
 import unittest
 import json
 import io
+import struct
 from base64 import b64encode
 from app import create_app
 from app.models import db
+from app.helpers.aggregator import aggregate_score
 
 
 class ClassifierTestCase(unittest.TestCase):
@@ -45,6 +47,7 @@ class ClassifierTestCase(unittest.TestCase):
         self.assertIn('probabilities', str(postResponse.data))
         self.assertIn('confidence', str(postResponse.data))
         self.assertIn('score', str(postResponse.data))
+        self.assertIn('reused', str(postResponse.data))
 
     def test_classify_fails_with_unsupported_file_type(self):
         """Returns 400 and 'illegal file type' if type is not supported"""
@@ -105,8 +108,8 @@ class ClassifierTestCase(unittest.TestCase):
         self.assertEqual(postResponse.status_code, 400)
         self.assertIn('no file in request', str(postResponse.data))
 
-    def test_classify_fails_when_no_previous_score_provided(self):
-        """Return 400 and 'need previous score' if no score in request"""
+    def test_classify_keeps_score_without_previous_score(self):
+        """Returns 200 and chains the server side score across requests."""
 
         # create test user to use in request
         createUser = self.create_test_user()
@@ -117,17 +120,145 @@ class ClassifierTestCase(unittest.TestCase):
 
         path = 'tests/static/test_img.jpg'
         name = 'test_img.jpg'
+        results = []
         with open(path, 'rb') as image:
+            image_data = image.read()
+        for _ in range(2):
             # image data as byte stream, in 'data' field of request
-            payload = dict(data=(io.BytesIO(image.read()), name))
+            payload = dict(data=(io.BytesIO(image_data), name))
 
             postResponse = self.client.post('api/v0.1/classifier',
                                             headers=headers,
                                             data=payload)
+            self.assertEqual(postResponse.status_code, 200)
+            results.append(json.loads(postResponse.get_data(as_text=True)))
+
+        self.assertEqual(createUser.status_code, 201)
+        first, second = results
+        self.assertAlmostEqual(first['score'], aggregate_score(
+            self.app.config['SCORE_INITIAL'], first['prediction'],
+            first['confidence']))
+        self.assertAlmostEqual(second['score'], aggregate_score(
+            first['score'], second['prediction'], second['confidence']))
+
+    def test_classify_batch_of_frames(self):
+        """Returns 200, one result per frame and the chained score."""
+
+        # create test user to use in request
+        createUser = self.create_test_user()
+        postResponse = self.post_batch_for_classification(3)
+        results = json.loads(postResponse.get_data(as_text=True))
+
+        # assert user was created
+        self.assertEqual(createUser.status_code, 201)
+        # assert response code and message are as expected
+        self.assertEqual(postResponse.status_code, 200)
+        self.assertEqual(len(results['results']), 3)
+        self.assertEqual(results['results'][0]['filename'], 'frame_0.jpg')
+        self.assertEqual(results['results'][2]['filename'], 'frame_2.jpg')
+        # final score is the score after the last frame
+        self.assertEqual(results['score'], results['results'][-1]['score'])
+
+    def test_classify_batch_fails_with_unsupported_file_type(self):
+        """Returns 400 and 'illegal file type' if any frame is unsupported"""
+
+        # create test user to use in request
+        createUser = self.create_test_user()
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials,
+                       Content_type="multipart/form-data")
+        with open('tests/static/test_img.jpg', 'rb') as image, \
+                open('tests/static/test_textfile.txt', 'rb') as text:
+            payload = dict(data=[(io.BytesIO(image.read()), 'frame.jpg'),
+                                 (io.BytesIO(text.read()), 'frame.txt')],
+                           prev_score=5)
+            postResponse = self.client.post('api/v0.1/classifier/batch',
+                                            headers=headers,
+                                            data=payload)
+
+        self.assertEqual(createUser.status_code, 201)
+        self.assertEqual(postResponse.status_code, 400)
+        self.assertIn('illegal file type', str(postResponse.data))
+
+    def test_classify_batch_fails_with_too_many_frames(self):
+        """Returns 400 if a batch has more frames than allowed"""
+
+        # create test user to use in request
+        createUser = self.create_test_user()
+        self.app.config['CLASSIFY_BATCH_MAX_FRAMES'] = 2
+        postResponse = self.post_batch_for_classification(3)
 
         self.assertEqual(createUser.status_code, 201)
         self.assertEqual(postResponse.status_code, 400)
-        self.assertIn('need previous score', str(postResponse.data))
+        self.assertIn('at most 2 frames per request', str(postResponse.data))
+
+    def test_classify_frame_stream(self):
+        """Returns one result line per streamed frame and a summary."""
+
+        # create test user to use in request
+        createUser = self.create_test_user()
+        with open('tests/static/test_img.jpg', 'rb') as image:
+            image_data = image.read()
+        frame = struct.pack('>I', len(image_data)) + image_data
+        body = frame * 3 + struct.pack('>I', 0)
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        postResponse = self.client.post('api/v0.1/classifier/stream'
+                                        '?prev_score=5',
+                                        headers=headers,
+                                        data=body)
+        lines = [json.loads(line) for line in
+                 postResponse.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(createUser.status_code, 201)
+        self.assertEqual(postResponse.status_code, 200)
+        self.assertEqual([line['frame'] for line in lines[:-1]], [0, 1, 2])
+        self.assertTrue(lines[-1]['done'])
+        self.assertEqual(lines[-1]['frames'], 3)
+        self.assertEqual(lines[-1]['score'], lines[-2]['score'])
+
+    def test_classify_frame_stream_rejects_illegal_frame(self):
+        """Ends the stream with an error line if a frame is not an image"""
+
+        # create test user to use in request
+        createUser = self.create_test_user()
+        body = struct.pack('>I', 4) + b'text' + struct.pack('>I', 0)
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        postResponse = self.client.post('api/v0.1/classifier/stream'
+                                        '?prev_score=5',
+                                        headers=headers,
+                                        data=body)
+
+        self.assertEqual(createUser.status_code, 201)
+        self.assertIn('illegal frame', str(postResponse.data))
+
+    def test_classify_rejects_malformed_previous_score(self):
+        """Returns 400 if prev_score is not a finite number"""
+
+        # create test user to use in request
+        createUser = self.create_test_user()
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+
+        for prev_score in ('high', 'nan'):
+            with open('tests/static/test_img.jpg', 'rb') as image:
+                payload = dict(data=(io.BytesIO(image.read()),
+                                     'test_img.jpg'),
+                               prev_score=prev_score)
+                postResponse = self.client.post('api/v0.1/classifier',
+                                                headers=headers,
+                                                data=payload)
+            streamResponse = self.client.post('api/v0.1/classifier/stream'
+                                              '?prev_score=' + prev_score,
+                                              headers=headers,
+                                              data=struct.pack('>I', 0))
+
+            self.assertEqual(postResponse.status_code, 400)
+            self.assertIn('prev_score must be a number',
+                          str(postResponse.data))
+            self.assertEqual(streamResponse.status_code, 400)
+
+        self.assertEqual(createUser.status_code, 201)
 
     def tearDown(self):
         """Teardown all initialized variables."""
@@ -168,6 +299,21 @@ class ClassifierTestCase(unittest.TestCase):
                                             data=payload)
             return postResponse
 
+    def post_batch_for_classification(self, frames):
+        """Util method to post several frames to the batch classifier."""
+        with open('tests/static/test_img.jpg', 'rb') as image:
+            image_data = image.read()
+        headers = dict(Authorization="Basic " +
+                       self.b64_user_and_credentials,
+                       Content_type="multipart/form-data")
+        payload = dict(data=[(io.BytesIO(image_data), 'frame_%d.jpg' % i)
+                             for i in range(frames)],
+                       prev_score=5)
+
+        return self.client.post('api/v0.1/classifier/batch',
+                                headers=headers,
+                                data=payload)
+
 
 if __name__ == "__main__":
     unittest.main()
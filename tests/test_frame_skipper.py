@@ -0,0 +1,46 @@
+"""Temporal frame skipping unit test."""
+
+import unittest
+import numpy as np
+from app.helpers.frame_skipper import FrameSkipper
+
+
+class FrameSkipperTestCase(unittest.TestCase):
+    """Class representing frame skipper unit tests."""
+
+    def setUp(self):
+        """Initialize skipper and a classified frame."""
+        self.skipper = FrameSkipper(threshold=4, max_reuse=2)
+        self.frame = np.full((3, 224, 224), 100, dtype='float32')
+        self.result = ([1.0] + [0.0] * 9, 0, 1.0)
+        self.skipper.update('hansi', self.frame, self.result)
+
+    def test_similar_frame_reuses_result(self):
+        """Returns the previous result below the threshold."""
+        self.assertEqual(self.skipper.lookup('hansi', self.frame + 3),
+                         self.result)
+        self.assertEqual(self.skipper.stats()['skipped'], 1)
+
+    def test_changed_frame_is_classified(self):
+        """Returns None at or above the threshold."""
+        self.assertIsNone(self.skipper.lookup('hansi', self.frame + 4))
+
+    def test_streams_are_per_user(self):
+        """Never reuses another user's result."""
+        self.assertIsNone(self.skipper.lookup('johnboy', self.frame))
+
+    def test_reuse_is_limited(self):
+        """Forces classification after max_reuse skipped frames."""
+        self.assertIsNotNone(self.skipper.lookup('hansi', self.frame))
+        self.assertIsNotNone(self.skipper.lookup('hansi', self.frame))
+        self.assertIsNone(self.skipper.lookup('hansi', self.frame))
+
+    def test_stored_frame_is_a_copy(self):
+        """Later changes to the caller's buffer do not affect the stream."""
+        self.frame += 50
+
+        self.assertIsNone(self.skipper.lookup('hansi', self.frame))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+"""Group commit of image ref, score record and score writes unit test."""
+
+import threading
+import unittest
+from base64 import b64encode
+from app import create_app
+from sqlalchemy import event
+from app.api import endpoints
+from app.group_commit import GroupCommitWriter, GroupCommitError
+from app.models import db, ImageRef, ScoreRecord, UserScore, column_values
+
+from helpers import Upload, create_test_user
+
+
+class GroupCommitTestCase(unittest.TestCase):
+    """Class representing group commit writer unit tests."""
+
+    def setUp(self):
+        """Initialize app with group commit and a test user."""
+        self.app = create_app(config_mode='testing')
+        self.app.config.update(GROUP_COMMIT=True, STORAGE_TRANSFORM=False,
+                               UPLOAD_WRITE_BEHIND=False)
+        with self.app.app_context():
+            self.user_id = create_test_user()
+
+    def test_concurrent_saves_share_commits(self):
+        """Commits the rows of concurrent requests together."""
+        self.app.config.update(GROUP_COMMIT_MAX_ROWS=8,
+                               GROUP_COMMIT_MAX_WAIT_MS=200)
+        image_refs = []
+
+        def save(i):
+            with self.app.app_context():
+                image_ref = self.image_ref(i)
+                image_ref.save()
+                image_refs.append(image_ref)
+        threads = [threading.Thread(target=save, args=(i,))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = self.app.extensions['group_commit_writer'].stats()
+        self.assertEqual(stats['rows'], 8)
+        self.assertLess(stats['flushes'], 8)
+        with self.app.app_context():
+            self.assertEqual(
+                sorted(image_ref.id for image_ref in image_refs),
+                sorted(id for id, in db.session.query(ImageRef.id)))
+
+    def test_full_batch_is_committed_without_waiting(self):
+        """Commits as soon as the maximum number of rows is waiting."""
+        writer = GroupCommitWriter(self.app, db, max_rows=2,
+                                   max_wait_ms=60000)
+        with self.app.app_context():
+            rows = [self.row(i) for i in range(2)]
+        futures = [writer.submit(ImageRef.__table__, [row]) for row in rows]
+
+        ids = [future.result(timeout=10) for future in futures]
+
+        self.assertEqual(len(set(ids[0] + ids[1])), 2)
+        self.assertEqual(writer.stats()['flushes'], 1)
+
+    def test_failed_rows_do_not_fail_the_batch(self):
+        """Retries a failed batch request by request."""
+        writer = GroupCommitWriter(self.app, db, max_rows=3,
+                                   max_wait_ms=60000)
+        with self.app.app_context():
+            rows = [self.row(i) for i in range(3)]
+        del rows[1]['user_id']
+        futures = [writer.submit(ImageRef.__table__, [row]) for row in rows]
+
+        self.assertEqual(len(futures[0].result(timeout=10)), 1)
+        self.assertIsNotNone(futures[1].exception(timeout=10))
+        self.assertEqual(len(futures[2].result(timeout=10)), 1)
+        self.assertEqual(writer.stats()['failures'], 1)
+        with self.app.app_context():
+            self.assertEqual(ImageRef.query.count(), 2)
+
+    def test_batch_is_inserted_with_one_statement(self):
+        """Inserts the rows of all requests in a batch together."""
+        writer = GroupCommitWriter(self.app, db, max_rows=6,
+                                   max_wait_ms=60000)
+        with self.app.app_context():
+            rows = [self.row(i) for i in range(6)]
+            engine = db.engine
+        inserts = []
+
+        def count(conn, cursor, statement, parameters, context, many):
+            if statement.startswith('INSERT'):
+                inserts.append(statement)
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            futures = [writer.submit(ImageRef.__table__, rows[i:i + 2])
+                       for i in range(0, 6, 2)]
+            ids = [id for future in futures
+                   for id in future.result(timeout=10)]
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        self.assertEqual(len(inserts), 1)
+        with self.app.app_context():
+            self.assertEqual([ImageRef.query.get(id).link for id in ids],
+                             [row['link'] for row in rows])
+
+    def test_scores_and_records_share_the_writer(self):
+        """Writes score records and running scores in group commits."""
+        with self.app.app_context():
+            scores = endpoints.get_score_store(self.app).update(
+                self.user_id, [0, 1], [0.9, 0.9])
+            ScoreRecord.save_all([ScoreRecord(
+                user_id=self.user_id, predicted_label=0, confidence=0.9,
+                distraction_score=scores[-1])])
+            user_score = UserScore.query.get(self.user_id)
+            self.assertEqual(user_score.frames, 2)
+            self.assertEqual(user_score.score, scores[-1])
+            self.assertEqual(ScoreRecord.query.count(), 1)
+        # the user's first row, its update and the score record
+        stats = self.app.extensions['group_commit_writer'].stats()
+        self.assertEqual(stats['rows'], 3)
+
+    def test_early_failure_is_reported_to_the_user(self):
+        """Fails the user's next read after a frame was lost early."""
+        self.app.config.update(GROUP_COMMIT_DURABILITY='early')
+        with self.app.app_context():
+            image_ref = self.image_ref(0)
+            image_ref.predicted_label = None
+            image_ref.save()
+        headers = {'Authorization': 'Basic ' +
+                   b64encode(b'hansi:python').decode()}
+        client = self.app.test_client()
+
+        response = client.get('api/v0.1/classifier', headers=headers)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('could not be stored', str(response.data))
+        # reported once
+        response = client.get('api/v0.1/classifier', headers=headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_flush_raises_lost_writes_of_owner(self):
+        """Raises on the owner's flush only, and only in 'early' mode."""
+        writer = GroupCommitWriter(self.app, db, durability='early')
+        with self.app.app_context():
+            row = self.row(0)
+        del row['user_id']
+        writer.submit(ImageRef.__table__, [row], owner=self.user_id)
+
+        writer.flush(owner=self.user_id + 1)
+        with self.assertRaises(GroupCommitError):
+            writer.flush(owner=self.user_id)
+        writer.flush(owner=self.user_id)
+
+    def test_early_acknowledged_frames_are_listed(self):
+        """Lists frames a request was acknowledged for before the commit."""
+        self.app.config.update(GROUP_COMMIT_DURABILITY='early',
+                               GROUP_COMMIT_MAX_WAIT_MS=500)
+        with self.app.app_context():
+            image_ref = self.image_ref(0)
+            image_ref.save()
+            self.assertIsNone(image_ref.id)
+        headers = {'Authorization': 'Basic ' +
+                   b64encode(b'hansi:python').decode()}
+
+        response = self.app.test_client().get('api/v0.1/classifier',
+                                              headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['results']), 1)
+        self.assertIsNotNone(image_ref.id)
+
+    def test_unknown_durability_is_rejected(self):
+        """Refuses durability modes other than 'flush' and 'early'."""
+        with self.assertRaises(ValueError):
+            GroupCommitWriter(self.app, db, durability='eventually')
+
+    def tearDown(self):
+        """Commit what is left and drop all tables."""
+        if 'group_commit_writer' in self.app.extensions:
+            self.app.extensions['group_commit_writer'].flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def image_ref(self, i):
+        """Util method to build an image ref of the test user."""
+        return ImageRef(image=b'image %d' % i, fileStoreObj=Upload(),
+                        prediction='c0', probabilities=[0.1] * 10,
+                        username='hansi', distraction_score=1.0,
+                        user_id=self.user_id)
+
+    def row(self, i):
+        """Util method to build the column values of a stored image."""
+        image_ref = self.image_ref(i)
+        image_ref.link = 'frame%d.jpg' % i
+        return column_values(image_ref)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,9 @@
 import unittest
 import json
 import io
+from hashlib import sha256
 from app import create_app
-from app.models import db
+from app.models import db, ImageRef
 from base64 import b64encode
 
 
@@ -14,6 +15,8 @@ class HistoryTestCase(unittest.TestCase):
     def setUp(self):
         """Initialize app and set up test variables."""
         self.app = create_app(config_mode='testing')
+        # thumbnails are linked from the history
+        self.app.config['STORAGE_TRANSFORM'] = True
         self.client = self.app.test_client()
 
         self.test_user = {'username': 'hansi',
@@ -24,6 +27,10 @@ class HistoryTestCase(unittest.TestCase):
 
         self.b64_user_and_credentials = str(b64encode(b'hansi:python'))[2:-1]
 
+        # images are stored under the hash of their bytes
+        with open('tests/static/test_img.jpg', 'rb') as image:
+            self.image_key = sha256(image.read()).hexdigest() + '.jpg'
+
         with self.app.app_context():
             db.create_all()
 
@@ -47,7 +54,9 @@ class HistoryTestCase(unittest.TestCase):
         self.assertEqual(getHistoryResponse.status_code, 200)
         # assert that the response is as expected
         self.assertIn('link', str(getHistoryResponse.data))
-        self.assertIn('test.jpg', str(getHistoryResponse.data))
+        self.assertIn(self.image_key, str(getHistoryResponse.data))
+        self.assertIn(self.image_key.replace('.jpg', '.thumb.jpg'),
+                      str(getHistoryResponse.data))
         self.assertIn('predicted_label', str(getHistoryResponse.data))
         self.assertIn('taken_at', str(getHistoryResponse.data))
 
@@ -71,11 +80,100 @@ class HistoryTestCase(unittest.TestCase):
         self.assertEqual(getHistoryResponse.status_code, 200)
         # assert that the response is as expected
         self.assertIn('link', str(getHistoryResponse.data))
-        self.assertIn('test.jpg', str(getHistoryResponse.data))
+        self.assertIn(self.image_key, str(getHistoryResponse.data))
         self.assertIn('predicted_label', str(getHistoryResponse.data))
         self.assertIn('taken_at', str(getHistoryResponse.data))
         self.assertIn('"id": 3', str(getHistoryResponse.data))
 
+    def test_get_history_records_with_cursor(self):
+        """Returns the history page by page following next_cursor."""
+        self.create_test_user()
+        for i in range(5):
+            self.post_image_for_classification()
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        ids = []
+        url = 'api/v0.1/classifier?limit=2'
+        while True:
+            getHistoryResponse = self.client.get(url, headers=headers)
+            self.assertEqual(getHistoryResponse.status_code, 200)
+            body = getHistoryResponse.get_json()
+            ids.extend(result['id'] for result in body['results'])
+            if body['next_cursor'] is None:
+                break
+            url = 'api/v0.1/classifier?limit=2&cursor=' + body['next_cursor']
+
+        # frames of the same second are ordered by id
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+    def test_get_history_records_after_deleted_cursor_row(self):
+        """Continues after the last row of a page even once it is gone."""
+        self.create_test_user()
+        for i in range(4):
+            self.post_image_for_classification()
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        first = self.client.get('api/v0.1/classifier?limit=2',
+                                headers=headers).get_json()
+        with self.app.app_context():
+            ImageRef.query.filter_by(id=2).delete()
+            db.session.commit()
+        getHistoryResponse = self.client.get(
+            'api/v0.1/classifier?limit=2&cursor=' + first['next_cursor'],
+            headers=headers)
+
+        self.assertEqual(getHistoryResponse.status_code, 200)
+        body = getHistoryResponse.get_json()
+        self.assertEqual([result['id'] for result in body['results']],
+                         [3, 4])
+        # the last page is known to be the last
+        self.assertIsNone(body['next_cursor'])
+
+    def test_get_history_records_with_exhausted_cursor(self):
+        """Returns an empty page when nothing follows the cursor."""
+        self.create_test_user()
+        for i in range(3):
+            self.post_image_for_classification()
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        first = self.client.get('api/v0.1/classifier?limit=2',
+                                headers=headers).get_json()
+        with self.app.app_context():
+            ImageRef.query.filter_by(id=3).delete()
+            db.session.commit()
+        getHistoryResponse = self.client.get(
+            'api/v0.1/classifier?limit=2&cursor=' + first['next_cursor'],
+            headers=headers)
+
+        self.assertEqual(getHistoryResponse.status_code, 200)
+        self.assertEqual(getHistoryResponse.get_json(),
+                         {'results': [], 'next_cursor': None})
+
+    def test_get_history_record_with_invalid_cursor(self):
+        """Returns 400 for a cursor the server did not issue."""
+        self.create_test_user()
+        self.post_image_for_classification()
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        getHistoryResponse = self.client.get(
+                                'api/v0.1/classifier?cursor=bm90IGEgY3Vyc29y',
+                                headers=headers)
+
+        self.assertEqual(getHistoryResponse.status_code, 400)
+        self.assertIn('Invalid cursor', str(getHistoryResponse.data))
+
+    def test_get_history_record_with_invalid_limit(self):
+        """Returns 400 for a limit that is not a positive integer."""
+        self.create_test_user()
+        self.post_image_for_classification()
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        for limit in ('abc', '-1'):
+            getHistoryResponse = self.client.get(
+                                    'api/v0.1/classifier?limit=' + limit,
+                                    headers=headers)
+            self.assertEqual(getHistoryResponse.status_code, 400)
+
     def test_get_history_record_not_found(self):
         """Returns 404 and 'record not found' message"""
         # create test user
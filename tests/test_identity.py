@@ -0,0 +1,116 @@
+"""User identity cache unit test."""
+
+import unittest
+from base64 import b64encode
+from unittest import mock
+from sqlalchemy import event
+from app import create_app
+from app.helpers.identity import Identity, IdentityCache
+from app.models import db, User
+
+
+class IdentityTestCase(unittest.TestCase):
+    """Class representing identity cache unit tests."""
+
+    def setUp(self):
+        """Initialize app and a test user."""
+        self.app = create_app(config_mode='testing')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='hansi', firstname='Hans',
+                        lastname='Gruber', email='hans.gruber@nakatomi.com')
+            user.hash_password('python')
+            user.save()
+            self.user_id = user.id
+
+    def test_cache_expires_and_evicts(self):
+        """Loads identities on misses, after the ttl and after eviction."""
+        load = mock.Mock(side_effect=lambda username: Identity(
+            1, username, True, 'hash'))
+        cache = IdentityCache(load, max_size=2, ttl=60)
+
+        with mock.patch('app.helpers.identity.monotonic', return_value=0):
+            cache.get('a')
+            cache.get('a')
+            cache.get('b')
+            cache.get('c')
+            cache.get('a')
+        self.assertEqual(load.call_count, 4)
+        with mock.patch('app.helpers.identity.monotonic', return_value=61):
+            cache.get('a')
+        self.assertEqual(load.call_count, 5)
+        self.assertEqual(cache.stats(), {'size': 2, 'hits': 1, 'misses': 5,
+                                         'invalidations': 0})
+
+    def test_identity_loaded_during_save_is_not_cached(self):
+        """Does not cache what was loaded before a concurrent save."""
+        def load(username):
+            # the user is saved while its old identity is being loaded
+            cache.invalidate(1, username)
+            return Identity(1, username, True, 'old hash')
+        cache = IdentityCache(load)
+
+        cache.get('hansi')
+
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_save_invalidates_old_and_new_username(self):
+        """Forgets a renamed or deactivated user's cached identity."""
+        with self.app.app_context():
+            self.assertTrue(User.find_identity('hansi').active)
+            user = User.query.get(self.user_id)
+            user.active = False
+            user.save()
+            self.assertFalse(User.find_identity('hansi').active)
+            user.username = 'hans'
+            user.save()
+            self.assertIsNone(User.find_identity('hansi'))
+            self.assertEqual(User.find_identity('hans').id, self.user_id)
+
+    def test_request_resolves_user_once(self):
+        """Gets a user record with a single query once cached."""
+        headers = {'Authorization': 'Basic ' +
+                   b64encode(b'hansi:python').decode()}
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            first = self.client.get('api/v0.1/users/%d' % self.user_id,
+                                    headers=headers)
+            loaded = len(statements)
+            second = self.client.get('api/v0.1/users/%d' % self.user_id,
+                                     headers=headers)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        # the identity, then the user record
+        self.assertEqual(loaded, 2)
+        self.assertEqual(len(statements) - loaded, 1)
+
+    def test_each_app_has_its_own_cache(self):
+        """Starts every app without the identities of another one."""
+        with self.app.app_context():
+            self.assertIsNotNone(User.find_identity('hansi'))
+        other = create_app(config_mode='testing')
+
+        with other.app_context():
+            self.assertIsNot(User.identity_cache(),
+                             self.app.extensions['identity_cache'])
+            self.assertEqual(User.identity_cache().stats()['size'], 0)
+
+    def tearDown(self):
+        """Drop all tables."""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
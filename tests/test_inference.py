@@ -0,0 +1,76 @@
+"""Out-of-process inference unit test."""
+
+import unittest
+import os
+import tempfile
+import threading
+import numpy as np
+from app.inference import InferenceServer, InferenceClient, \
+    InferenceUnavailable
+from app.scheduler import InferenceScheduler
+
+
+class FakeClassifier:
+    """Classifier double predicting the class stored in the pixel values."""
+
+    def preprocess_batch(self, images):
+        """Turn the 'images' (ints) into a batch."""
+        return np.array(images, dtype='uint8').reshape(-1, 1, 1, 1)
+
+    def preprocess(self, image_stream_data):
+        """Turn the 'image' (an int) into a single element batch."""
+        return self.preprocess_batch([image_stream_data])
+
+    def predict_batch(self, np_image_tensor):
+        """Predict the class stored in the pixel values."""
+        return [([1.0], int(image[0, 0, 0]), 1.0)
+                for image in np_image_tensor]
+
+
+class InferenceTestCase(unittest.TestCase):
+    """Class representing inference server and client unit tests."""
+
+    def setUp(self):
+        """Start an inference server on a temporary socket."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmpdir.name, 'inference.sock')
+        scheduler = InferenceScheduler(FakeClassifier(), max_wait_ms=1)
+        self.server = InferenceServer(self.address, scheduler, b'secret')
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        # wait for the socket to be bound
+        while not os.path.exists(self.address):
+            pass
+
+    def test_classify_on_server(self):
+        """Returns the server's classification for single and batch calls."""
+        client = InferenceClient([self.address], b'secret')
+
+        self.assertEqual(client.classify(3)[1], 3)
+        self.assertEqual([result[1] for result in
+                          client.classify_batch([1, 2, 5])], [1, 2, 5])
+
+    def test_dead_server_is_skipped(self):
+        """Routes around a server that is not running."""
+        dead = os.path.join(self.tmpdir.name, 'dead.sock')
+        client = InferenceClient([dead, self.address], b'secret')
+
+        for label in range(4):
+            self.assertEqual(client.classify(label)[1], label)
+
+    def test_unavailable_when_all_servers_down(self):
+        """Raises InferenceUnavailable so callers can fall back."""
+        dead = os.path.join(self.tmpdir.name, 'dead.sock')
+        client = InferenceClient([dead], b'secret')
+
+        with self.assertRaises(InferenceUnavailable):
+            client.classify(1)
+
+    def tearDown(self):
+        """Stop the server and remove the temporary socket directory."""
+        self.server.close()
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
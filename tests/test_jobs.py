@@ -0,0 +1,120 @@
+"""Asynchronous classification job endpoint unit test."""
+
+import unittest
+import json
+import io
+from base64 import b64encode
+from app import create_app
+from app.models import db
+
+
+class JobsTestCase(unittest.TestCase):
+    """Class representing asynchronous classification job unit tests."""
+
+    def setUp(self):
+        """Initialize app and set up test variables."""
+        self.app = create_app(config_mode='testing')
+        self.client = self.app.test_client()
+
+        self.test_user = {'username': 'hansi',
+                          'firstname': 'Hans',
+                          'lastname': 'Gruber',
+                          'email': 'hans.gruber@nakatomi.com',
+                          'password': 'python'}
+
+        self.b64_user_and_credentials = str(b64encode(b'hansi:python'))[2:-1]
+
+        with self.app.app_context():
+            db.create_all()
+
+    def test_submit_job_and_poll_for_result(self):
+        """Returns 202 and job id, then the classification once done."""
+        createUser = self.create_test_user()
+        submitResponse = self.submit_job()
+        job = json.loads(submitResponse.get_data(as_text=True))
+
+        self.assertEqual(createUser.status_code, 201)
+        self.assertEqual(submitResponse.status_code, 202)
+        self.assertIn(job['job_id'], submitResponse.headers['Location'])
+
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        pollResponse = self.client.get(
+            'api/v0.1/classifier/jobs/%s?wait=20' % job['job_id'],
+            headers=headers)
+        result = json.loads(pollResponse.get_data(as_text=True))
+
+        self.assertEqual(pollResponse.status_code, 200)
+        self.assertEqual(result['status'], 'done')
+        self.assertEqual(result['result']['filename'], 'test_img.jpg')
+        self.assertIn('prediction', result['result'])
+        self.assertIn('score', result['result'])
+
+    def test_submit_job_fails_with_unsupported_file_type(self):
+        """Returns 400 and 'illegal file type' before enqueueing."""
+        createUser = self.create_test_user()
+        submitResponse = self.submit_job(path='tests/static/test_textfile.txt',
+                                         name='test_textfile.txt')
+
+        self.assertEqual(createUser.status_code, 201)
+        self.assertEqual(submitResponse.status_code, 400)
+        self.assertIn('illegal file type', str(submitResponse.data))
+
+    def test_poll_unknown_job(self):
+        """Returns 404 and 'job not found' for an unknown job id."""
+        createUser = self.create_test_user()
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+        pollResponse = self.client.get('api/v0.1/classifier/jobs/nope',
+                                       headers=headers)
+
+        self.assertEqual(createUser.status_code, 201)
+        self.assertEqual(pollResponse.status_code, 404)
+        self.assertIn('job not found', str(pollResponse.data))
+
+    def test_poll_rejects_malformed_wait(self):
+        """Returns 400 if wait is not a finite, non negative number."""
+        createUser = self.create_test_user()
+        submitResponse = self.submit_job()
+        job = json.loads(submitResponse.get_data(as_text=True))
+        headers = dict(Authorization="Basic " + self.b64_user_and_credentials)
+
+        for wait in ('soon', 'nan', 'inf', '-1'):
+            pollResponse = self.client.get(
+                'api/v0.1/classifier/jobs/%s?wait=%s' % (job['job_id'], wait),
+                headers=headers)
+
+            self.assertEqual(pollResponse.status_code, 400)
+            self.assertIn('wait must be a number of seconds',
+                          str(pollResponse.data))
+        self.assertEqual(createUser.status_code, 201)
+
+    def tearDown(self):
+        """Teardown all initialized variables."""
+        with self.app.app_context():
+            # drop all tables
+            db.session.remove()
+            db.drop_all()
+
+    def create_test_user(self):
+        """Util method to create new test user."""
+        res = self.client.post('api/v0.1/users',
+                               data=json.dumps(self.test_user),
+                               content_type='application/json')
+        return res
+
+    def submit_job(self, path='tests/static/test_img.jpg',
+                   name='test_img.jpg'):
+        """Util method to submit an image for asynchronous classification."""
+        with open(path, 'rb') as image:
+            headers = dict(Authorization="Basic " +
+                           self.b64_user_and_credentials,
+                           Content_type="multipart/form-data")
+            payload = dict(data=(io.BytesIO(image.read()), name),
+                           prev_score=5)
+
+            return self.client.post('api/v0.1/classifier/jobs',
+                                    headers=headers,
+                                    data=payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
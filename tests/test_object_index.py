@@ -0,0 +1,83 @@
+"""Content addressed storage and upload deduplication unit test."""
+
+import unittest
+from unittest import mock
+from app import create_app
+from app.models import db, ImageRef
+from app.helpers.object_index import ObjectIndex
+from app.storage import object_key, file_extension
+
+from helpers import Upload, create_test_user
+
+
+class ObjectIndexTestCase(unittest.TestCase):
+    """Class representing upload deduplication unit tests."""
+
+    def setUp(self):
+        """Initialize app and a test user."""
+        self.app = create_app(config_mode='testing')
+        self.app.config['STORAGE_DEDUP'] = True
+        self.context = self.app.app_context()
+        self.context.push()
+        create_test_user()
+
+    def test_key_is_content_addressed(self):
+        """Builds the key from user, day, digest and extension."""
+        self.assertEqual(object_key(7, '2018/02/25', 'ab' * 32,
+                                    file_extension('Frame.JPG')),
+                         '7/2018/02/25/%s.jpg' % ('ab' * 32))
+
+    def test_index_loads_and_counts_savings(self):
+        """Asks the loader on a miss only and counts saved puts."""
+        links = ('http://b/1.jpg', 'http://b/1.thumb.jpg')
+        load = mock.Mock(side_effect=[None, links])
+        index = ObjectIndex(load)
+
+        self.assertIsNone(index.lookup(1, 'aa'))
+        self.assertEqual(index.lookup(1, 'bb'), links)
+        self.assertEqual(index.lookup(1, 'bb'), links)
+        self.assertEqual(load.call_count, 2)
+        # image and thumbnail, twice; sizes of loaded links are unknown
+        self.assertEqual(index.stats()['puts_saved'], 4)
+        self.assertEqual(index.stats()['bytes_saved'], 0)
+
+    def test_index_counts_stored_bytes(self):
+        """Counts the bytes stored under the links, not the upload."""
+        index = ObjectIndex(mock.Mock())
+        index.remember(1, 'aa', ('http://b/1.jpg', None), 40)
+
+        self.assertEqual(index.lookup(1, 'aa'), ('http://b/1.jpg', None))
+        self.assertEqual(index.stats()['puts_saved'], 1)
+        self.assertEqual(index.stats()['bytes_saved'], 40)
+
+    def test_identical_images_are_uploaded_once(self):
+        """Points a repeated image at the object stored before."""
+        with mock.patch('app.storage.MemoryStorage.put',
+                        side_effect=lambda key, image, content_type:
+                        'http://b/' + key) as upload:
+            first = self.save_image(b'image')
+            second = self.save_image(b'image')
+            third = self.save_image(b'other image')
+
+        self.assertEqual(upload.call_count, 2)
+        self.assertEqual(first.link, second.link)
+        self.assertNotEqual(first.link, third.link)
+        self.assertTrue(first.link.endswith(first.sha256 + '.jpg'))
+
+    def tearDown(self):
+        """Drop all tables."""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def save_image(self, image):
+        """Util method to save an image ref for the test user."""
+        image_ref = ImageRef(image=image, fileStoreObj=Upload(),
+                             prediction=0, probabilities=[0.1] * 10,
+                             username='hansi', distraction_score=1.0)
+        image_ref.save()
+        return image_ref
+
+
+if __name__ == "__main__":
+    unittest.main()
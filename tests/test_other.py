@@ -1,6 +1,8 @@
 """Basic User endpoint unit test."""
 
 import unittest
+import json
+from base64 import b64encode
 from app import create_app
 from app.models import db
 
@@ -23,6 +25,25 @@ class OtherTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertIn('"hello": "world"', str(res.data))
 
+    def test_metrics_require_authentication(self):
+        """401 without credentials, 200 and counters with them"""
+        self.client.post('api/v0.1/users',
+                         data=json.dumps({'username': 'hansi',
+                                          'firstname': 'Hans',
+                                          'lastname': 'Gruber',
+                                          'email': 'hans.gruber@nakatomi.com',
+                                          'password': 'python'}),
+                         content_type='application/json')
+        headers = dict(Authorization='Basic ' +
+                       b64encode(b'hansi:python').decode())
+
+        anonymous = self.client.get('/api/v0.1/metrics')
+        res = self.client.get('/api/v0.1/metrics', headers=headers)
+
+        self.assertEqual(anonymous.status_code, 401)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('identities', str(res.data))
+
     def tearDown(self):
         """Teardown all initialized variables."""
         with self.app.app_context():
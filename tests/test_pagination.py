@@ -0,0 +1,41 @@
+"""Keyset pagination cursor unit test."""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+from app.helpers.pagination import encode_cursor, decode_cursor
+
+
+class PaginationTestCase(unittest.TestCase):
+    """Class representing pagination cursor unit tests."""
+
+    def test_cursor_round_trip(self):
+        """Decodes the time and row id a cursor was encoded from."""
+        taken_at = datetime(2026, 10, 18, 12, 30, 15, 123456,
+                            tzinfo=timezone.utc)
+        cursor = encode_cursor(taken_at, 42)
+
+        self.assertEqual(decode_cursor(cursor), (taken_at, 42))
+        self.assertNotIn('=', cursor)
+
+    def test_times_are_encoded_in_utc(self):
+        """Takes naive times as UTC and converts others to UTC."""
+        naive = datetime(2026, 10, 18, 12, 30, 15, 5)
+        local = naive.replace(tzinfo=timezone(timedelta(hours=2))) + \
+            timedelta(hours=2)
+
+        for taken_at in (naive, local):
+            self.assertEqual(decode_cursor(encode_cursor(taken_at, 1))[0],
+                             naive.replace(tzinfo=timezone.utc))
+
+    def test_malformed_cursor_is_rejected(self):
+        """Raises ValueError for cursors that were not issued."""
+        taken_at = datetime(2026, 10, 18)
+        for cursor in ['', 'not a cursor', 'bm90IGEgY3Vyc29y',
+                       encode_cursor(taken_at, 42)[:-2], 'WyJhIl0', 'WzQyXQ',
+                       'WzEsMl0', encode_cursor(taken_at, True)]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+if __name__ == "__main__":
+    unittest.main()
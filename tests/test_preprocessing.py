@@ -0,0 +1,83 @@
+"""Image preprocessing unit test."""
+
+import unittest
+import numpy as np
+import cv2
+from app.preprocessing import Preprocessor, decode_flag, jpeg_dimensions
+
+
+class PreprocessingTestCase(unittest.TestCase):
+    """Class representing image preprocessing unit tests."""
+
+    def setUp(self):
+        """Initialize preprocessor and test image."""
+        self.preprocessor = Preprocessor()
+        with open('tests/static/test_img.jpg', 'rb') as image:
+            self.image = image.read()
+
+    def test_matches_original_preprocessing(self):
+        """Tensor equals the original decode / resize / swapaxes result."""
+        y, x = np.mgrid[0:300, 0:400]
+        small = self.encode(np.dstack([(x + y) % 256] * 3).astype('uint8'),
+                            '.jpg')
+        legacy = cv2.resize(cv2.imdecode(np.frombuffer(small, 'uint8'),
+                                         cv2.IMREAD_UNCHANGED), (224, 224))
+        legacy = np.swapaxes(np.swapaxes(legacy[np.newaxis], 1, 3), 2, 3)
+
+        np.testing.assert_array_equal(self.preprocessor.preprocess(small),
+                                      legacy)
+        self.assertEqual(self.preprocessor.preprocess(self.image).shape,
+                         (1, 3, 224, 224))
+
+    def test_large_jpeg_is_decoded_at_reduced_resolution(self):
+        """Picks 1/8 scale for a 4032x3024 JPEG, full scale for a small one."""
+        large = self.encode(np.zeros((3024, 4032, 3), 'uint8'), '.jpg')
+        small = self.encode(np.zeros((300, 400, 3), 'uint8'), '.jpg')
+
+        self.assertEqual(jpeg_dimensions(memoryview(large)), (4032, 3024))
+        self.assertEqual(decode_flag(memoryview(large)) &
+                         ~cv2.IMREAD_IGNORE_ORIENTATION,
+                         cv2.IMREAD_REDUCED_COLOR_8)
+        self.assertEqual(decode_flag(memoryview(small)) &
+                         ~cv2.IMREAD_IGNORE_ORIENTATION,
+                         cv2.IMREAD_COLOR)
+
+    def test_grayscale_and_alpha_become_three_channels(self):
+        """Returns a 3 channel tensor for grayscale and RGBA uploads."""
+        gray = self.encode(np.full((300, 400), 200, 'uint8'), '.png')
+        rgba = np.full((300, 400, 4), 200, 'uint8')
+        # fully transparent image composites onto black
+        rgba[:, :, 3] = 0
+        tensor = self.preprocessor.preprocess_batch(
+            [gray, self.encode(rgba, '.png')])
+
+        self.assertEqual(tensor.shape, (2, 3, 224, 224))
+        self.assertTrue((tensor[0] == 200).all())
+        self.assertTrue((tensor[1] == 0).all())
+
+    def test_buffers_are_reused(self):
+        """Returns the same per thread buffer for consecutive calls."""
+        first = self.preprocessor.preprocess(self.image)
+        second = self.preprocessor.preprocess(self.image)
+
+        self.assertTrue(np.shares_memory(first, second))
+
+    def test_oversized_batch_buffer_is_not_kept(self):
+        """Keeps no tensor for batches above the maximum batch size."""
+        preprocessor = Preprocessor(max_batch_size=1)
+        kept = preprocessor.preprocess(self.image)
+
+        batch = preprocessor.preprocess_batch([self.image] * 2)
+
+        self.assertEqual(batch.shape, (2, 3, 224, 224))
+        self.assertFalse(np.shares_memory(kept, batch))
+        self.assertTrue(np.shares_memory(
+            kept, preprocessor.preprocess(self.image)))
+
+    def encode(self, image, extension):
+        """Util method to encode an ndarray into image file bytes."""
+        return cv2.imencode(extension, image)[1].tobytes()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Packed image ref probabilities unit test."""
+
+import unittest
+from app import create_app
+from app.models import db, ImageRef, PROBABILITIES
+
+from helpers import Upload, create_test_user
+
+
+class ProbabilitiesTestCase(unittest.TestCase):
+    """Class representing packed probabilities unit tests."""
+
+    def setUp(self):
+        """Initialize app and a test user."""
+        self.app = create_app(config_mode='testing')
+        self.app.config.update(STORAGE_TRANSFORM=False,
+                               UPLOAD_WRITE_BEHIND=False)
+        with self.app.app_context():
+            self.user_id = create_test_user()
+
+    def test_probabilities_are_packed(self):
+        """Stores the probabilities in one float32 vector."""
+        image_ref = self.image_ref([0.5] + [0.05] * 9)
+
+        self.assertEqual(len(image_ref.packed_probabilities),
+                         PROBABILITIES.size)
+        self.assertEqual(image_ref.c0, 0.5)
+        self.assertAlmostEqual(image_ref.c9, 0.05)
+
+    def test_class_accessors_write_the_vector(self):
+        """Updates one class probability through its accessor."""
+        image_ref = self.image_ref([0.0] * 10)
+
+        image_ref.c3 = 0.75
+
+        self.assertEqual(image_ref.probabilities[3], 0.75)
+        self.assertEqual(sum(image_ref.probabilities), 0.75)
+
+    def test_probabilities_round_trip_through_the_database(self):
+        """Reads back the saved probabilities."""
+        probabilities = [0.25, 0.5, 0.125] + [0.015625] * 7
+        with self.app.app_context():
+            self.image_ref(probabilities).save()
+            db.session.expire_all()
+
+            image_ref = ImageRef.query.one()
+
+            self.assertEqual(image_ref.probabilities, probabilities)
+            self.assertEqual(image_ref.c1, 0.5)
+
+    def tearDown(self):
+        """Drop all tables."""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def image_ref(self, probabilities):
+        """Util method to build an image ref of the test user."""
+        return ImageRef(image=b'image', fileStoreObj=Upload(),
+                        prediction='c0', probabilities=probabilities,
+                        username='hansi', distraction_score=1.0,
+                        user_id=self.user_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
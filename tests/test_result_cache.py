@@ -0,0 +1,66 @@
+"""Classification result cache unit test."""
+
+import unittest
+import time
+import numpy as np
+from app.helpers.result_cache import ResultCache, content_key, \
+    perceptual_key
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    """Class representing result cache unit tests."""
+
+    def setUp(self):
+        """Initialize cache and test frames."""
+        self.cache = ResultCache(max_size=2, ttl=60)
+        self.result = ([1.0] + [0.0] * 9, 0, 1.0)
+        y, x = np.mgrid[0:224, 0:224]
+        self.frame = np.stack([(x + y) % 256] * 3).astype('float32')
+
+    def test_hit_after_put(self):
+        """Returns the cached result and counts hits and misses."""
+        key = content_key('hansi', b'image')
+
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, self.result)
+        self.assertEqual(self.cache.get(key), self.result)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_keys_are_scoped_per_user(self):
+        """Same bytes from another user are a miss."""
+        self.cache.put(content_key('hansi', b'image'), self.result)
+
+        self.assertIsNone(self.cache.get(content_key('johnboy', b'image')))
+
+    def test_least_recently_used_is_evicted(self):
+        """Evicts the least recently used entry when full."""
+        for image in (b'one', b'two'):
+            self.cache.put(content_key('hansi', image), self.result)
+        self.cache.get(content_key('hansi', b'one'))
+        self.cache.put(content_key('hansi', b'three'), self.result)
+
+        self.assertIsNotNone(self.cache.get(content_key('hansi', b'one')))
+        self.assertIsNone(self.cache.get(content_key('hansi', b'two')))
+
+    def test_expired_entries_are_misses(self):
+        """Returns None once the time to live has passed."""
+        cache = ResultCache(max_size=2, ttl=0.01)
+        cache.put(content_key('hansi', b'image'), self.result)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get(content_key('hansi', b'image')))
+
+    def test_near_duplicate_frames_share_perceptual_key(self):
+        """Slightly noisy copies of a frame map to the same key."""
+        noise = np.random.RandomState(0).uniform(-2, 2, self.frame.shape)
+        flipped = self.frame[:, :, ::-1]
+
+        self.assertEqual(perceptual_key('hansi', self.frame),
+                         perceptual_key('hansi', self.frame + noise))
+        self.assertNotEqual(perceptual_key('hansi', self.frame),
+                            perceptual_key('hansi', flipped))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Selective retention of classified frames unit test."""
+
+import unittest
+from base64 import b64encode
+from unittest import mock
+from app import create_app
+from app.api import endpoints
+from app.helpers.retention import RetentionPolicy
+from app.models import db, ImageRef, ScoreRecord
+
+from helpers import Upload, create_test_user
+
+
+def result(prediction, confidence):
+    """Classification result predicting a class with confidence."""
+    probabilities = [0.0] * 10
+    probabilities[prediction] = confidence
+    return (probabilities, prediction, confidence), False
+
+
+class RetentionTestCase(unittest.TestCase):
+    """Class representing retention policy unit tests."""
+
+    def setUp(self):
+        """Initialize app with the selective policy and a test user."""
+        self.app = create_app(config_mode='testing')
+        self.app.config.update(RETENTION_POLICY='selective',
+                               RETENTION_SAMPLE_EVERY=3)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.user_id = create_test_user()
+
+    def test_policy_keeps_distracted_and_uncertain_frames(self):
+        """Keeps distracted, low confidence and sampled safe frames."""
+        policy = RetentionPolicy(min_confidence=0.6, sample_every=2)
+
+        self.assertTrue(policy.keep(1, 7, 0.9))
+        self.assertTrue(policy.keep(1, 0, 0.5))
+        # first, third, ... confident safe frame of every user
+        self.assertEqual([policy.keep(1, 0, 0.9) for _ in range(4)],
+                         [True, False, True, False])
+        self.assertTrue(policy.keep(2, 0, 0.9))
+        self.assertEqual(policy.stats(),
+                         {'kept': 2, 'sampled': 3, 'dropped': 2})
+
+    def test_each_app_has_its_own_policy(self):
+        """Keeps the policy and scores of one app apart from another's."""
+        other = create_app(config_mode='testing')
+        other.config.update(RETENTION_POLICY='selective')
+
+        self.assertIsNot(endpoints.get_retention_policy(other),
+                         endpoints.get_retention_policy(self.app))
+        self.assertIsNot(endpoints.get_score_store(other),
+                         endpoints.get_score_store(self.app))
+
+    def test_dropped_frames_leave_score_records(self):
+        """Stores sampled frames in full and records the score of all."""
+        results = [result(0, 0.9)] * 6 + [result(7, 0.9)]
+        with mock.patch('app.api.endpoints.classify_image',
+                        side_effect=results):
+            responses = [endpoints.classify_and_store(
+                b'image %d' % i, Upload(), 'hansi') for i in range(7)]
+
+        self.assertEqual([response['stored'] for response in responses],
+                         [True, False, False, True, False, False, True])
+        self.assertEqual(ImageRef.query.count(), 3)
+        self.assertEqual(ScoreRecord.query.count(), 4)
+        self.assertEqual([record.distraction_score for record in
+                          ScoreRecord.query.order_by(ScoreRecord.id)],
+                         [responses[i]['score'] for i in (1, 2, 4, 5)])
+
+    def test_timeline_includes_score_records(self):
+        """Returns stored frames and score records in order."""
+        with mock.patch('app.api.endpoints.classify_image',
+                        side_effect=[result(0, 0.9)] * 3):
+            for i in range(3):
+                endpoints.classify_and_store(b'image %d' % i, Upload(),
+                                             'hansi')
+        headers = {'Authorization': 'Basic ' +
+                   b64encode(b'hansi:python').decode()}
+
+        response = self.app.test_client().get('api/v0.1/classifier/scores',
+                                              headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        frames = response.get_json()['results']
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(sum(frame['link'] is None for frame in frames), 2)
+        self.assertEqual({frame['predicted_label'] for frame in frames}, {0})
+
+    def test_timeline_rejects_invalid_paging(self):
+        """Returns 400 for a limit or offset that is no valid integer."""
+        headers = {'Authorization': 'Basic ' +
+                   b64encode(b'hansi:python').decode()}
+        client = self.app.test_client()
+
+        for query in ('limit=ten', 'offset=1.5', 'limit=0', 'limit=1001',
+                      'offset=-1'):
+            response = client.get('api/v0.1/classifier/scores?' + query,
+                                  headers=headers)
+            self.assertEqual(response.status_code, 400, query)
+
+    def tearDown(self):
+        """Drop all tables."""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
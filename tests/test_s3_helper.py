@@ -0,0 +1,36 @@
+"""Shared S3 client unit test."""
+
+import os
+import unittest
+from unittest import mock
+from app import create_app
+from app.helpers import s3_helper
+
+
+class S3ClientTestCase(unittest.TestCase):
+    """Class representing shared S3 client unit tests."""
+
+    def setUp(self):
+        """Initialize app."""
+        self.app = create_app(config_mode='testing')
+
+    def test_client_is_reused(self):
+        """Returns the same client on every call in a process."""
+        client = s3_helper.get_s3_client(self.app)
+        self.assertIs(s3_helper.get_s3_client(self.app), client)
+
+    def test_each_app_has_its_own_client(self):
+        """Returns a client built from the configuration of each app."""
+        other = create_app(config_mode='testing')
+        self.assertIsNot(s3_helper.get_s3_client(other),
+                         s3_helper.get_s3_client(self.app))
+
+    def test_client_is_rebuilt_after_fork(self):
+        """Returns a new client in a forked child process."""
+        client = s3_helper.get_s3_client(self.app)
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(s3_helper.get_s3_client(self.app), client)
+
+
+if __name__ == "__main__":
+    unittest.main()
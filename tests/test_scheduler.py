@@ -0,0 +1,71 @@
+"""Inference scheduler unit test."""
+
+import unittest
+import threading
+import numpy as np
+from app.scheduler import InferenceScheduler
+
+
+class FakeClassifier:
+    """Classifier double recording the batch sizes it is asked to predict."""
+
+    def __init__(self):
+        """Initialize the recorded batch sizes."""
+        self.batch_sizes = []
+
+    def preprocess(self, image_stream_data):
+        """Turn the 'image' (an int) into a single element batch."""
+        return np.full((1, 3, 2, 2), image_stream_data, dtype='uint8')
+
+    def predict_batch(self, np_image_tensor):
+        """Predict the class stored in the pixel values."""
+        self.batch_sizes.append(len(np_image_tensor))
+        results = []
+        for image in np_image_tensor:
+            probabilities = [0.0] * 10
+            probabilities[int(image[0, 0, 0])] = 1.0
+            results.append((probabilities, int(image[0, 0, 0]), 1.0))
+        return results
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """Class representing inference scheduler unit tests."""
+
+    def setUp(self):
+        """Initialize scheduler around the classifier double."""
+        self.classifier = FakeClassifier()
+        self.scheduler = InferenceScheduler(self.classifier,
+                                            max_batch_size=4,
+                                            max_wait_ms=200)
+
+    def test_single_request_is_classified(self):
+        """Returns the classification of a lone request after the wait."""
+        probabilities, prediction, confidence = self.scheduler.classify(7)
+
+        self.assertEqual(prediction, 7)
+        self.assertEqual(confidence, 1.0)
+        self.assertEqual(self.classifier.batch_sizes, [1])
+
+    def test_concurrent_requests_are_batched(self):
+        """Each caller receives its own result from a shared batch."""
+        results = {}
+
+        def classify(label):
+            results[label] = self.scheduler.classify(label)
+
+        threads = [threading.Thread(target=classify, args=(label,))
+                   for label in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for label in range(8):
+            self.assertEqual(results[label][1], label)
+        self.assertEqual(sum(self.classifier.batch_sizes), 8)
+        self.assertLessEqual(max(self.classifier.batch_sizes), 4)
+        self.assertLess(len(self.classifier.batch_sizes), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Server side running score store unit test."""
+
+import unittest
+from app import create_app
+from app.models import db, User, UserScore
+from app.helpers.aggregator import aggregate_score, make_scorer
+from app.helpers.score_store import ScoreStore
+
+
+class ScoreStoreTestCase(unittest.TestCase):
+    """Class representing score store unit tests."""
+
+    def setUp(self):
+        """Initialize app, a test user and an empty store."""
+        self.app = create_app(config_mode='testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+        user = User(username='hansi', firstname='Hans', lastname='Gruber',
+                    email='hans.gruber@nakatomi.com')
+        user.hash_password('python')
+        user.save()
+        self.user_id = user.id
+        self.store = ScoreStore(initial_score=2.0)
+
+    def test_scores_chain_from_initial_score(self):
+        """Returns one score per frame, starting from the initial score."""
+        scores = self.store.update(self.user_id, [7, 0], [0.5, 1.0])
+        first = aggregate_score(2.0, 7, 0.5)
+
+        self.assertAlmostEqual(scores[0], first)
+        self.assertAlmostEqual(scores[1], aggregate_score(first, 0, 1.0))
+        self.assertAlmostEqual(self.stored_score(), scores[1])
+
+    def test_prev_score_overrides_stored_score(self):
+        """Starts from prev_score instead of the stored score if given."""
+        self.store.update(self.user_id, [7], [1.0])
+        scores = self.store.update(self.user_id, [0], [1.0], prev_score=5.0)
+
+        self.assertAlmostEqual(scores[0], aggregate_score(5.0, 0, 1.0))
+        self.assertEqual(self.store.stats()['hits'], 1)
+
+    def test_concurrent_writer_is_not_lost(self):
+        """Re-aggregates on top of a score written by another process."""
+        self.store.update(self.user_id, [0], [1.0])
+        # another worker process advances the row behind this cache
+        other = ScoreStore()
+        other_score = other.update(self.user_id, [7], [1.0])[0]
+        scores = self.store.update(self.user_id, [0], [1.0])
+
+        self.assertAlmostEqual(scores[0], aggregate_score(other_score, 0, 1.0))
+        self.assertEqual(self.store.stats()['conflicts'], 1)
+        self.assertEqual(UserScore.query.get(self.user_id).frames, 3)
+
+    def test_reset_score_is_not_overwritten(self):
+        """Continues from a score reset by another process, e.g. rescore."""
+        self.store.update(self.user_id, [0], [1.0])
+        # rescore.py rewrites the row behind this cache
+        ScoreStore().reset(self.user_id, 9.0, 1)
+        scores = self.store.update(self.user_id, [0], [1.0])
+
+        self.assertAlmostEqual(scores[0], aggregate_score(9.0, 0, 1.0))
+        self.assertEqual(self.store.stats()['conflicts'], 1)
+        self.assertEqual(UserScore.query.get(self.user_id).frames, 2)
+
+    def test_scorer_state_is_stored(self):
+        """Continues a time aware scorer from the state in the row."""
+        store = ScoreStore(make_scorer('decay', half_life=10))
+        store.update(self.user_id, [7], [1.0], times=[100.0])
+        # a new worker without cached scores picks up the stored state
+        scores = ScoreStore(make_scorer('decay', half_life=10)).update(
+            self.user_id, [0], [1.0], times=[110.0])
+
+        self.assertAlmostEqual(scores[0], 0.5 * 10.0 + 0.5 * 1.0, places=3)
+
+    def tearDown(self):
+        """Drop all tables."""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def stored_score(self):
+        """Read the user's score row from the database."""
+        return db.session.query(UserScore.score).filter_by(
+            user_id=self.user_id).scalar()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""Storage backend conformance unit test.
+
+The same test cases run against every storage backend; the S3 backend is
+tested against moto's in-process S3 when moto is installed.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from app import create_app
+from app.models import db, ImageRef
+from app.storage import S3Storage, LocalStorage, MemoryStorage, load_storage
+
+from helpers import Upload, create_test_user
+
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+URL = '/api/v0.1/storage/'
+KEY = '7/2018/02/25/%s.jpg' % ('ab' * 32)
+
+
+class StorageConformance:
+    """Test cases every storage backend has to pass."""
+
+    def make_storage(self):
+        """Return the storage under test."""
+        raise NotImplementedError
+
+    def setUp(self):
+        """Create the storage under test."""
+        self.storage = self.make_storage()
+
+    def test_put_returns_link_and_stores_bytes(self):
+        """Returns a link ending in the key and reads the bytes back."""
+        link = self.storage.put(KEY, b'image', 'image/jpeg')
+
+        self.assertTrue(link.endswith(KEY))
+        self.assertTrue(self.storage.exists(KEY))
+        self.assertEqual(self.storage.get(KEY), b'image')
+
+    def test_missing_object(self):
+        """Raises KeyError for a key nothing was stored under."""
+        self.assertFalse(self.storage.exists(KEY))
+        with self.assertRaises(KeyError):
+            self.storage.get(KEY)
+
+    def test_put_replaces_object(self):
+        """Keeps the bytes of the last put of a key."""
+        self.storage.put(KEY, b'first', 'image/jpeg')
+        self.storage.put(KEY, b'second', 'image/jpeg')
+
+        self.assertEqual(self.storage.get(KEY), b'second')
+
+    def test_delete(self):
+        """Removes an object, and ignores keys that are not stored."""
+        self.storage.put(KEY, b'image', 'image/jpeg')
+        self.storage.delete(KEY)
+        self.storage.delete(KEY)
+
+        self.assertFalse(self.storage.exists(KEY))
+
+    def test_concurrent_puts(self):
+        """Stores every object put from several threads at once."""
+        keys = ['1/2018/02/25/%064x.jpg' % i for i in range(200)]
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda key: self.storage.put(
+                key, key.encode(), 'image/jpeg'), keys))
+
+        for key in keys:
+            self.assertEqual(self.storage.get(key), key.encode())
+
+
+class MemoryStorageTestCase(StorageConformance, unittest.TestCase):
+    """Class representing memory storage unit tests."""
+
+    def make_storage(self):
+        """Return an empty memory storage."""
+        return MemoryStorage(URL)
+
+
+class LocalStorageTestCase(StorageConformance, unittest.TestCase):
+    """Class representing local storage unit tests."""
+
+    def make_storage(self):
+        """Return a local storage below a temporary directory."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        return LocalStorage(self.root, URL)
+
+    def test_objects_are_sharded(self):
+        """Stores an object in a shard below the directory of its key."""
+        self.storage.put(KEY, b'image', 'image/jpeg')
+
+        directory = os.path.join(self.root, '7', '2018', '02', '25')
+        shards = os.listdir(directory)
+        self.assertEqual(len(shards), 1)
+        self.assertEqual(len(shards[0]), 2)
+        self.assertEqual(os.listdir(os.path.join(directory, shards[0])),
+                         [KEY.rsplit('/', 1)[1]])
+
+    def test_keys_cannot_escape_root(self):
+        """Rejects keys pointing outside the storage root."""
+        for key in ('../x.jpg', '/etc/x.jpg', '7/../../x.jpg'):
+            with self.assertRaises(ValueError):
+                self.storage.put(key, b'image', 'image/jpeg')
+
+
+@unittest.skipIf(mock_aws is None, 'moto is not installed')
+class S3StorageTestCase(StorageConformance, unittest.TestCase):
+    """Class representing S3 storage unit tests."""
+
+    def make_storage(self):
+        """Return a S3 storage on a bucket of moto's in-process S3."""
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        client = boto3.client('s3', region_name='us-east-1',
+                              aws_access_key_id='test',
+                              aws_secret_access_key='test')
+        client.create_bucket(Bucket='test')
+        return S3Storage(client, 'test', 'http://test.s3.amazonaws.com/')
+
+
+class StorageConfigTestCase(unittest.TestCase):
+    """Class representing storage selection unit tests."""
+
+    def setUp(self):
+        """Initialize app and forget the storage of earlier tests."""
+        self.app = create_app(config_mode='testing')
+        self.root = tempfile.mkdtemp()
+        self.app.config.update(STORAGE_BACKEND='local',
+                               STORAGE_ROOT=self.root)
+
+    def test_backend_is_selected_by_config(self):
+        """Creates the configured backend and rejects unknown ones."""
+        self.assertIsInstance(load_storage(self.app), LocalStorage)
+        self.app.config['STORAGE_BACKEND'] = 'floppy'
+        with self.assertRaises(ValueError):
+            load_storage(self.app)
+
+    def test_image_is_saved_and_served(self):
+        """Saves an image ref to local storage and serves its link."""
+        with self.app.app_context():
+            create_test_user()
+            image_ref = ImageRef(image=b'image', fileStoreObj=Upload(),
+                                 prediction=0, probabilities=[0.1] * 10,
+                                 username='hansi', distraction_score=1.0)
+            image_ref.save()
+            link = image_ref.link
+            db.session.remove()
+            db.drop_all()
+
+        response = self.app.test_client().get(link)
+        missing = self.app.test_client().get(URL + '7/missing.jpg')
+
+        self.assertTrue(link.startswith(URL))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'image')
+        self.assertEqual(response.headers['Content-Type'], 'image/jpeg')
+        self.assertEqual(missing.status_code, 404)
+
+    def tearDown(self):
+        """Remove the storage root."""
+        shutil.rmtree(self.root)
+
+
+if __name__ == "__main__":
+    unittest.main()
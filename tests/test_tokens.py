@@ -0,0 +1,143 @@
+"""Bearer token authentication unit test."""
+
+import unittest
+from base64 import b64encode
+from unittest import mock
+from sqlalchemy import event
+from app import create_app
+from app.api import endpoints
+from app.helpers.tokens import TokenSigner, RevocationList
+from app.models import db
+
+from helpers import create_test_user
+
+
+class TokenTestCase(unittest.TestCase):
+    """Class representing bearer token unit tests."""
+
+    def setUp(self):
+        """Initialize app and a test user."""
+        self.app = create_app(config_mode='testing')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.user_id = create_test_user()
+
+    def test_signer_rejects_forged_and_expired_tokens(self):
+        """Accepts its own tokens only, and only until they expire."""
+        signer = TokenSigner('secret', ttl=10)
+        token, claims = signer.issue(1, 'hansi', now=100)
+        payload, signature = token.split('.')
+
+        self.assertEqual(signer.verify(token, now=105)['sub'], 'hansi')
+        self.assertIsNone(signer.verify(token, now=110))
+        self.assertIsNone(TokenSigner('other').verify(token, now=105))
+        self.assertIsNone(signer.verify(payload + '.' + signature[::-1],
+                                        now=105))
+        self.assertIsNone(signer.verify('garbage', now=105))
+
+    def test_revocation_list_reloads_periodically(self):
+        """Loads revocations once per interval and matches user entries."""
+        load = mock.Mock(return_value=[('user:1', 50.0)])
+        revoked = RevocationList(load, refresh_interval=60)
+
+        self.assertTrue(revoked.is_revoked({'jti': 'a', 'uid': 1,
+                                            'iat': 40.0}))
+        self.assertFalse(revoked.is_revoked({'jti': 'b', 'uid': 1,
+                                             'iat': 60.0}))
+        revoked.add('b', 70.0)
+        self.assertTrue(revoked.is_revoked({'jti': 'b', 'uid': 1,
+                                            'iat': 60.0}))
+        self.assertEqual(load.call_count, 1)
+
+    def test_token_authenticates_without_queries(self):
+        """Serves a protected endpoint on a token without any query."""
+        token = self.login()
+        # the revocations are loaded once, then every few seconds
+        self.assertEqual(self.get_user(token).status_code, 200)
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            with self.app.test_request_context(headers=self.bearer(token)):
+                self.assertTrue(endpoints.verify_token(token))
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        self.assertEqual(statements, [])
+
+    def test_refresh_replaces_token(self):
+        """Issues a new token on refresh and revokes the old one."""
+        token = self.login()
+        response = self.client.post('api/v0.1/login/refresh',
+                                    headers=self.bearer(token))
+        refreshed = response.get_json()['token']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_user(token).status_code, 401)
+        self.assertEqual(self.get_user(refreshed).status_code, 200)
+
+    def test_logout_revokes_token(self):
+        """Rejects a token after logging out with it."""
+        token = self.login()
+        response = self.client.post('api/v0.1/logout',
+                                    headers=self.bearer(token))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_user(token).status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        """Rejects tokens issued before the password was changed."""
+        token = self.login()
+        response = self.client.put(
+            'api/v0.1/users/%d' % self.user_id, headers=self.bearer(token),
+            json={'username': 'hansi', 'firstname': 'Hans',
+                  'lastname': 'Gruber', 'email': 'hans.gruber@nakatomi.com',
+                  'active': 'true', 'password': 'java'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_user(token).status_code, 401)
+        # a worker that has not reloaded the revocations yet
+        self.app.extensions.pop('revocation_list')
+        self.assertEqual(self.get_user(token).status_code, 401)
+
+    def test_each_app_signs_with_its_own_key(self):
+        """Rejects tokens issued by an app with another secret key."""
+        token = self.login()
+        other = create_app(config_mode='testing')
+        other.config['SECRET_KEY'] = 'another secret'
+        response = other.test_client().get(
+            'api/v0.1/users/%d' % self.user_id, headers=self.bearer(token))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.get_user(token).status_code, 200)
+
+    def tearDown(self):
+        """Drop all tables."""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self):
+        """Util method to log in the test user and return the token."""
+        headers = {'Authorization': 'Basic ' +
+                   b64encode(b'hansi:python').decode()}
+        response = self.client.post('api/v0.1/login', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['token']
+
+    def get_user(self, token):
+        """Util method to get the test user with a token."""
+        return self.client.get('api/v0.1/users/%d' % self.user_id,
+                               headers=self.bearer(token))
+
+    def bearer(self, token):
+        """Util method to build a bearer authorization header."""
+        return {'Authorization': 'Bearer ' + token}
+
+
+if __name__ == "__main__":
+    unittest.main()
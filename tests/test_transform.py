@@ -0,0 +1,100 @@
+"""Storage side image transform unit test."""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import cv2
+
+from app import create_app
+from app.models import db, ImageRef
+from app.storage import get_storage
+from app.transform import ImageTransform
+
+from helpers import Upload, create_test_user
+
+
+def synthetic_image(width, height, fmt='.png'):
+    """Encode a noisy synthetic frame, expensive to store losslessly."""
+    frame = np.random.RandomState(0).randint(
+        0, 256, (height, width, 3)).astype(np.uint8)
+    return cv2.imencode(fmt, frame)[1].tobytes()
+
+
+def dimensions(data):
+    """Return (width, height) of encoded image data."""
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8),
+                         cv2.IMREAD_COLOR)
+    return frame.shape[1], frame.shape[0]
+
+
+class ImageTransformTestCase(unittest.TestCase):
+    """Class representing storage transform unit tests."""
+
+    def setUp(self):
+        """Initialize app and a large test image."""
+        self.app = create_app(config_mode='testing')
+        self.app.config['STORAGE_TRANSFORM'] = True
+        self.image = synthetic_image(1280, 960)
+
+    def test_image_is_recompressed_and_thumbnailed(self):
+        """Stores a smaller JPEG and a thumbnail of the upload."""
+        stored = ImageTransform(max_side=640, thumbnail_side=128).apply(
+            self.image, 'image/png', 'png')
+
+        self.assertEqual(stored.content_type, 'image/jpeg')
+        self.assertEqual(stored.extension, 'jpg')
+        self.assertLess(len(stored.data), len(self.image))
+        self.assertEqual(dimensions(stored.data), (640, 480))
+        self.assertEqual(dimensions(stored.thumbnail), (128, 96))
+
+    def test_original_is_kept(self):
+        """Stores the upload unchanged next to a thumbnail."""
+        stored = ImageTransform(keep_original=True).apply(
+            self.image, 'image/png', 'png')
+
+        self.assertIs(stored.data, self.image)
+        self.assertEqual(stored.content_type, 'image/png')
+        self.assertIsNotNone(stored.thumbnail)
+
+    def test_decoded_frame_is_reused(self):
+        """Encodes the frame given instead of decoding the upload again."""
+        transform = ImageTransform(max_side=640)
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        with mock.patch.object(transform.preprocessor, 'decode') as decode:
+            stored = transform.apply(self.image, 'image/png', 'png', frame)
+
+        decode.assert_not_called()
+        self.assertEqual(dimensions(stored.data), (320, 240))
+
+    def test_undecodable_image_is_stored_unchanged(self):
+        """Stores bytes it cannot decode as they are, without thumbnail."""
+        stored = ImageTransform().apply(b'image', 'image/png', 'png')
+
+        self.assertEqual(stored.data, b'image')
+        self.assertIsNone(stored.thumbnail)
+
+    def test_image_ref_stores_thumbnail(self):
+        """Saves the transformed image and thumbnail of an image ref."""
+        with self.app.app_context():
+            create_test_user()
+            image_ref = ImageRef(image=self.image,
+                                 fileStoreObj=Upload('frame.png', 'image/png'),
+                                 prediction=0, probabilities=[0.1] * 10,
+                                 username='hansi', distraction_score=1.0)
+            image_ref.save()
+            link, thumbnail_link = image_ref.link, image_ref.thumbnail_link
+            db.session.remove()
+            db.drop_all()
+
+        url = self.app.config['STORAGE_URL']
+        stored = get_storage(self.app)
+        self.assertTrue(link.endswith('.jpg'))
+        self.assertTrue(thumbnail_link.endswith('.thumb.jpg'))
+        self.assertEqual(dimensions(stored.get(link[len(url):])), (640, 480))
+        self.assertEqual(dimensions(stored.get(thumbnail_link[len(url):])),
+                         (128, 96))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Write-behind image upload queue unit test."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from app import create_app
+from app.models import db, ImageRef
+from app.uploads import UploadQueue
+
+from helpers import Upload, create_test_user
+
+LINK = 'http://bucket.s3.amazonaws.com/frame.jpg'
+
+
+class UploadQueueTestCase(unittest.TestCase):
+    """Class representing write-behind upload unit tests."""
+
+    def setUp(self):
+        """Initialize app, a spill directory and a record of uploads."""
+        self.app = create_app(config_mode='testing')
+        self.spill_dir = tempfile.mkdtemp()
+        self.stored = []
+        self.queues = []
+
+    def test_failed_upload_is_retried(self):
+        """Records the link after failed attempts are retried."""
+        with mock.patch('app.storage.MemoryStorage.put',
+                        side_effect=[Exception('down'), LINK]), \
+                self.assertLogs(self.app.logger, 'WARNING') as logs:
+            queue = self.make_queue(workers=1)
+            queue.submit(1, b'image', 'frame.jpg', 'image/jpeg')
+            self.wait_for(lambda: self.stored)
+
+        self.assertEqual(self.stored, [(1, LINK, None)])
+        self.assertIn('upload of frame.jpg failed', logs.output[0])
+        self.assertEqual(queue.stats()['retries'], 1)
+        self.assertEqual(queue.stats()['uploaded'], 1)
+
+    def test_full_queue_spills_to_disk(self):
+        """Writes uploads that do not fit the queue to the spill dir."""
+        queue = self.make_queue(workers=0, max_size=1)
+        queue.submit(1, b'first', 'first.jpg', 'image/jpeg')
+        queue.submit(2, b'second', 'second.jpg', 'image/jpeg')
+
+        self.assertEqual(queue.stats()['queue_depth'], 1)
+        self.assertEqual(os.listdir(self.spill_dir), ['2.upload'])
+
+    def test_spilled_uploads_are_drained(self):
+        """Uploads images spilled by an earlier process and removes them."""
+        # a process without upload workers exits with an image queued
+        queue = self.make_queue(workers=0)
+        queue.submit(1, b'image', 'frame.jpg', 'image/jpeg',
+                     b'thumbnail', 'frame.thumb.jpg')
+        queue.close()
+
+        with mock.patch('app.storage.MemoryStorage.put',
+                        return_value=LINK) as put:
+            self.make_queue(workers=1)
+            self.wait_for(lambda: self.stored)
+
+        self.assertEqual(self.stored, [(1, LINK, LINK)])
+        put.assert_any_call('frame.jpg', b'image', 'image/jpeg')
+        put.assert_any_call('frame.thumb.jpg', b'thumbnail', 'image/jpeg')
+        self.wait_for(lambda: not os.listdir(self.spill_dir))
+
+    def test_image_ref_is_committed_pending(self):
+        """Commits the row pending and records the link after upload."""
+        self.app.config.update(UPLOAD_WRITE_BEHIND=True,
+                               UPLOAD_SPILL_DIR=self.spill_dir)
+        with self.app.app_context():
+            create_test_user()
+            with mock.patch('app.storage.MemoryStorage.put',
+                            return_value=LINK):
+                image_ref = ImageRef(image=b'image', fileStoreObj=Upload(),
+                                     prediction=0,
+                                     probabilities=[0.1] * 10,
+                                     username='hansi', distraction_score=1.0)
+                image_ref.save()
+                self.assertEqual(image_ref.upload_status, 'pending')
+
+                def stored():
+                    db.session.expire_all()
+                    return ImageRef.query.get(image_ref.id).link == LINK
+                self.wait_for(stored)
+            self.queues.append(self.app.extensions['upload_queue'])
+            db.session.remove()
+            db.drop_all()
+
+    def tearDown(self):
+        """Stop the queues and remove the spill directory."""
+        for queue in self.queues:
+            queue.close()
+        shutil.rmtree(self.spill_dir)
+
+    def make_queue(self, workers, max_size=10):
+        """Util method to build a queue recording stored uploads."""
+        queue = UploadQueue(self.app,
+                            lambda *stored: self.stored.append(stored),
+                            workers=workers, max_size=max_size,
+                            max_attempts=2, backoff=0.001,
+                            spill_dir=self.spill_dir, spill_interval=0.01)
+        self.queues.append(queue)
+        return queue
+
+    def wait_for(self, condition, timeout=5):
+        """Util method to wait until condition() holds."""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'timed out')
+            time.sleep(0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()